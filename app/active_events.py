@@ -0,0 +1,235 @@
+"""
+Событийное обновление активной игры.
+
+Вместо повторной загрузки всего документа планшет присылает одно событие
+(гол, отмена, смена состава) с монотонно растущим номером seq. Сервер
+применяет его к копии игры в памяти и сохраняет active_game.json.
+
+Номер последнего применённого события хранится в самом документе
+(поле lastEventSeq), поэтому состояние переживает перезапуск и общее
+для всех воркеров. Полная загрузка через /api/upload-active-game без
+lastEventSeq начинает отсчёт заново.
+"""
+
+import contextlib
+import copy
+import os
+import threading
+from typing import Callable, ContextManager, Dict, Optional, Tuple
+
+from . import jsoncodec
+
+TEAMS = ("RED", "WHITE")
+
+SEQ_FIELD = "lastEventSeq"
+
+
+class EventError(Exception):
+    """Ошибка применения события. status — HTTP-код ответа."""
+
+    def __init__(self, message: str, status: int = 400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+def stored_seq(game: Dict) -> Optional[int]:
+    """
+    lastEventSeq документа: 0, если поля нет (отсчёт заново),
+    None — значение не неотрицательное целое.
+    """
+    value = game.get(SEQ_FIELD)
+    if value is None:
+        return 0
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        return None
+    return value
+
+
+def _clean(name) -> Optional[str]:
+    if not isinstance(name, str):
+        return None
+    name = name.strip()
+    return name or None
+
+
+def _team(value, field: str) -> str:
+    team = value.upper() if isinstance(value, str) else None
+    if team not in TEAMS:
+        raise EventError(f"Invalid '{field}': expected RED or WHITE")
+    return team
+
+
+def _recalc_score(game: Dict) -> None:
+    goals = game.get("goals") or []
+    score = {team: 0 for team in TEAMS}
+    for g in goals:
+        if isinstance(g, dict) and g.get("team") in score:
+            score[g["team"]] += 1
+    game["finalScore"] = score
+
+
+def _apply_goal(game: Dict, event: Dict) -> None:
+    team = _team(event.get("team"), "team")
+    goals = game.setdefault("goals", [])
+
+    score = dict(game.get("finalScore") or {})
+    score = {t: int(score.get(t) or 0) for t in TEAMS}
+    score[team] += 1
+
+    goals.append({
+        "team": team,
+        "scoreAfter": f"{score['RED']}:{score['WHITE']}",
+        "scorer": _clean(event.get("scorer")),
+        "assist1": _clean(event.get("assist1")),
+        "assist2": _clean(event.get("assist2")),
+        "order": len(goals) + 1,
+    })
+    game["finalScore"] = score
+
+
+def _apply_undo(game: Dict, event: Dict) -> None:
+    target = event.get("target") or "goal"
+    if target == "goal":
+        goals = game.get("goals") or []
+        if not goals:
+            raise EventError("Nothing to undo: no goals")
+        goals.pop()
+        game["goals"] = goals
+        _recalc_score(game)
+    elif target == "rosterChange":
+        changes = game.get("rosterChanges") or []
+        if not changes:
+            raise EventError("Nothing to undo: no roster changes")
+        last = changes.pop()
+        game["rosterChanges"] = changes
+        _move_player(game, last.get("player"), last.get("toTeam"), last.get("fromTeam"))
+    else:
+        raise EventError("Invalid 'target': expected goal or rosterChange")
+
+
+def _move_player(game: Dict, player, from_team, to_team) -> None:
+    teams = game.setdefault("teams", {})
+    if from_team in TEAMS:
+        src = teams.setdefault(from_team, {}).setdefault("players", [])
+        if player in src:
+            src.remove(player)
+    if to_team in TEAMS:
+        dst = teams.setdefault(to_team, {}).setdefault("players", [])
+        if player not in dst:
+            dst.append(player)
+
+
+def _apply_roster_change(game: Dict, event: Dict) -> None:
+    player = _clean(event.get("player"))
+    if not player:
+        raise EventError("Missing 'player'")
+    from_team = _team(event.get("fromTeam"), "fromTeam")
+    to_team = _team(event.get("toTeam"), "toTeam")
+
+    changes = game.setdefault("rosterChanges", [])
+    changes.append({
+        "order": len(changes) + 1,
+        "player": player,
+        "fromTeam": from_team,
+        "toTeam": to_team,
+    })
+    _move_player(game, player, from_team, to_team)
+
+
+EVENT_HANDLERS: Dict[str, Callable[[Dict, Dict], None]] = {
+    "goal": _apply_goal,
+    "undo": _apply_undo,
+    "rosterChange": _apply_roster_change,
+}
+
+
+class ActiveGameEvents:
+    """
+    Копия активной игры в памяти + применение событий по порядку seq.
+    Копия перечитывается с диска, если файл изменил кто-то другой
+    (полная загрузка, другой воркер).
+
+    lock — блокировка файла между процессами (storage.file_lock): проверка
+    seq, применение и запись идут под ней, так что два воркера не применят
+    одно и то же seq.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        save: Callable[[str, Dict], None],
+        lock: Callable[[], ContextManager] = contextlib.nullcontext,
+    ):
+        self._path = path
+        self._save = save
+        self._file_lock = lock
+        self._lock = threading.Lock()
+        self._game: Optional[Dict] = None
+        self._version: Optional[Tuple[int, int, int]] = None
+
+    def _disk_version(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        # Запись атомарная (rename), поэтому у нового файла новый inode
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load(self) -> Dict:
+        version = self._disk_version()
+        if version is None:
+            raise EventError("No active game: upload the full game first", 409)
+        if self._game is None or version != self._version:
+            try:
+                game = jsoncodec.load(self._path)
+            except ValueError:
+                raise EventError("Active game file is not valid JSON", 409)
+            if not isinstance(game, dict):
+                raise EventError("Active game file is not a JSON object", 409)
+            self._game = game
+            self._version = version
+        return self._game
+
+    def apply(self, event: Dict) -> Dict:
+        """
+        Применяет событие и сохраняет игру. Возвращает обновлённый документ.
+        Бросает EventError при ошибке формата или нарушении порядка seq.
+        """
+        seq = event.get("seq")
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+            raise EventError("Missing or invalid 'seq' (positive integer)")
+
+        handler = EVENT_HANDLERS.get(event.get("type"))
+        if handler is None:
+            raise EventError(
+                "Invalid 'type': expected one of " + ", ".join(EVENT_HANDLERS)
+            )
+
+        with self._lock, self._file_lock():
+            game = self._load()
+            last_seq = stored_seq(game)
+            if last_seq is None:
+                raise EventError(
+                    f"Active game has invalid '{SEQ_FIELD}': upload the full game again", 409
+                )
+
+            if seq <= last_seq:
+                raise EventError(
+                    "Duplicate or stale 'seq'", 409, lastSeq=last_seq
+                )
+            if seq != last_seq + 1:
+                raise EventError(
+                    f"Out-of-order 'seq': expected {last_seq + 1}", 409, lastSeq=last_seq
+                )
+
+            # Применяем к копии: при ошибке состояние в памяти не портится
+            updated = copy.deepcopy(game)
+            handler(updated, event)
+            updated[SEQ_FIELD] = seq
+
+            self._save(self._path, updated)
+            self._game = updated
+            self._version = self._disk_version()
+            return updated
@@ -0,0 +1,506 @@
+"""
+Необязательный SQLite-каталог завершённых игр (.cache/catalog.sqlite3).
+
+Зеркало дерева finished/<season>/*.json в виде таблиц:
+- games        — запись игры (как в finished/<season>/index.json),
+- goals        — голы игры по порядку,
+- appearances  — участие игрока в игре с приращениями статистики,
+- player_stats — итоги игроков по сезонам (пересчитываются SQL-запросом).
+
+Источник правды — JSON-файлы: каталог синхронизируется пересборкой
+индексов (по sha256 из кэша .cache/games/) и эндпоинтами загрузки/удаления
+игр, а scripts/rebuild_catalog.py пересоздаёт его с нуля.
+
+Заполненный каталог отвечает на /api/games и даёт пересборке карьерную
+статистику (stats/all/) агрегирующими SQL-запросами вместо сложения
+итогов сезонов из .cache/totals/.
+
+Режим WAL: читатели (/api/games, sqlite3 в консоли) не блокируют запись.
+Соединения — своё на каждый поток. Если файл каталога подменили
+(импорт базы меняет .cache целиком), соединение открывается заново.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import jsoncodec
+from .config import BASE_DIR, CATALOG_ENABLED, CATALOG_PATH
+
+# Версия схемы (PRAGMA user_version). При несовпадении каталог пересоздаётся.
+CATALOG_SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    file        TEXT PRIMARY KEY,
+    season      TEXT NOT NULL,
+    game_id     TEXT,
+    date        TEXT,
+    sort_ts     REAL NOT NULL,
+    arena       TEXT,
+    arena_key   TEXT,
+    team_red    TEXT,
+    team_white  TEXT,
+    red_key     TEXT,
+    white_key   TEXT,
+    score_red   INTEGER,
+    score_white INTEGER,
+    sha256      TEXT,
+    meta        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_ts ON games (sort_ts);
+CREATE INDEX IF NOT EXISTS games_season_ts ON games (season, sort_ts);
+CREATE INDEX IF NOT EXISTS games_arena_ts ON games (arena_key, sort_ts);
+CREATE INDEX IF NOT EXISTS games_red ON games (red_key);
+CREATE INDEX IF NOT EXISTS games_white ON games (white_key);
+
+CREATE TABLE IF NOT EXISTS goals (
+    file        TEXT NOT NULL,
+    ord         INTEGER NOT NULL,
+    team        TEXT,
+    score_after TEXT,
+    scorer      TEXT,
+    assist1     TEXT,
+    assist2     TEXT,
+    PRIMARY KEY (file, ord)
+);
+CREATE INDEX IF NOT EXISTS goals_scorer ON goals (scorer);
+
+CREATE TABLE IF NOT EXISTS appearances (
+    file       TEXT NOT NULL,
+    season     TEXT NOT NULL,
+    player     TEXT NOT NULL,
+    player_key TEXT NOT NULL,
+    team       TEXT,
+    games      INTEGER NOT NULL DEFAULT 0,
+    wins       INTEGER NOT NULL DEFAULT 0,
+    losses     INTEGER NOT NULL DEFAULT 0,
+    draws      INTEGER NOT NULL DEFAULT 0,
+    goals      INTEGER NOT NULL DEFAULT 0,
+    assists    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (file, player)
+);
+CREATE INDEX IF NOT EXISTS appearances_player ON appearances (player_key, goals);
+CREATE INDEX IF NOT EXISTS appearances_season ON appearances (season);
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    season  TEXT NOT NULL,
+    player  TEXT NOT NULL,
+    games   INTEGER NOT NULL,
+    wins    INTEGER NOT NULL,
+    losses  INTEGER NOT NULL,
+    draws   INTEGER NOT NULL,
+    goals   INTEGER NOT NULL,
+    assists INTEGER NOT NULL,
+    points  INTEGER NOT NULL,
+    PRIMARY KEY (season, player)
+);
+
+CREATE TABLE IF NOT EXISTS state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TABLES = ("games", "goals", "appearances", "player_stats", "state")
+
+STAT_KEYS = ("games", "wins", "losses", "draws", "goals", "assists")
+
+PathLike = Union[str, Path]
+
+
+def _key(value: Optional[str]) -> str:
+    # Тот же ключ, что и в app/games_index.py: без учёта регистра (и для кириллицы)
+    return (value or "").strip().casefold()
+
+
+class Catalog:
+    def __init__(self, path: PathLike, base_dir: PathLike):
+        self._path = str(path)
+        self._base_dir = Path(base_dir)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    # ---------- соединение и схема ----------
+
+    def _file_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.file_id != self._file_id():
+            # Файл подменён или удалён — старое соединение смотрит в старый inode
+            conn.close()
+            conn = None
+            self._schema_ready = False
+        if conn is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.file_id = self._file_id()
+        if not self._schema_ready:
+            self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != CATALOG_SCHEMA_VERSION:
+                with conn:
+                    for table in TABLES:
+                        conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    conn.executescript(SCHEMA)
+                    conn.execute(f"PRAGMA user_version={CATALOG_SCHEMA_VERSION}")
+            self._schema_ready = True
+
+    def synced(self) -> bool:
+        """
+        Заполнен ли каталог полностью. Новый (или пересозданный после смены
+        схемы) каталог пуст, пока пересборка не пройдёт по всем сезонам.
+        """
+        row = self.connect().execute(
+            "SELECT value FROM state WHERE key = 'synced'"
+        ).fetchone()
+        return row is not None
+
+    def mark_synced(self) -> None:
+        conn = self.connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO state VALUES ('synced', '1')")
+
+    # ---------- запись ----------
+
+    def _delete_game(self, conn: sqlite3.Connection, rel: str) -> None:
+        for table in ("games", "goals", "appearances"):
+            conn.execute(f"DELETE FROM {table} WHERE file = ?", (rel,))
+
+    def _insert_game(
+        self,
+        conn: sqlite3.Connection,
+        season: str,
+        data: Dict,
+        entry: Dict,
+        sha256: str,
+        sort_ts: float,
+    ) -> None:
+        meta = entry["meta"]
+        rel = meta["file"]
+        self._delete_game(conn, rel)
+
+        conn.execute(
+            "INSERT INTO games VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                rel, season, meta["id"], meta["date"], sort_ts,
+                meta["arena"], _key(meta["arena"]),
+                meta["teamRed"], meta["teamWhite"],
+                _key(meta["teamRed"]), _key(meta["teamWhite"]),
+                meta["scoreRed"], meta["scoreWhite"], sha256,
+                jsoncodec.dumps(meta, compact=True).decode("utf-8"),
+            ),
+        )
+
+        goals = data.get("goals") or []
+        rows = []
+        for i, g in enumerate(goals if isinstance(goals, list) else []):
+            if not isinstance(g, dict):
+                continue
+            rows.append((
+                rel, i + 1, g.get("team"), g.get("scoreAfter"),
+                g.get("scorer"), g.get("assist1"), g.get("assist2"),
+            ))
+        conn.executemany("INSERT INTO goals VALUES (?,?,?,?,?,?,?)", rows)
+
+        teams = entry.get("teams") or {}
+        players = entry["players"]
+        conn.executemany(
+            "INSERT INTO appearances VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+            [
+                (rel, season, name, _key(name), teams.get(name))
+                + tuple(players.get(name, {}).get(k, 0) for k in STAT_KEYS)
+                for name in sorted(set(players) | set(teams))
+            ],
+        )
+
+    def _refresh_player_stats(self, conn: sqlite3.Connection, season: str) -> None:
+        conn.execute("DELETE FROM player_stats WHERE season = ?", (season,))
+        conn.execute(
+            """
+            INSERT INTO player_stats
+            SELECT season, player,
+                   SUM(games), SUM(wins), SUM(losses), SUM(draws),
+                   SUM(goals), SUM(assists), SUM(goals) + SUM(assists)
+            FROM appearances WHERE season = ?
+            GROUP BY player
+            """,
+            (season,),
+        )
+
+    def sync_season(self, season: str, files: Dict[str, Dict]) -> int:
+        """
+        Сверяет сезон с кэшем пересборки (имя файла -> {sha256, entry, ...}).
+        Перечитывает только игры с изменившимся sha256, удаляет пропавшие.
+        Возвращает число обновлённых игр.
+        """
+        from scripts import rebuild_indexes
+
+        prefix = f"finished/{season}/"
+        conn = self.connect()
+        known = dict(conn.execute(
+            "SELECT file, sha256 FROM games WHERE season = ?", (season,)
+        ))
+
+        changed = 0
+        with conn:
+            wanted = set()
+            for name, cached in files.items():
+                entry = (cached or {}).get("entry")
+                if entry is None:
+                    continue
+                rel = prefix + name
+                wanted.add(rel)
+                if known.get(rel) == cached.get("sha256"):
+                    continue
+                game_file = self._base_dir / rel
+                try:
+                    data = jsoncodec.loads(game_file.read_bytes())
+                except (OSError, ValueError):
+                    continue
+                sort_ts = rebuild_indexes.parse_iso_date(
+                    entry["meta"]["date"], cached["mtime_ns"] / 1e9
+                )
+                self._insert_game(conn, season, data, entry, cached["sha256"], sort_ts)
+                changed += 1
+
+            for rel in set(known) - wanted:
+                self._delete_game(conn, rel)
+                changed += 1
+
+            if changed:
+                self._refresh_player_stats(conn, season)
+        return changed
+
+    def sync_file(self, abs_path: PathLike) -> None:
+        """Обновляет одну игру после записи файла (эндпоинт загрузки)."""
+        from scripts import rebuild_indexes
+
+        game_file = Path(abs_path)
+        season = game_file.parent.name
+        raw = game_file.read_bytes()
+        st = game_file.stat()
+        try:
+            data = jsoncodec.loads(raw)
+        except ValueError:
+            data = None
+
+        conn = self.connect()
+        with conn:
+            if not isinstance(data, dict):
+                self._delete_game(conn, game_file.relative_to(self._base_dir).as_posix())
+            else:
+                entry = rebuild_indexes.build_game_entry(game_file, data, self._base_dir)
+                sort_ts = rebuild_indexes.parse_iso_date(entry["meta"]["date"], st.st_mtime)
+                self._insert_game(
+                    conn, season, data, entry, hashlib.sha256(raw).hexdigest(), sort_ts
+                )
+            self._refresh_player_stats(conn, season)
+
+    def remove_file(self, abs_path: PathLike) -> None:
+        """Удаляет игру из каталога после удаления файла."""
+        game_file = Path(abs_path)
+        conn = self.connect()
+        with conn:
+            self._delete_game(conn, game_file.relative_to(self._base_dir).as_posix())
+            self._refresh_player_stats(conn, game_file.parent.name)
+
+    def retain_seasons(self, seasons: Iterable[str]) -> None:
+        """Удаляет из каталога сезоны, которых больше нет в finished/."""
+        seasons = list(seasons)
+        marks = ",".join("?" * len(seasons)) or "''"
+        conn = self.connect()
+        with conn:
+            for table in ("games", "goals", "appearances", "player_stats"):
+                if table == "goals":
+                    conn.execute(
+                        f"DELETE FROM goals WHERE file NOT IN "
+                        f"(SELECT file FROM games WHERE season IN ({marks}))",
+                        seasons,
+                    )
+                else:
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE season NOT IN ({marks})", seasons
+                    )
+
+    def rebuild(self) -> int:
+        """
+        Пересоздаёт каталог целиком из JSON-файлов (без кэша пересборки).
+        Возвращает число игр в каталоге.
+        """
+        from scripts import rebuild_indexes
+
+        conn = self.connect()
+        total = 0
+        with conn:
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute("INSERT INTO state VALUES ('synced', '1')")
+            for season in rebuild_indexes.discover_seasons():
+                season_dir = rebuild_indexes.FINISHED_DIR / season
+                for game_file in rebuild_indexes.list_game_files(season_dir):
+                    raw = game_file.read_bytes()
+                    try:
+                        data = jsoncodec.loads(raw)
+                    except ValueError:
+                        print(f"[WARN] Не удалось прочитать JSON {game_file}")
+                        continue
+                    if not isinstance(data, dict):
+                        continue
+                    entry = rebuild_indexes.build_game_entry(game_file, data, self._base_dir)
+                    sort_ts = rebuild_indexes.parse_iso_date(
+                        entry["meta"]["date"], game_file.stat().st_mtime
+                    )
+                    self._insert_game(
+                        conn, season, data, entry, hashlib.sha256(raw).hexdigest(), sort_ts
+                    )
+                    total += 1
+                self._refresh_player_stats(conn, season)
+        conn.execute("PRAGMA optimize")
+        return total
+
+    # ---------- чтение ----------
+
+    def query_games(
+        self,
+        season: Optional[str] = None,
+        arena: Optional[str] = None,
+        teams: Iterable[str] = (),
+        players: Iterable[str] = (),
+        scorers: Iterable[str] = (),
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict]]:
+        """
+        То же, что GamesIndex.query: игры по фильтрам от новых к старым,
+        (общее число найденных, страница результатов).
+        """
+        where: List[str] = []
+        params: List = []
+
+        if season is not None:
+            where.append("season = ?")
+            params.append(season)
+        if arena is not None:
+            where.append("arena_key = ?")
+            params.append(_key(arena))
+        for team in teams:
+            where.append("(red_key = ? OR white_key = ?)")
+            params += [_key(team), _key(team)]
+        for player in players:
+            where.append("file IN (SELECT file FROM appearances WHERE player_key = ?)")
+            params.append(_key(player))
+        for player in scorers:
+            where.append(
+                "file IN (SELECT file FROM appearances WHERE player_key = ? AND goals > 0)"
+            )
+            params.append(_key(player))
+        if date_from is not None:
+            where.append("sort_ts >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("sort_ts <= ?")
+            params.append(date_to)
+
+        sql_where = (" WHERE " + " AND ".join(where)) if where else ""
+        conn = self.connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM games{sql_where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT meta, season FROM games{sql_where} "
+            f"ORDER BY sort_ts DESC, file DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+
+        games = []
+        for meta, game_season in rows:
+            game = jsoncodec.loads(meta)
+            game["season"] = game_season
+            games.append(game)
+        return total, games
+
+    # ---------- агрегаты для пересборки ----------
+
+    @staticmethod
+    def _stats(row) -> Dict[str, int]:
+        """Счётчики игрока в формате rebuild_indexes.empty_player_stats."""
+        games, wins, losses, draws, goals, assists = row
+        return {
+            "games": games,
+            "goals": goals,
+            "assists": assists,
+            "points": goals + assists,
+            "wins": wins,
+            "draws": draws,
+            "losses": losses,
+        }
+
+    def career_player_stats(self) -> Dict[str, Dict[str, int]]:
+        """Итоги игроков за все сезоны каталога: имя -> счётчики."""
+        rows = self.connect().execute(
+            """
+            SELECT player, SUM(games), SUM(wins), SUM(losses), SUM(draws),
+                   SUM(goals), SUM(assists)
+            FROM player_stats GROUP BY player
+            """
+        )
+        return {row[0]: self._stats(row[1:]) for row in rows}
+
+    def arena_stats(self) -> Dict[str, Dict]:
+        """
+        Итоги по аренам: arena -> {"games": N, "seasons": {сезоны с играми},
+        "players": {имя: счётчики}}.
+        """
+        conn = self.connect()
+        arenas: Dict[str, Dict] = {}
+        for arena, season, games in conn.execute(
+            "SELECT arena, season, COUNT(*) FROM games GROUP BY arena, season"
+        ):
+            target = arenas.setdefault(arena, {"games": 0, "seasons": set(), "players": {}})
+            target["games"] += games
+            target["seasons"].add(season)
+        for row in conn.execute(
+            """
+            SELECT g.arena, a.player, SUM(a.games), SUM(a.wins), SUM(a.losses),
+                   SUM(a.draws), SUM(a.goals), SUM(a.assists)
+            FROM appearances a JOIN games g ON g.file = a.file
+            GROUP BY g.arena, a.player
+            """
+        ):
+            arenas[row[0]]["players"][row[1]] = self._stats(row[2:])
+        return arenas
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Optional[Catalog]:
+    """Общий каталог процесса или None, если каталог выключен (CATALOG_ENABLED)."""
+    global _catalog
+    if not CATALOG_ENABLED:
+        return None
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog(CATALOG_PATH, BASE_DIR)
+        return _catalog
@@ -18,9 +18,97 @@ def _load_settings() -> dict:
 
 _settings = _load_settings()
 
-# Базовая директория с JSON-данными
-BASE_DIR = Path(_settings.get("baseDir", str(DEFAULT_BASE_DIR))).resolve()
+# Базовая директория с JSON-данными.
+# HOCKEY_BASE_DIR перекрывает settings.json (бенчмарки, временные копии базы).
+BASE_DIR = Path(
+    os.getenv("HOCKEY_BASE_DIR") or _settings.get("baseDir", str(DEFAULT_BASE_DIR))
+).resolve()
+
+# Служебный каталог (кэши пересборки и т. п.). Не экспортируется в архив базы.
+CACHE_DIR = BASE_DIR / ".cache"
+
+# Материализованный снимок архива для /api/download-db
+SNAPSHOT_DIR = CACHE_DIR / "snapshot"
+
+# Неизменяемые копии файлов по хэшу содержимого (immutable/<hash>.json).
+# Пересоздаются пересборкой, в архив базы не выгружаются.
+IMMUTABLE_DIR = BASE_DIR / "immutable"
+
+# Промежуточный каталог импорта базы (scripts/import_db.py): новая база
+# собирается здесь и подменяет рабочую. Не экспортируется в архив базы.
+IMPORT_STAGING_DIR = BASE_DIR / ".import-staging"
 
 # На будущее: можно добавлять другие настройки, например ключи и режимы
 UPLOAD_API_KEY = os.getenv("UPLOAD_API_KEY", "")
 
+
+# Планировщик пересборки индексов внутри API-процесса:
+# пауза «тишины» после последней записи и максимальная задержка пачки (сек).
+REBUILD_DEBOUNCE_SEC = float(os.getenv("REBUILD_DEBOUNCE_SEC", "1.0"))
+REBUILD_MAX_DELAY_SEC = float(os.getenv("REBUILD_MAX_DELAY_SEC", "10.0"))
+
+# Число параллельных воркеров пересборки (0 — по числу CPU)
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", "1"))
+
+# Постраничный индекс сезона: игр на странице и игр в latest.json
+INDEX_PAGE_SIZE = int(os.getenv("INDEX_PAGE_SIZE", "50"))
+INDEX_LATEST_COUNT = int(os.getenv("INDEX_LATEST_COUNT", "10"))
+
+# Отдавать /api/download-db из закэшированного снимка архива
+# (ETag / 304 / Range). При false архив каждый раз собирается потоково.
+DB_SNAPSHOT_ENABLED = os.getenv("DB_SNAPSHOT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Устаревший снимок отдаётся сразу и пересобирается в фоне —
+# не чаще раза в столько секунд
+SNAPSHOT_REBUILD_INTERVAL_SEC = float(os.getenv("SNAPSHOT_REBUILD_INTERVAL_SEC", "60"))
+
+# Сколько дней хранить журнал удалений для дельта-выгрузок
+# (/api/download-db?since=...). Более старый since получает полный архив.
+DELTA_RETENTION_DAYS = float(os.getenv("DELTA_RETENTION_DAYS", "90"))
+
+# JSON-кодек: бэкенд (auto — orjson, если установлен; json — только stdlib)
+# и компактный вывод публикуемых файлов вместо отступа в 2 пробела.
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+JSON_COMPACT = os.getenv("JSON_COMPACT", "false").lower() in ("1", "true", "yes")
+
+# Необязательный SQLite-каталог игр (.cache/catalog.sqlite3): синхронизируется
+# пересборкой и загрузками, /api/games при включённом каталоге идёт в SQL.
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "false").lower() in ("1", "true", "yes")
+CATALOG_PATH = CACHE_DIR / "catalog.sqlite3"
+
+# Предсжатые соседи опубликованных JSON (file.json.gz / file.json.br)
+# для nginx gzip_static. Brotli требует установленного модуля brotli.
+PRECOMPRESS_GZIP = os.getenv("PRECOMPRESS_GZIP", "true").lower() in ("1", "true", "yes")
+PRECOMPRESS_BROTLI = os.getenv("PRECOMPRESS_BROTLI", "false").lower() in ("1", "true", "yes")
+
+# Метрики /api/metrics: как часто воркер сбрасывает свои значения в
+# .cache/metrics/<pid>.json и на сколько кэшируется обход дерева данных.
+METRICS_FLUSH_SEC = float(os.getenv("METRICS_FLUSH_SEC", "1.0"))
+METRICS_TREE_TTL_SEC = float(os.getenv("METRICS_TREE_TTL_SEC", "60"))
+
+# Live-лента активной игры (SSE, /api/live/active-game):
+# период проверки файла, интервал heartbeat и максимальная длительность
+# одного подключения (после неё клиент переподключается с Last-Event-ID).
+LIVE_POLL_SEC = float(os.getenv("LIVE_POLL_SEC", "0.5"))
+LIVE_HEARTBEAT_SEC = float(os.getenv("LIVE_HEARTBEAT_SEC", "15"))
+LIVE_MAX_STREAM_SEC = float(os.getenv("LIVE_MAX_STREAM_SEC", "600"))
+# Одновременных подключений на воркер. Каждое держит поток gthread, поэтому
+# лимит ниже GUNICORN_THREADS: четверть потоков остаётся записям табло и
+# остальным запросам. Сверх лимита — 503 с Retry-After.
+LIVE_MAX_STREAMS = int(os.getenv(
+    "LIVE_MAX_STREAMS", str(max(int(os.getenv("GUNICORN_THREADS", "64")) * 3 // 4, 1))
+))
+LIVE_RETRY_AFTER_SEC = int(os.getenv("LIVE_RETRY_AFTER_SEC", "10"))
+
+# Журнал изменений для реплик (.cache/journal.sqlite3, /api/changes):
+# включён ли он в этом процессе и сколько последних записей хранить.
+# Реплика, отставшая больше чем на JOURNAL_MAX_ENTRIES, забирает снимок базы.
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "true").lower() in ("1", "true", "yes")
+JOURNAL_PATH = CACHE_DIR / "journal.sqlite3"
+JOURNAL_MAX_ENTRIES = int(os.getenv("JOURNAL_MAX_ENTRIES", "100000"))
+
+# Состояние реплики (scripts/follow.py): положение в журнале основного
+# сервера, отставание, время синхронизации и последняя ошибка
+FOLLOWER_STATE_PATH = CACHE_DIR / "follower.json"
+
+# Реплика только для чтения (scripts/follow.py): API отклоняет записи
+READ_ONLY = os.getenv("READ_ONLY", "false").lower() in ("1", "true", "yes")
@@ -0,0 +1,519 @@
+"""
+Потоковая выгрузка базы в ZIP.
+
+Архив формируется «на лету»: дерево BASE_DIR обходится лениво,
+каждый файл сжимается кусками, и готовые байты сразу отдаются клиенту.
+Память ограничена размером куска и не зависит от размера базы.
+
+Кроме того, модуль ведёт материализованный снимок архива
+(.cache/snapshot/): он собирается один раз и раздаётся как обычный файл
+(ETag, If-None-Match, Range), пока запись в базу не сменит «поколение».
+Сборка идёт под своей flock-блокировкой (storage.file_lock), так что
+воркеры gunicorn не собирают снимок одновременно, а подмена архива и его
+открытие — под короткой блокировкой снимка. API отдаёт устаревший снимок
+сразу и пересобирает его в фоне (не чаще раза в заданный интервал);
+заменённый архив со своими метаданными хранится ещё SNAPSHOT_GRACE_SEC,
+чтобы докачка по If-Range с его ETag продолжалась.
+
+Запись «живых» файлов (SNAPSHOT_LIVE_FILES — активная игра, которую табло
+пишет каждые несколько секунд) поколение не меняет.
+
+Дельта-выгрузка (since=<version>) содержит только файлы, изменённые
+после указанного момента, а удалённые файлы перечисляются в db_info.json
+(поле "deleted"). Удаления фиксируются в журнале .cache/tombstones.ndjson.
+
+Формат архива совместим с scripts/import_db.py:
+  hockey-json/db_info.json
+  hockey-json/<остальная структура>
+"""
+
+import datetime
+import hashlib
+import os
+import secrets
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from . import journal, jsoncodec
+from .precompress import is_sibling
+from .storage import file_lock, is_temp
+
+ARCHIVE_ROOT = "hockey-json"
+
+# Размер куска чтения файла / отдачи клиенту
+CHUNK_SIZE = 64 * 1024
+
+# Порог, после которого запись помечается как ZIP64 заранее
+# (при потоковой записи размер нельзя «дописать» в заголовок задним числом)
+_ZIP64_THRESHOLD = int(zipfile.ZIP64_LIMIT * 0.9)
+
+
+class _ChunkSink:
+    """
+    Поток без seek() для zipfile: копит записанные байты,
+    которые генератор забирает через drain().
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+DB_INFO_FILENAME = "db_info.json"
+
+
+def build_db_info(version: Optional[float] = None) -> Dict:
+    """
+    Описание архива. version — момент начала выгрузки (unix-время);
+    его можно передать как since, чтобы в следующий раз получить дельту.
+    """
+    if version is None:
+        version = time.time()
+    return {
+        "schemaVersion": 1,
+        "generatedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "root": ARCHIVE_ROOT,
+        "version": version,
+    }
+
+
+def iter_db_files(
+    base_dir: str,
+    exclude_dirs: Tuple[str, ...] = (),
+    min_mtime: Optional[float] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Лениво обходит base_dir и отдаёт пары (полный путь, имя в архиве).
+    Каталоги из exclude_dirs (абсолютные пути) пропускаются целиком.
+    min_mtime — отдавать только файлы, изменённые не раньше этого момента.
+    """
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [
+            d for d in dirs
+            if os.path.join(root, d) not in exclude_dirs
+        ]
+        for name in files:
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, base_dir)
+            if rel_path == DB_INFO_FILENAME:
+                # db_info.json от предыдущего импорта: в архиве он свой
+                continue
+            if is_sibling(name):
+                # Предсжатые .gz/.br восстанавливаются из самих JSON
+                continue
+            if is_temp(name):
+                # Незавершённая запись: файл появится под своим именем
+                continue
+            if min_mtime is not None:
+                try:
+                    if os.stat(full_path).st_mtime < min_mtime:
+                        continue
+                except FileNotFoundError:
+                    continue
+            arcname = os.path.join(ARCHIVE_ROOT, rel_path).replace("\\", "/")
+            yield full_path, arcname
+
+
+def stream_db_zip(
+    base_dir: str,
+    exclude_dirs: Tuple[str, ...] = (),
+    info: Optional[Dict] = None,
+    min_mtime: Optional[float] = None,
+) -> Iterator[bytes]:
+    """
+    Генератор ZIP-архива базы: отдаёт байты архива кусками по мере сжатия.
+    info — содержимое db_info.json (по умолчанию build_db_info()),
+    min_mtime — см. iter_db_files (для дельта-выгрузки).
+    """
+    sink = _ChunkSink()
+    if info is None:
+        info = build_db_info()
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(
+            f"{ARCHIVE_ROOT}/{DB_INFO_FILENAME}",
+            jsoncodec.dumps(info, compact=False)
+        )
+        yield sink.drain()
+
+        for full_path, arcname in iter_db_files(base_dir, exclude_dirs, min_mtime):
+            try:
+                zinfo = zipfile.ZipInfo.from_file(full_path, arcname=arcname)
+                src = open(full_path, "rb")
+            except FileNotFoundError:
+                # Файл удалили между обходом каталога и чтением
+                continue
+
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with src, zf.open(
+                zinfo, "w", force_zip64=zinfo.file_size > _ZIP64_THRESHOLD
+            ) as dst:
+                while True:
+                    block = src.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    dst.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Центральный каталог пишется при закрытии архива
+    data = sink.drain()
+    if data:
+        yield data
+
+
+# ---------- Материализованный снимок ----------
+
+SNAPSHOT_GENERATION_FILE = "generation"
+SNAPSHOT_META_FILE = "snapshot.json"
+
+# Версия формата снимка: при изменении формата архива старые снимки
+# пересобираются, даже если база не менялась.
+SNAPSHOT_FORMAT = 3
+
+# Сколько секунд хранить заменённый архив: воркер, который успел прочитать
+# старые метаданные, ещё может его открыть
+SNAPSHOT_GRACE_SEC = 600
+
+# Короткая блокировка: чтение метаданных, подмена и открытие архива
+SNAPSHOT_LOCK = "snapshot"
+# Долгая блокировка: сборка архива (один сборщик на все процессы)
+SNAPSHOT_BUILD_LOCK = "snapshot-build"
+
+# Файлы «живого» состояния: их запись не делает снимок устаревшим
+SNAPSHOT_LIVE_FILES = ("active_game.json",)
+
+
+def affects_snapshot(rel_path: str) -> bool:
+    """Меняет ли запись файла rel_path (относительно BASE_DIR) содержимое снимка."""
+    return rel_path.replace("\\", "/") not in SNAPSHOT_LIVE_FILES
+
+
+def _write_text_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(f"{path.name}.{secrets.token_hex(4)}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def snapshot_generation(snapshot_dir: Path) -> str:
+    """
+    Текущее «поколение» базы. Меняется при записи (кроме SNAPSHOT_LIVE_FILES),
+    снимок с другим поколением считается устаревшим.
+    """
+    path = snapshot_dir / SNAPSHOT_GENERATION_FILE
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        _write_text_atomic(path, secrets.token_hex(8))
+        return path.read_text(encoding="utf-8").strip()
+
+
+def invalidate_snapshot(snapshot_dir: Path) -> None:
+    """Помечает снимок устаревшим (файл поколения общий для всех воркеров)."""
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    _write_text_atomic(snapshot_dir / SNAPSHOT_GENERATION_FILE, secrets.token_hex(8))
+
+
+def _archive_meta_name(name: str) -> str:
+    """Метаданные архива hockey-db-<sha16>.zip лежат рядом: hockey-db-<sha16>.json."""
+    return name[:-len(".zip")] + ".json"
+
+
+def _load_snapshot_meta(snapshot_dir: Path, meta_name: str = SNAPSHOT_META_FILE) -> Optional[Dict]:
+    try:
+        meta = jsoncodec.load(snapshot_dir / meta_name)
+    except Exception:
+        return None
+    if not isinstance(meta, dict) or not (snapshot_dir / str(meta.get("file"))).is_file():
+        return None
+    return meta
+
+
+def _prune_snapshots(snapshot_dir: Path, current: str, previous: Optional[str]) -> None:
+    """
+    Удаляет архивы (с их метаданными), заменённые больше SNAPSHOT_GRACE_SEC
+    назад. Момент замены — mtime архива: previous (только что заменённый) «трогаем».
+    """
+    if previous and previous != current:
+        try:
+            os.utime(snapshot_dir / previous)
+        except FileNotFoundError:
+            pass
+    now = time.time()
+    for entry in snapshot_dir.glob("hockey-db-*.zip"):
+        if entry.name == current:
+            continue
+        try:
+            if now - entry.stat().st_mtime > SNAPSHOT_GRACE_SEC:
+                entry.unlink()
+                (snapshot_dir / _archive_meta_name(entry.name)).unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+
+
+def _is_current(meta: Optional[Dict], generation: str) -> bool:
+    return (
+        meta is not None
+        and meta.get("format") == SNAPSHOT_FORMAT
+        and meta.get("generation") == generation
+    )
+
+
+def _build_snapshot(
+    base_dir: str,
+    snapshot_dir: Path,
+    exclude_dirs: Tuple[str, ...],
+    generation: str,
+) -> Dict:
+    """
+    Собирает архив во временный файл (без блокировки снимка: текущий архив
+    тем временем отдаётся), затем под SNAPSHOT_LOCK публикует его.
+    """
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    tmp = snapshot_dir / f"build-{secrets.token_hex(4)}.zip.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp.open("wb") as out:
+            for chunk in stream_db_zip(base_dir, exclude_dirs):
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        name = f"hockey-db-{sha256[:16]}.zip"
+
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "generation": generation,
+            "file": name,
+            "sha256": sha256,
+            "size": size,
+            "createdAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "builtAt": time.time(),
+        }
+        meta_text = jsoncodec.dumps(meta, compact=False).decode("utf-8")
+
+        with file_lock(SNAPSHOT_LOCK):
+            previous = _load_snapshot_meta(snapshot_dir)
+            tmp.replace(snapshot_dir / name)
+            _write_text_atomic(snapshot_dir / _archive_meta_name(name), meta_text)
+            _write_text_atomic(snapshot_dir / SNAPSHOT_META_FILE, meta_text)
+            _prune_snapshots(snapshot_dir, name, previous.get("file") if previous else None)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return meta
+
+
+def _refresh_snapshot(base_dir: str, snapshot_dir: Path, exclude_dirs: Tuple[str, ...]) -> Dict:
+    """Пересобирает снимок, если он устарел. Вызывается под SNAPSHOT_BUILD_LOCK."""
+    # Поколение — до сборки: записи во время сборки сделают снимок устаревшим
+    generation = snapshot_generation(snapshot_dir)
+    meta = _load_snapshot_meta(snapshot_dir)
+    if _is_current(meta, generation):
+        return meta
+    return _build_snapshot(base_dir, snapshot_dir, exclude_dirs, generation)
+
+
+_background_build: Optional[threading.Thread] = None
+_background_lock = threading.Lock()
+
+
+def _rebuild_in_background(base_dir: str, snapshot_dir: Path, exclude_dirs: Tuple[str, ...]) -> None:
+    """Фоновая пересборка: одна на процесс; если собирает другой процесс — пропускаем."""
+    global _background_build
+
+    def run():
+        try:
+            with file_lock(SNAPSHOT_BUILD_LOCK, blocking=False):
+                _refresh_snapshot(base_dir, snapshot_dir, exclude_dirs)
+        except BlockingIOError:
+            pass
+        except Exception as e:
+            print(f"[WARN] Не удалось пересобрать снимок базы: {e}")
+
+    with _background_lock:
+        if _background_build is not None and _background_build.is_alive():
+            return
+        _background_build = threading.Thread(target=run, name="snapshot-build", daemon=True)
+        _background_build.start()
+
+
+def open_snapshot(
+    base_dir: str,
+    snapshot_dir: Path,
+    exclude_dirs: Tuple[str, ...] = (),
+    rebuild_interval_sec: Optional[float] = None,
+) -> Tuple[BinaryIO, Dict]:
+    """
+    Возвращает (открытый на чтение архив, метаданные) снимка.
+    Архив открывается под блокировкой: сборка в другом воркере не может
+    удалить его между проверкой и open(). Закрыть файл — забота вызывающего.
+
+    rebuild_interval_sec=None — нужен актуальный снимок, устаревший
+    пересобирается в этом потоке. Иначе устаревший снимок отдаётся как есть,
+    а пересборка запускается в фоне, если снимку не меньше rebuild_interval_sec.
+    Синхронная сборка остаётся, только когда снимка ещё нет.
+    """
+    exclude_dirs = tuple(exclude_dirs) + (str(snapshot_dir),)
+
+    with file_lock(SNAPSHOT_LOCK):
+        generation = snapshot_generation(snapshot_dir)
+        meta = _load_snapshot_meta(snapshot_dir)
+        if _is_current(meta, generation):
+            return open(snapshot_dir / meta["file"], "rb"), meta
+        if (
+            rebuild_interval_sec is not None
+            and meta is not None
+            and meta.get("format") == SNAPSHOT_FORMAT
+        ):
+            if time.time() - meta.get("builtAt", 0) >= rebuild_interval_sec:
+                _rebuild_in_background(base_dir, snapshot_dir, exclude_dirs)
+            return open(snapshot_dir / meta["file"], "rb"), meta
+
+    with file_lock(SNAPSHOT_BUILD_LOCK):
+        _refresh_snapshot(base_dir, snapshot_dir, exclude_dirs)
+
+    with file_lock(SNAPSHOT_LOCK):
+        # Мог успеть опубликоваться ещё более новый архив — отдаём текущий
+        meta = _load_snapshot_meta(snapshot_dir)
+        return open(snapshot_dir / meta["file"], "rb"), meta
+
+
+def open_snapshot_version(snapshot_dir: Path, sha256: str) -> Optional[Tuple[BinaryIO, Dict]]:
+    """
+    Архив с заданным sha256 (ETag), если он ещё хранится — текущий или
+    заменённый меньше SNAPSHOT_GRACE_SEC назад. Нужен для докачки по If-Range
+    после того, как в фоне опубликован новый снимок.
+    """
+    if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+        return None
+    with file_lock(SNAPSHOT_LOCK):
+        meta = _load_snapshot_meta(snapshot_dir, _archive_meta_name(f"hockey-db-{sha256[:16]}.zip"))
+        if meta is None or meta.get("sha256") != sha256:
+            return None
+        return open(snapshot_dir / meta["file"], "rb"), meta
+
+
+# ---------- Дельта-выгрузка ----------
+
+TOMBSTONES_FILE = "tombstones.ndjson"
+
+
+def _tombstones_lock():
+    # flock, а не threading.Lock: журнал дописывают воркеры API и пересборка
+    # в отдельном процессе, а prune перезаписывает его целиком
+    return file_lock(TOMBSTONES_FILE)
+
+
+def record_deletion(cache_dir: Path, rel_path: str) -> None:
+    """
+    Фиксирует удаление файла (путь относительно BASE_DIR) для дельта-выгрузок
+    и в журнале изменений для реплик.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    line = jsoncodec.dumps(
+        {"path": rel_path.replace("\\", "/"), "deletedAt": time.time()},
+        compact=True,
+    ).decode("utf-8")
+    with _tombstones_lock():
+        with open(cache_dir / TOMBSTONES_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    journal.record_delete(rel_path)
+
+
+def load_deletions_since(cache_dir: Path, base_dir: str, since: float) -> List[str]:
+    """
+    Пути, удалённые после since и не созданные заново.
+    """
+    deleted: Dict[str, float] = {}
+    try:
+        with open(cache_dir / TOMBSTONES_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = jsoncodec.loads(line)
+                except ValueError:
+                    continue
+                if item.get("deletedAt", 0) >= since:
+                    deleted[item["path"]] = item["deletedAt"]
+    except FileNotFoundError:
+        return []
+
+    return sorted(
+        path for path in deleted
+        if not os.path.exists(os.path.join(base_dir, path))
+    )
+
+
+def prune_tombstones(cache_dir: Path, older_than: float) -> None:
+    """Удаляет из журнала записи старше older_than (unix-время)."""
+    path = cache_dir / TOMBSTONES_FILE
+    with _tombstones_lock():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        kept = []
+        for line in lines:
+            try:
+                if jsoncodec.loads(line).get("deletedAt", 0) >= older_than:
+                    kept.append(line)
+            except ValueError:
+                continue
+        if len(kept) != len(lines):
+            _write_text_atomic(path, "".join(kept))
+
+
+def stream_db_delta_zip(
+    base_dir: str,
+    cache_dir: Path,
+    since: float,
+    exclude_dirs: Tuple[str, ...] = (),
+) -> Iterator[bytes]:
+    """
+    ZIP с файлами, изменёнными начиная с since, и списком удалённых в db_info.json.
+    """
+    info = build_db_info()
+    info["delta"] = True
+    info["since"] = since
+    info["deleted"] = load_deletions_since(cache_dir, base_dir, since)
+    return stream_db_zip(base_dir, exclude_dirs, info=info, min_mtime=since)
+
+
+def parse_since(value: str) -> float:
+    """
+    Разбирает since: число (version из db_info.json, unix-время)
+    или ISO-дата (без часового пояса считается UTC).
+    Бросает ValueError при неверном формате.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
@@ -0,0 +1,264 @@
+"""
+Поисковый индекс завершённых игр в памяти (для /api/games).
+
+Строится из тех же вкладов игр, что и finished/<season>/index.json
+(scripts/rebuild_indexes.build_game_entry): сначала берутся готовые вклады
+из кэша пересборки .cache/games/<season>.json, заново разбираются только
+файлы, которых там нет или которые изменились.
+
+Инвертированные списки: сезон, арена, команда, игрок, автор гола ->
+множество игр. Игры дополнительно упорядочены по дате, так что фильтр
+по диапазону дат — это бинарный поиск.
+
+Обновление:
+- upload/delete в этом процессе сразу вызывают update_file()/remove_file();
+- изменения из других воркеров замечаются при запросе по mtime каталога
+  сезона и файла кэша пересборки (stat, без чтения игр).
+"""
+
+import bisect
+import datetime
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Поля, по которым строятся инвертированные списки
+POSTING_FIELDS = ("season", "arena", "team", "player", "scorer")
+
+
+def _key(value: str) -> str:
+    return value.strip().casefold()
+
+
+def parse_date_bound(value: str, end: bool = False) -> float:
+    """
+    Граница диапазона дат: ISO-дата или дата-время.
+    Для end=True дата без времени включает весь день.
+    Бросает ValueError при неверном формате.
+    """
+    dt = datetime.datetime.fromisoformat(value.strip())
+    if end and len(value.strip()) == 10:
+        dt += datetime.timedelta(days=1)
+        return dt.timestamp() - 1e-6
+    return dt.timestamp()
+
+
+class GamesIndex:
+    def __init__(self, base_dir: str):
+        self._finished_dir = os.path.join(base_dir, "finished")
+        self._base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+        # Сезон -> версия (mtime_ns каталога, mtime_ns кэша пересборки)
+        self._season_versions: Dict[str, Tuple[int, int]] = {}
+        # Путь игры (finished/<season>/<file>) -> (mtime_ns, size) — и для
+        # нечитаемых файлов, чтобы не разбирать их на каждом запросе
+        self._files: Dict[str, Tuple[int, int]] = {}
+        # Путь игры -> запись результата (meta + season) и ключ сортировки
+        self._games: Dict[str, Dict] = {}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {
+            field: {} for field in POSTING_FIELDS
+        }
+        # Игры по возрастанию (дата, путь); пересчитывается лениво
+        self._order: Optional[List[Tuple[float, str]]] = None
+        self._stamps: List[float] = []
+
+    # ---------- публичный интерфейс ----------
+
+    def refresh(self) -> None:
+        """Досканирует сезоны, изменившиеся с прошлого раза."""
+        from scripts import rebuild_indexes
+
+        try:
+            seasons = sorted(
+                name for name in os.listdir(self._finished_dir)
+                if os.path.isdir(os.path.join(self._finished_dir, name))
+            )
+        except FileNotFoundError:
+            seasons = []
+
+        with self._lock:
+            for season in set(self._season_versions) - set(seasons):
+                self._drop_season(season)
+
+            for season in seasons:
+                version = self._season_version(season, rebuild_indexes)
+                if self._season_versions.get(season) != version:
+                    self._scan_season(season, rebuild_indexes)
+                    self._season_versions[season] = version
+
+    def update_file(self, abs_path: str) -> None:
+        """Переиндексирует одну игру после записи (в этом процессе)."""
+        from scripts import rebuild_indexes
+
+        game_file = Path(abs_path)
+        season = game_file.parent.name
+        with self._lock:
+            if season not in self._season_versions:
+                # Сезон ещё не сканировался — его подхватит refresh()
+                return
+            self._index_file(game_file, None, rebuild_indexes)
+
+    def remove_file(self, abs_path: str) -> None:
+        """Убирает игру из индекса после удаления файла."""
+        rel = self._rel(Path(abs_path))
+        with self._lock:
+            self._forget(rel)
+
+    def query(
+        self,
+        season: Optional[str] = None,
+        arena: Optional[str] = None,
+        teams: Iterable[str] = (),
+        players: Iterable[str] = (),
+        scorers: Iterable[str] = (),
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict]]:
+        """
+        Игры, подходящие под все фильтры, от новых к старым.
+        Возвращает (общее число найденных, страница результатов).
+        """
+        self.refresh()
+
+        with self._lock:
+            filters = [("season", season), ("arena", arena)]
+            filters += [("team", v) for v in teams]
+            filters += [("player", v) for v in players]
+            filters += [("scorer", v) for v in scorers]
+
+            candidates: Optional[Set[str]] = None
+            postings = []
+            for field, value in filters:
+                if value is None:
+                    continue
+                postings.append(self._postings[field].get(_key(value), set()))
+            # Пересекаем от самого короткого списка
+            for ids in sorted(postings, key=len):
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return 0, []
+
+            order, stamps = self._ordered()
+            lo = 0 if date_from is None else bisect.bisect_left(stamps, date_from)
+            hi = len(order) if date_to is None else bisect.bisect_right(stamps, date_to)
+
+            matched = [
+                rel for _, rel in reversed(order[lo:hi])
+                if candidates is None or rel in candidates
+            ]
+            page = [dict(self._games[rel]["game"]) for rel in matched[offset:offset + limit]]
+            return len(matched), page
+
+    # ---------- внутреннее (вызывается под self._lock) ----------
+
+    def _rel(self, game_file: Path) -> str:
+        return game_file.relative_to(self._base_dir).as_posix()
+
+    def _season_version(self, season: str, rebuild_indexes) -> Tuple[int, int]:
+        try:
+            dir_mtime = os.stat(os.path.join(self._finished_dir, season)).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = 0
+        try:
+            cache_mtime = rebuild_indexes.season_cache_path(season).stat().st_mtime_ns
+        except FileNotFoundError:
+            cache_mtime = 0
+        return dir_mtime, cache_mtime
+
+    def _scan_season(self, season: str, rebuild_indexes) -> None:
+        season_dir = Path(self._finished_dir) / season
+        prefix = f"finished/{season}/"
+        cache = rebuild_indexes.load_season_cache(season)
+
+        try:
+            game_files = rebuild_indexes.list_game_files(season_dir)
+        except FileNotFoundError:
+            game_files = []
+
+        present = set()
+        for game_file in game_files:
+            present.add(self._rel(game_file))
+            self._index_file(game_file, cache.get(game_file.name), rebuild_indexes)
+
+        for rel in [r for r in self._files if r.startswith(prefix) and r not in present]:
+            self._forget(rel)
+
+    def _drop_season(self, season: str) -> None:
+        prefix = f"finished/{season}/"
+        for rel in [r for r in self._files if r.startswith(prefix)]:
+            self._forget(rel)
+        self._season_versions.pop(season, None)
+
+    def _index_file(self, game_file: Path, cached: Optional[Dict], rebuild_indexes) -> None:
+        rel = self._rel(game_file)
+        try:
+            st = game_file.stat()
+        except FileNotFoundError:
+            self._forget(rel)
+            return
+
+        version = (st.st_mtime_ns, st.st_size)
+        if self._files.get(rel) == version:
+            return
+
+        if cached and (cached.get("mtime_ns"), cached.get("size")) == version:
+            entry = cached.get("entry")
+        else:
+            try:
+                raw = game_file.read_bytes()
+            except OSError:
+                return
+            entry = rebuild_indexes.parse_game_file(game_file, raw, self._base_dir)
+
+        self._forget(rel)
+        self._files[rel] = version
+        if entry is None:
+            return
+
+        season = game_file.parent.name
+        meta = entry["meta"]
+        game = dict(meta)
+        game["season"] = season
+        sort_ts = rebuild_indexes.parse_iso_date(meta.get("date") or "", st.st_mtime)
+
+        keys = {
+            "season": {season},
+            "arena": {meta.get("arena") or ""},
+            "team": {meta.get("teamRed") or "", meta.get("teamWhite") or ""},
+            "player": set(entry["players"]) | set(entry.get("teams") or {}),
+            "scorer": {
+                name for name, delta in entry["players"].items() if delta.get("goals")
+            },
+        }
+        keys = {field: {_key(v) for v in values if v} for field, values in keys.items()}
+        for field, values in keys.items():
+            for value in values:
+                self._postings[field].setdefault(value, set()).add(rel)
+
+        self._games[rel] = {"game": game, "sortTs": sort_ts, "keys": keys}
+        self._order = None
+
+    def _forget(self, rel: str) -> None:
+        self._files.pop(rel, None)
+        record = self._games.pop(rel, None)
+        if record is None:
+            return
+        for field, values in record["keys"].items():
+            postings = self._postings[field]
+            for value in values:
+                ids = postings.get(value)
+                if ids is not None:
+                    ids.discard(rel)
+                    if not ids:
+                        del postings[value]
+        self._order = None
+
+    def _ordered(self) -> Tuple[List[Tuple[float, str]], List[float]]:
+        if self._order is None:
+            self._order = sorted((g["sortTs"], rel) for rel, g in self._games.items())
+            self._stamps = [ts for ts, _ in self._order]
+        return self._order, self._stamps
@@ -0,0 +1,212 @@
+"""
+Хранилище «чёрного ящика» /api/upload-json.
+
+Запись идёт в шард текущего дня:
+    incoming/<YYYY-MM-DD>/<YYYY-MM-DDTHH-MM-SS>_<rand>.json
+
+Закрытые дни (раньше сегодняшнего) сворачиваются в один сегмент:
+    incoming/<YYYY-MM-DD>.ndjson.gz
+— по строке {"file": <имя исходного файла>, "data": <JSON>} на запись,
+в порядке поступления. После этого каталог дня удаляется, а удаления
+попадают в журнал для дельта-выгрузок.
+
+Старые файлы прямо в incoming/ (до шардирования) сворачиваются так же —
+по дате из имени файла.
+
+Сжатие запускается при открытии нового дня (первая запись дня) и
+скриптом scripts/compact_incoming.py. Одновременно работает только один
+процесс сжатия (storage.file_lock без ожидания).
+"""
+
+import datetime
+import gzip
+import os
+import re
+import secrets
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from . import jsoncodec
+from .db_export import record_deletion
+from .precompress import remove_siblings
+from .storage import file_lock, write_bytes
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+COMPACT_LOCK = "incoming-compact"
+
+DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+PathLike = Union[str, Path]
+
+
+def today() -> str:
+    return datetime.datetime.now().strftime("%Y-%m-%d")
+
+
+def is_day(value: str) -> bool:
+    return bool(DAY_RE.match(value or ""))
+
+
+def new_record_path(incoming_dir: PathLike) -> Tuple[Path, bool]:
+    """
+    Путь для новой записи в шарде текущего дня и признак того,
+    что эта запись открыла новый день (каталог дня только что создан).
+    Имя файла — как раньше, <timestamp>_<rand>.json.
+    """
+    now = datetime.datetime.now()
+    day_dir = Path(incoming_dir) / now.strftime("%Y-%m-%d")
+    opened = not day_dir.is_dir()
+    day_dir.mkdir(parents=True, exist_ok=True)
+    return day_dir / f"{now.strftime('%Y-%m-%dT%H-%M-%S')}_{secrets.token_hex(3)}.json", opened
+
+
+def segment_path(incoming_dir: PathLike, day: str) -> Path:
+    return Path(incoming_dir) / f"{day}{SEGMENT_SUFFIX}"
+
+
+def _record_line(name: str, raw: bytes) -> bytes:
+    try:
+        data = jsoncodec.loads(raw)
+    except ValueError:
+        # Запись повреждена — сохраняем как есть, строкой
+        data = raw.decode("utf-8", errors="replace")
+    return jsoncodec.dumps({"file": name, "data": data}, compact=True) + b"\n"
+
+
+def _closed_day_files(incoming_dir: Path, current_day: str) -> Dict[str, List[Path]]:
+    """Файлы закрытых дней: каталоги дней и старые файлы в корне incoming/."""
+    days: Dict[str, List[Path]] = {}
+    for entry in incoming_dir.iterdir():
+        if entry.is_dir() and is_day(entry.name) and entry.name < current_day:
+            days.setdefault(entry.name, []).extend(
+                p for p in entry.iterdir() if p.is_file() and p.suffix == ".json"
+            )
+        elif entry.is_file() and entry.suffix == ".json":
+            day = entry.name[:10]
+            if is_day(day) and day < current_day:
+                days.setdefault(day, []).append(entry)
+    return days
+
+
+def _read_segment_lines(path: Path) -> List[bytes]:
+    lines: List[bytes] = []
+    try:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    lines.append(line if line.endswith(b"\n") else line + b"\n")
+    except FileNotFoundError:
+        pass
+    return lines
+
+
+def _compact_day(incoming_dir: Path, base_dir: Path, cache_dir: Path, day: str, files: List[Path]) -> int:
+    segment = segment_path(incoming_dir, day)
+    lines = _read_segment_lines(segment)
+    known = set()
+    for line in lines:
+        try:
+            known.add(jsoncodec.loads(line).get("file"))
+        except (ValueError, AttributeError):
+            continue
+
+    added = 0
+    for path in sorted(files, key=lambda p: p.name):
+        if path.name in known:
+            continue
+        lines.append(_record_line(path.name, path.read_bytes()))
+        known.add(path.name)
+        added += 1
+
+    if added:
+        # mtime=0: одинаковые записи дают одинаковый сегмент
+        write_bytes(segment, gzip.compress(b"".join(lines), mtime=0), siblings=False)
+
+    # Исходные файлы удаляем только после записи сегмента
+    for path in files:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        # У старых файлов в корне incoming/ могли остаться .gz/.br
+        remove_siblings(path)
+        record_deletion(cache_dir, path.relative_to(base_dir).as_posix())
+
+    # Только пустой каталог: запись, начатая до полуночи, не пропадёт
+    try:
+        os.rmdir(incoming_dir / day)
+    except OSError:
+        pass
+    return added
+
+
+def compact_incoming(
+    incoming_dir: PathLike,
+    base_dir: PathLike,
+    cache_dir: PathLike,
+    current_day: Optional[str] = None,
+) -> List[str]:
+    """
+    Сворачивает все закрытые дни в сегменты.
+    Возвращает список обработанных дней (пустой, если делать нечего или
+    сжатие уже идёт в другом процессе).
+    """
+    incoming_dir = Path(incoming_dir)
+    cache_dir = Path(cache_dir)
+    if not incoming_dir.is_dir():
+        return []
+
+    current_day = current_day or today()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with file_lock(COMPACT_LOCK, blocking=False):
+            done = []
+            for day, files in sorted(_closed_day_files(incoming_dir, current_day).items()):
+                added = _compact_day(incoming_dir, Path(base_dir), cache_dir, day, files)
+                print(f"[OK] incoming/{day}: в сегмент добавлено записей {added}")
+                done.append(day)
+            return done
+    except BlockingIOError:
+        # Сжатие уже идёт в другом процессе
+        return []
+
+
+def iter_day_records(incoming_dir: PathLike, day: str) -> Iterator[bytes]:
+    """
+    NDJSON-строки записей дня: сначала из сегмента, затем ещё не свёрнутые
+    файлы дня (текущий день или сжатие ещё не прошло). Читается кусками,
+    без загрузки сегмента в память целиком.
+    """
+    incoming_dir = Path(incoming_dir)
+    seen = set()
+
+    try:
+        with gzip.open(segment_path(incoming_dir, day), "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    seen.add(jsoncodec.loads(line).get("file"))
+                except (ValueError, AttributeError):
+                    pass
+                yield line if line.endswith(b"\n") else line + b"\n"
+    except FileNotFoundError:
+        pass
+
+    pending = []
+    day_dir = incoming_dir / day
+    if day_dir.is_dir():
+        pending.extend(p for p in day_dir.iterdir() if p.suffix == ".json")
+    pending.extend(incoming_dir.glob(f"{day}T*.json"))
+
+    for path in sorted(pending, key=lambda p: p.name):
+        if path.name in seen:
+            continue
+        try:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            # Свернули, пока мы читали сегмент
+            continue
+        yield _record_line(path.name, raw)
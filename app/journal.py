@@ -0,0 +1,200 @@
+"""
+Журнал изменений дерева JSON (.cache/journal.sqlite3) для реплик.
+
+Каждая запись файла базы (app/storage.py) и каждое удаление
+(db_export.record_deletion) добавляют строку с возрастающим seq:
+эндпоинты API, пересборка индексов, скрипты — все пишут через эти две точки.
+Реплика (scripts/follow.py) читает /api/changes?after=<seq> и повторяет
+изменения у себя; содержимое файлов отдаётся из текущего дерева, поэтому
+журнал хранит только пути.
+
+- journal id — случайный идентификатор журнала. Новый журнал (первый
+  запуск, импорт базы подменил .cache) получает новый id, и реплика
+  понимает, что её seq больше ничего не значит.
+- Старые записи удаляются (prune), держим последние JOURNAL_MAX_ENTRIES.
+  Реплика, отставшая сильнее, получает разрыв и забирает снимок базы.
+
+Файлы вне дерева публикации (.cache/, .import-staging/) не журналируются.
+Соединения — своё на каждый поток; подменённый файл журнала открывается
+заново (как в app/catalog.py).
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .config import BASE_DIR, CACHE_DIR, IMPORT_STAGING_DIR, JOURNAL_ENABLED, JOURNAL_PATH
+
+OP_PUT = "put"
+OP_DELETE = "delete"
+
+# Каталоги верхнего уровня, изменения в которых реплике не нужны
+SKIPPED_TOP_DIRS = (CACHE_DIR.name, IMPORT_STAGING_DIR.name)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts       REAL NOT NULL,
+    op       TEXT NOT NULL,
+    path     TEXT NOT NULL,
+    siblings INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+PathLike = Union[str, Path]
+
+
+class JournalGap(Exception):
+    """Запрошенный seq недоступен: записи удалены или журнал сменился."""
+
+
+class Journal:
+    def __init__(self, path: PathLike, base_dir: PathLike):
+        self._path = str(path)
+        self._base_dir = str(base_dir)
+        self._local = threading.local()
+
+    # ---------- соединение ----------
+
+    def _file_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.file_id != self._file_id():
+            # Файл подменён или удалён (импорт базы) — начинается новый журнал
+            conn.close()
+            conn = None
+        if conn is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.executescript(SCHEMA)
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('id', ?)",
+                    (secrets.token_hex(8),),
+                )
+            self._local.conn = conn
+            self._local.file_id = self._file_id()
+            self._local.journal_id = conn.execute(
+                "SELECT value FROM meta WHERE key = 'id'"
+            ).fetchone()[0]
+        return conn
+
+    # ---------- запись ----------
+
+    def _rel(self, path: PathLike) -> Optional[str]:
+        """Путь относительно BASE_DIR или None, если файл журналировать не нужно."""
+        rel = os.path.relpath(os.path.abspath(path), self._base_dir).replace("\\", "/")
+        top = rel.split("/", 1)[0]
+        if top == ".." or top in SKIPPED_TOP_DIRS:
+            return None
+        return rel
+
+    def _append(self, op: str, rel_path: str, siblings: bool) -> None:
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO changes (ts, op, path, siblings) VALUES (?, ?, ?, ?)",
+                (time.time(), op, rel_path, int(siblings)),
+            )
+
+    def record_write(self, path: PathLike, siblings: bool) -> None:
+        """Файл path (абсолютный) записан; siblings — рядом лежат .gz/.br."""
+        rel = self._rel(path)
+        if rel is not None:
+            self._append(OP_PUT, rel, siblings)
+
+    def record_delete(self, rel_path: str) -> None:
+        """Файл rel_path (относительно BASE_DIR) удалён вместе с .gz/.br."""
+        rel = self._rel(os.path.join(self._base_dir, rel_path))
+        if rel is not None:
+            self._append(OP_DELETE, rel, False)
+
+    # ---------- чтение ----------
+
+    def head(self) -> Tuple[str, int]:
+        """(journal id, последний выданный seq; 0 — журнал пуст)."""
+        conn = self.connect()
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return self._local.journal_id, row[0] if row else 0
+
+    def read(self, after: int, limit: int) -> Tuple[str, int, List[Dict]]:
+        """
+        Записи с seq > after (не больше limit) по возрастанию seq.
+        Возвращает (journal id, последний seq журнала, записи).
+        JournalGap — если часть записей после after уже удалена
+        или after больше последнего seq (журнал начат заново).
+        """
+        conn = self.connect()
+        # Одна транзакция чтения: prune из другого процесса не вклинится
+        with conn:
+            conn.execute("BEGIN")
+            journal_id, last = self.head()
+            first = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            rows = conn.execute(
+                "SELECT seq, ts, op, path, siblings FROM changes"
+                " WHERE seq > ? ORDER BY seq LIMIT ?",
+                (after, limit),
+            ).fetchall()
+
+        if after > last:
+            raise JournalGap(f"seq {after} is ahead of the journal (last {last})")
+        if after < last and (first is None or first > after + 1):
+            raise JournalGap(f"changes after seq {after} are no longer kept")
+
+        return journal_id, last, [
+            {"seq": seq, "ts": ts, "op": op, "path": path, "siblings": bool(siblings)}
+            for seq, ts, op, path, siblings in rows
+        ]
+
+    def prune(self, keep: int) -> int:
+        """Удаляет всё, кроме последних keep записей. Возвращает число удалённых."""
+        _, last = self.head()
+        conn = self.connect()
+        with conn:
+            cur = conn.execute("DELETE FROM changes WHERE seq <= ?", (last - keep,))
+        return cur.rowcount
+
+
+_journal: Optional[Journal] = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> Optional[Journal]:
+    """Общий журнал процесса или None, если журнал выключен (JOURNAL_ENABLED)."""
+    global _journal
+    if not JOURNAL_ENABLED:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal(JOURNAL_PATH, BASE_DIR)
+        return _journal
+
+
+def record_write(path: PathLike, siblings: bool) -> None:
+    journal = get_journal()
+    if journal is not None:
+        journal.record_write(path, siblings)
+
+
+def record_delete(rel_path: str) -> None:
+    journal = get_journal()
+    if journal is not None:
+        journal.record_delete(rel_path)
@@ -0,0 +1,106 @@
+"""
+Единый JSON-кодек сервера.
+
+Все чтения и записи JSON (API, пересборка, экспорт) идут через этот модуль:
+- бэкенд — orjson, если установлен, иначе stdlib json (JSON_BACKEND);
+- dumps() возвращает UTF-8 байты: либо с отступом 2 (как раньше), либо
+  компактно — для файлов, которые читают только программы (JSON_COMPACT).
+
+Вывод orjson с отступом совпадает с json.dumps(..., ensure_ascii=False,
+indent=2) для данных табло (строки, целые, списки, словари). То, что orjson
+не умеет (нестроковые ключи, целые больше 64 бит), сериализуется stdlib.
+
+Нечисловые значения float ведут себя одинаково в обоих бэкендах: NaN и
+Infinity во входных данных — ошибка разбора (ValueError, в API — 400:
+это не JSON по RFC 8259), а при сериализации nan/inf пишутся как null
+(так делает orjson; stdlib приводится к тому же).
+"""
+
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from . import metrics
+from .config import JSON_BACKEND, JSON_COMPACT
+
+try:  # orjson — необязательная зависимость
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+if JSON_BACKEND == "json" or orjson is None:
+    BACKEND = "json"
+else:
+    BACKEND = "orjson"
+
+PathLike = Union[str, Path]
+
+
+def _replace_non_finite(obj: Any) -> Any:
+    """Копия obj, в которой nan/inf заменены на None (как пишет orjson)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _replace_non_finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(value) for value in obj]
+    return obj
+
+
+def _stdlib_dumps(obj: Any, compact: bool) -> bytes:
+    if compact:
+        options = {"separators": (",", ":")}
+    else:
+        options = {"indent": 2}
+    try:
+        text = json.dumps(obj, ensure_ascii=False, allow_nan=False, **options)
+    except ValueError:
+        # nan/inf: обход только в этом редком случае
+        text = json.dumps(_replace_non_finite(obj), ensure_ascii=False, allow_nan=False, **options)
+    return text.encode("utf-8")
+
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f"Non-finite number {name} is not valid JSON")
+
+
+def dumps(obj: Any, compact: Optional[bool] = None) -> bytes:
+    """
+    Сериализует obj в UTF-8 байты.
+    compact=None — по настройке JSON_COMPACT (для публикуемых файлов),
+    True/False — явно (служебные файлы всегда компактные).
+    """
+    if compact is None:
+        compact = JSON_COMPACT
+    t0 = time.perf_counter()
+    payload = None
+    if BACKEND == "orjson":
+        try:
+            payload = orjson.dumps(obj) if compact else orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass
+    if payload is None:
+        payload = _stdlib_dumps(obj, compact)
+    metrics.observe("hockey_json_serialize_seconds", time.perf_counter() - t0)
+    return payload
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Разбирает JSON из байтов или строки. Ошибка формата — ValueError."""
+    t0 = time.perf_counter()
+    try:
+        if BACKEND == "orjson":
+            return orjson.loads(data)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data, parse_constant=_reject_constant)
+    finally:
+        metrics.observe("hockey_json_parse_seconds", time.perf_counter() - t0)
+
+
+def load(path: PathLike) -> Any:
+    """Читает и разбирает JSON-файл."""
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,149 @@
+"""
+Live-лента активной игры через Server-Sent Events.
+
+Клиент подключается к /api/live/active-game и сразу получает текущее
+состояние active_game.json, дальше — только изменения. Идентификатор
+события — версия файла (mtime_ns), поэтому после переподключения с
+Last-Event-ID повторно отправляется только то, что клиент ещё не видел.
+
+Запись в этом же процессе будит подписчиков сразу (notify()), записи из
+других воркеров gunicorn замечаются по stat() файла раз в poll_sec.
+Ожидающий подписчик держит поток gthread-воркера, поэтому число
+одновременных подключений ограничено (max_streams): остальные потоки
+остаются записям табло. open() сверх лимита возвращает None — API
+отвечает 503 с Retry-After.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+from . import jsoncodec
+
+EVENT_NAME = "active-game"
+
+
+class LiveStream:
+    """
+    Тело SSE-ответа, занимающее слот подключения. WSGI-сервер вызывает
+    close() по окончании ответа (в том числе при обрыве связи) — слот
+    освобождается, даже если генератор так и не начал работу.
+    """
+
+    def __init__(self, messages: Iterator[str], release: Callable[[], None]):
+        self._messages = messages
+        self._release = release
+        self._closed = False
+
+    def __iter__(self) -> Iterator[str]:
+        return self._messages
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._messages.close()
+        self._release()
+
+
+class ActiveGameFeed:
+    def __init__(
+        self,
+        path: str,
+        poll_sec: float = 0.5,
+        heartbeat_sec: float = 15.0,
+        max_stream_sec: float = 600.0,
+        max_streams: int = 48,
+    ):
+        self._path = path
+        self._poll_sec = poll_sec
+        self._heartbeat_sec = heartbeat_sec
+        self._max_stream_sec = max_stream_sec
+        self._max_streams = max_streams
+
+        self._streams = 0
+        self._streams_lock = threading.Lock()
+
+        self._cond = threading.Condition()
+        # Последняя подготовленная версия: (id, data) — общая для всех подписчиков
+        self._cached: Optional[Tuple[str, str]] = None
+
+    def notify(self) -> None:
+        """Будит подписчиков после записи active_game.json."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _version(self) -> Optional[str]:
+        try:
+            return str(os.stat(self._path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> Optional[Tuple[str, str]]:
+        """
+        Текущее состояние: (id события, JSON одной строкой) или None,
+        если активной игры нет.
+        """
+        version = self._version()
+        if version is None:
+            return None
+
+        cached = self._cached
+        if cached is not None and cached[0] == version:
+            return cached
+
+        try:
+            data = jsoncodec.load(self._path)
+        except (FileNotFoundError, ValueError):
+            # Файл удалён или записывается прямо сейчас — попробуем позже
+            return cached
+
+        prepared = (version, jsoncodec.dumps(data, compact=True).decode("utf-8"))
+        self._cached = prepared
+        return prepared
+
+    def streams(self) -> int:
+        """Открытых подключений в этом процессе."""
+        return self._streams
+
+    def open(self, last_event_id: Optional[str] = None) -> Optional[LiveStream]:
+        """Новое подключение или None, если все max_streams слотов заняты."""
+        with self._streams_lock:
+            if self._streams >= self._max_streams:
+                return None
+            self._streams += 1
+        return LiveStream(self.stream(last_event_id), self._release)
+
+    def _release(self) -> None:
+        with self._streams_lock:
+            self._streams -= 1
+
+    def stream(self, last_event_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Генератор SSE-сообщений. Завершается через max_stream_sec —
+        EventSource сам переподключится с Last-Event-ID.
+        """
+        sent = last_event_id
+        started = time.monotonic()
+        last_write = started
+
+        yield f"retry: {int(self._poll_sec * 1000) + 2000}\n\n"
+
+        while True:
+            now = time.monotonic()
+            if now - started >= self._max_stream_sec:
+                return
+
+            state = self.current()
+            if state is not None and state[0] != sent:
+                event_id, data = state
+                yield f"id: {event_id}\nevent: {EVENT_NAME}\ndata: {data}\n\n"
+                sent = event_id
+                last_write = now
+            elif now - last_write >= self._heartbeat_sec:
+                yield ": ping\n\n"
+                last_write = now
+
+            with self._cond:
+                self._cond.wait(self._poll_sec)
@@ -0,0 +1,330 @@
+"""
+Метрики API в текстовом формате Prometheus (/api/metrics).
+
+Каждый процесс (воркер gunicorn) копит счётчики и гистограммы в памяти и
+не чаще раза в METRICS_FLUSH_SEC сбрасывает их в
+.cache/metrics/<pid>-<время старта>.json. При сборе воркер, принявший
+запрос, сбрасывает свои значения и суммирует файлы всех воркеров. Файлы
+завершившихся процессов вливаются в dead.json, так что счётчики не убывают
+при перезапуске воркеров. Время старта процесса (из /proc) в имени файла
+отличает живой воркер от файла прежнего процесса с тем же pid — после
+перезапуска контейнера pid начинаются заново, а .cache/metrics остаётся.
+
+Пока enable() не вызван (скрипты вне API), observe()/inc() ничего не делают.
+
+Файлы метрик пишутся stdlib json, а не jsoncodec: кодек сам отчитывается
+сюда о времени сериализации.
+"""
+
+import fcntl
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм (секунды): от долей миллисекунды до минуты
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+DEAD_FILE = "dead.json"
+LOCK_FILE = ".lock"
+
+# Описания метрик: имя -> (тип, справка)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "hockey_http_requests_total": ("counter", "HTTP-запросы по маршруту, методу и коду ответа"),
+    "hockey_http_request_duration_seconds": ("histogram", "Время обработки запроса (до начала отдачи тела)"),
+    "hockey_http_request_bytes_total": ("counter", "Байты тел запросов"),
+    "hockey_http_response_bytes_total": ("counter", "Байты ответов с известной длиной"),
+    "hockey_json_parse_seconds": ("histogram", "Время разбора JSON"),
+    "hockey_json_serialize_seconds": ("histogram", "Время сериализации JSON"),
+    "hockey_disk_write_seconds": ("histogram", "Время записи файла на диск (с предсжатыми копиями)"),
+    "hockey_disk_write_bytes_total": ("counter", "Записанные байты JSON"),
+    "hockey_rebuild_runs_total": ("counter", "Прогоны пересборки индексов"),
+    "hockey_rebuild_failures_total": ("counter", "Неудачные прогоны пересборки"),
+    "hockey_rebuild_duration_seconds": ("histogram", "Длительность пересборки индексов"),
+    "hockey_data_bytes": ("gauge", "Размер каталога данных (верхний уровень BASE_DIR)"),
+    "hockey_data_files": ("gauge", "Число файлов в каталоге данных (верхний уровень BASE_DIR)"),
+    "hockey_follower_seq": ("gauge", "Реплика: применённый seq журнала основного сервера"),
+    "hockey_follower_lag_entries": ("gauge", "Реплика: записей журнала основного сервера не применено"),
+    "hockey_follower_sync_age_seconds": ("gauge", "Реплика: секунд с последней успешной синхронизации"),
+}
+
+_lock = threading.Lock()
+_dir: Optional[Path] = None
+_flush_sec = 1.0
+_last_flush = 0.0
+
+# name -> labels -> значение / [корзины..., сумма, количество]
+_counters: Dict[str, Dict[str, float]] = {}
+_histograms: Dict[str, Dict[str, List[float]]] = {}
+
+
+def enable(metrics_dir: Path, flush_sec: float = 1.0) -> None:
+    """Включает сбор метрик в этом процессе (вызывается API при импорте)."""
+    global _dir, _flush_sec
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    _dir = metrics_dir
+    _flush_sec = flush_sec
+
+
+def enabled() -> bool:
+    return _dir is not None
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if _dir is None:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+    _maybe_flush()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _dir is None:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = [0.0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+                break
+        hist[-2] += value
+        hist[-1] += 1
+    _maybe_flush()
+
+
+# ---------- файлы воркеров ----------
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{secrets.token_hex(4)}.tmp")
+    tmp.write_bytes(payload)
+    tmp.replace(path)
+
+
+def _process_start(pid: int) -> str:
+    """
+    Время старта процесса (тики с загрузки системы, /proc/<pid>/stat)
+    или "", если /proc недоступен или процесса нет.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return ""
+    # Имя процесса в скобках может содержать пробелы — поля считаем после ")"
+    fields = stat.rsplit(b")", 1)[-1].split()
+    return fields[19].decode("ascii") if len(fields) > 19 else ""
+
+
+def _worker_file() -> Path:
+    pid = os.getpid()
+    start = _process_start(pid)
+    return _dir / (f"{pid}-{start}.json" if start else f"{pid}.json")
+
+
+def _parse_worker_file(stem: str) -> Optional[Tuple[int, str]]:
+    """(pid, время старта) из имени файла воркера или None для прочих файлов."""
+    pid, _, start = stem.partition("-")
+    if not pid.isdigit() or not (start == "" or start.isdigit()):
+        return None
+    return int(pid), start
+
+
+def flush() -> None:
+    """Сбрасывает значения этого процесса в <pid>-<время старта>.json."""
+    global _last_flush
+    if _dir is None:
+        return
+    with _lock:
+        payload = json.dumps(
+            {"counters": _counters, "histograms": _histograms}, separators=(",", ":")
+        ).encode("utf-8")
+        _last_flush = time.monotonic()
+    _write_atomic(_worker_file(), payload)
+
+
+def _maybe_flush() -> None:
+    if time.monotonic() - _last_flush >= _flush_sec:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _load(path: Path) -> Dict:
+    try:
+        data = json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _merge_into(total: Dict, data: Dict) -> None:
+    for name, series in (data.get("counters") or {}).items():
+        dst = total["counters"].setdefault(name, {})
+        for key, value in series.items():
+            dst[key] = dst.get(key, 0.0) + value
+    for name, series in (data.get("histograms") or {}).items():
+        dst = total["histograms"].setdefault(name, {})
+        for key, hist in series.items():
+            if len(hist) != len(BUCKETS) + 2:
+                continue
+            cur = dst.setdefault(key, [0.0] * len(hist))
+            for i, value in enumerate(hist):
+                cur[i] += value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_alive(pid: int, start: str) -> bool:
+    """Жив ли процесс, записавший файл: тот же pid и то же время старта."""
+    current = _process_start(pid)
+    if current or start:
+        return current == start
+    # Без /proc остаётся только проверка pid
+    return _pid_alive(pid)
+
+
+def collect() -> Dict:
+    """Суммарные значения всех воркеров (живых и завершившихся)."""
+    flush()
+    total: Dict = {"counters": {}, "histograms": {}}
+    with open(_dir / LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = _load(_dir / DEAD_FILE)
+        dead.setdefault("counters", {})
+        dead.setdefault("histograms", {})
+        folded = False
+
+        for path in _dir.glob("*.json"):
+            worker = _parse_worker_file(path.stem)
+            if worker is None:
+                continue
+            data = _load(path)
+            if _worker_alive(*worker):
+                _merge_into(total, data)
+            else:
+                _merge_into(dead, data)
+                path.unlink()
+                folded = True
+
+        if folded:
+            _write_atomic(_dir / DEAD_FILE, json.dumps(dead, separators=(",", ":")).encode("utf-8"))
+        _merge_into(total, dead)
+    return total
+
+
+# ---------- размер дерева данных ----------
+
+_tree_cache: Tuple[float, Dict[str, Tuple[int, int]]] = (0.0, {})
+
+
+def data_tree_sizes(base_dir: str, ttl_sec: float) -> Dict[str, Tuple[int, int]]:
+    """
+    (байты, файлы) по каталогам верхнего уровня BASE_DIR; файлы в корне — ".".
+    Обход кэшируется на ttl_sec, чтобы частый сбор не гонял os.walk.
+    """
+    global _tree_cache
+    cached_at, sizes = _tree_cache
+    if sizes and time.monotonic() - cached_at < ttl_sec:
+        return sizes
+
+    sizes = {}
+    for entry in os.scandir(base_dir):
+        if entry.is_dir(follow_symlinks=False):
+            total = files = 0
+            for root, _, names in os.walk(entry.path):
+                for name in names:
+                    try:
+                        total += os.lstat(os.path.join(root, name)).st_size
+                    except FileNotFoundError:
+                        continue
+                    files += 1
+            sizes[entry.name] = (total, files)
+        elif entry.is_file(follow_symlinks=False):
+            total, files = sizes.get(".", (0, 0))
+            sizes["."] = (total + entry.stat().st_size, files + 1)
+
+    _tree_cache = (time.monotonic(), sizes)
+    return sizes
+
+
+# ---------- текстовый формат ----------
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _series(name: str, key: str) -> str:
+    return f"{name}{{{key}}}" if key else name
+
+
+def _bucket(key: str, le: str) -> str:
+    return "{" + (f'{key},le="{le}"' if key else f'le="{le}"') + "}"
+
+
+def render(base_dir: str, tree_ttl_sec: float = 60.0, follower: Optional[Dict] = None) -> str:
+    """
+    Все метрики в формате Prometheus text exposition 0.0.4.
+    follower — состояние реплики (seq, lagEntries, syncAgeSec) или None.
+    """
+    total = collect()
+    gauges: Dict[str, Dict[str, float]] = {"hockey_data_bytes": {}, "hockey_data_files": {}}
+    for name, (size, files) in data_tree_sizes(base_dir, tree_ttl_sec).items():
+        key = _labels({"dir": name})
+        gauges["hockey_data_bytes"][key] = size
+        gauges["hockey_data_files"][key] = files
+    for name, field in (
+        ("hockey_follower_seq", "seq"),
+        ("hockey_follower_lag_entries", "lagEntries"),
+        ("hockey_follower_sync_age_seconds", "syncAgeSec"),
+    ):
+        value = (follower or {}).get(field)
+        if isinstance(value, (int, float)):
+            gauges[name] = {"": value}
+
+    lines: List[str] = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for key, hist in sorted(total["histograms"].get(name, {}).items()):
+                cumulative = 0.0
+                for bound, count in zip(BUCKETS, hist):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_bucket(key, str(bound))} {_fmt(cumulative)}")
+                lines.append(f"{name}_bucket{_bucket(key, '+Inf')} {_fmt(hist[-1])}")
+                lines.append(f"{_series(name + '_sum', key)} {_fmt(hist[-2])}")
+                lines.append(f"{_series(name + '_count', key)} {_fmt(hist[-1])}")
+        else:
+            series = gauges.get(name) if kind == "gauge" else total["counters"].get(name, {})
+            for key, value in sorted((series or {}).items()):
+                lines.append(f"{_series(name, key)} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
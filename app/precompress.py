@@ -0,0 +1,58 @@
+"""
+Предсжатые «соседи» опубликованных JSON-файлов.
+
+Рядом с каждым <file>.json пишутся <file>.json.gz (и, если установлен
+модуль brotli и включено в настройках, <file>.json.br). nginx с
+gzip_static отдаёт их клиентам, поддерживающим сжатие, без сжатия на лету.
+
+Соседи пишутся атомарно (временный файл + rename), поэтому nginx никогда
+не отдаёт частично записанный архив.
+"""
+
+import gzip
+import os
+import secrets
+from pathlib import Path
+from typing import Union
+
+from .config import PRECOMPRESS_BROTLI, PRECOMPRESS_GZIP
+
+try:  # brotli — необязательная зависимость
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+SIBLING_SUFFIXES = (".gz", ".br")
+
+PathLike = Union[str, Path]
+
+
+def is_sibling(name: str) -> bool:
+    """Является ли файл предсжатым соседом JSON (file.json.gz / file.json.br)."""
+    return any(name.endswith(".json" + suffix) for suffix in SIBLING_SUFFIXES)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{secrets.token_hex(4)}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_siblings(path: PathLike, data: bytes) -> None:
+    """Пишет .gz/.br рядом с path из уже сериализованных байтов data."""
+    path = str(path)
+    if PRECOMPRESS_GZIP:
+        # mtime=0: одинаковое содержимое даёт одинаковый .gz
+        _write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if PRECOMPRESS_BROTLI and brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(data))
+
+
+def remove_siblings(path: PathLike) -> None:
+    """Удаляет предсжатых соседей path (например, при удалении игры)."""
+    for suffix in SIBLING_SUFFIXES:
+        try:
+            os.remove(f"{path}{suffix}")
+        except FileNotFoundError:
+            pass
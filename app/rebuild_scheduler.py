@@ -0,0 +1,171 @@
+"""
+Планировщик пересборки индексов внутри API-процесса.
+
+Вместо отдельного интерпретатора на каждую запись:
+- запросы копятся и склеиваются (debounce): пересборка стартует, когда
+  после последнего запроса прошло debounce_sec, но не позже max_delay_sec
+  от первого запроса пачки;
+- single-flight: одновременно выполняется не больше одной пересборки,
+  и не больше одной ждёт в очереди (все новые запросы вливаются в неё);
+- пересчитываются только затронутые сезоны.
+"""
+
+import datetime
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from . import metrics
+
+
+class RebuildScheduler:
+    def __init__(
+        self,
+        run: Callable[[Optional[List[str]]], None],
+        debounce_sec: float = 1.0,
+        max_delay_sec: float = 10.0,
+        logger=None,
+    ):
+        """
+        run — функция пересборки; получает список сезонов
+        или None («все сезоны»).
+        """
+        self._run = run
+        self._debounce_sec = debounce_sec
+        self._max_delay_sec = max_delay_sec
+        self._logger = logger
+
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        # Очередь: флаг наличия, сезоны (None = все), время первого/последнего запроса
+        self._pending = False
+        self._pending_seasons: Optional[Set[str]] = set()
+        self._pending_since = 0.0
+        self._last_request = 0.0
+
+        self._running = False
+        self._running_seasons: Optional[List[str]] = None
+
+        self._requests_total = 0
+        self._runs_total = 0
+        self._failures_total = 0
+        self._last_run: Optional[Dict] = None
+
+    # ---------- публичный интерфейс ----------
+
+    def request(self, seasons: Optional[Iterable[str]] = None) -> None:
+        """
+        Ставит пересборку в очередь.
+        seasons=None означает «пересчитать все сезоны».
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._requests_total += 1
+            if not self._pending:
+                self._pending = True
+                self._pending_seasons = set()
+                self._pending_since = now
+            if seasons is None:
+                self._pending_seasons = None
+            elif self._pending_seasons is not None:
+                self._pending_seasons.update(s for s in seasons if s)
+            self._last_request = now
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "runningSeasons": self._running_seasons,
+                "queued": self._pending,
+                "queuedSeasons": self._seasons_repr(self._pending_seasons)
+                if self._pending else [],
+                "requestsTotal": self._requests_total,
+                "runsTotal": self._runs_total,
+                "failuresTotal": self._failures_total,
+                "lastRun": self._last_run,
+            }
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока очередь не опустеет и пересборка не завершится."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # ---------- внутреннее ----------
+
+    @staticmethod
+    def _seasons_repr(seasons: Optional[Set[str]]) -> Optional[List[str]]:
+        return None if seasons is None else sorted(seasons)
+
+    def _ensure_thread(self) -> None:
+        # Вызывается под self._cond. Поток создаётся лениво:
+        # gunicorn форкает воркеры после импорта приложения.
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._loop, name="rebuild-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def _take_batch(self) -> Optional[List[str]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            while True:
+                now = time.monotonic()
+                ready_at = min(
+                    self._last_request + self._debounce_sec,
+                    self._pending_since + self._max_delay_sec,
+                )
+                if now >= ready_at:
+                    break
+                self._cond.wait(ready_at - now)
+
+            seasons = self._seasons_repr(self._pending_seasons)
+            self._pending = False
+            self._pending_seasons = set()
+            self._running = True
+            self._running_seasons = seasons
+            return seasons
+
+    def _loop(self) -> None:
+        while True:
+            seasons = self._take_batch()
+            started_at = datetime.datetime.now(datetime.timezone.utc)
+            t0 = time.monotonic()
+            error = None
+            try:
+                self._run(seasons)
+            except Exception as e:
+                error = str(e)
+                if self._logger is not None:
+                    self._logger.exception("Rebuild failed: %s", e)
+            duration = time.monotonic() - t0
+
+            metrics.inc("hockey_rebuild_runs_total")
+            metrics.observe("hockey_rebuild_duration_seconds", duration)
+            if error is not None:
+                metrics.inc("hockey_rebuild_failures_total")
+
+            with self._cond:
+                self._running = False
+                self._running_seasons = None
+                self._runs_total += 1
+                if error is not None:
+                    self._failures_total += 1
+                self._last_run = {
+                    "seasons": seasons,
+                    "startedAt": started_at.isoformat(),
+                    "durationSec": round(duration, 3),
+                    "ok": error is None,
+                    "error": error,
+                }
+                self._cond.notify_all()
@@ -0,0 +1,137 @@
+"""
+Общий слой записи файлов базы (API и пересборка индексов).
+
+- Запись атомарная: байты пишутся во временный файл рядом с целевым
+  (<file>.<rand>.tmp) и переименовываются поверх. nginx и другие читатели
+  видят либо старый, либо новый файл целиком, но никогда не половину.
+  Файл и каталог сбрасываются на диск (fsync), так что после сбоя питания
+  на месте файла не окажется пустышки.
+- Каждая запись попадает в журнал изменений (app/journal.py) —
+  по нему реплики повторяют изменения базы. Ошибка журнала или метрик
+  после переименования только логируется: данные уже записаны.
+- Блокировки — fcntl.flock на файлах в .cache/locks/, поэтому работают
+  между воркерами gunicorn, пересборкой и скриптами. Блокировка берётся
+  на сезон (season_lock) или на отдельный файл (file_lock): запись
+  в разные сезоны идёт параллельно, в один сезон — по очереди.
+
+flock привязан к открытому файлу, а не к процессу, так что блокировки
+работают и между потоками одного процесса.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import Iterator, Union
+
+from . import journal, jsoncodec, metrics
+from .config import CACHE_DIR
+from .precompress import write_siblings
+
+LOCKS_DIR = CACHE_DIR / "locks"
+
+TEMP_SUFFIX = ".tmp"
+
+PathLike = Union[str, Path]
+
+
+def is_temp(name: str) -> bool:
+    """Временный файл незавершённой записи (не публикуется и не выгружается)."""
+    return name.endswith(TEMP_SUFFIX)
+
+
+def _fsync_dir(dir_path: str) -> None:
+    """Сбрасывает на диск запись каталога (переименование файла в нём)."""
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_bytes(path: PathLike, payload: bytes, siblings: bool = True, source: str = "api") -> None:
+    """
+    Атомарно записывает payload в path (каталоги создаются при необходимости).
+    siblings — писать ли рядом предсжатые .gz/.br для nginx gzip_static.
+    source — метка метрик записи на диск (api / rebuild).
+    """
+    path = str(path)
+    t0 = time.perf_counter()
+    dir_path = os.path.dirname(path)
+    os.makedirs(dir_path, exist_ok=True)
+    tmp = f"{path}.{secrets.token_hex(4)}{TEMP_SUFFIX}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            f.flush()
+            # Данные на диске до переименования: иначе после сбоя питания
+            # переименование может оказаться на диске раньше содержимого
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    _fsync_dir(dir_path)
+    if siblings:
+        write_siblings(path, payload)
+
+    # Файл уже опубликован: сбой журнала или метрик не должен превращать
+    # успешную запись в ошибку вызывающего (HTTP 500)
+    try:
+        journal.record_write(path, siblings)
+    except Exception as e:
+        print(f"[WARN] Не удалось записать в журнал изменений {path}: {e}")
+    try:
+        metrics.observe("hockey_disk_write_seconds", time.perf_counter() - t0, source=source)
+        metrics.inc("hockey_disk_write_bytes_total", len(payload), source=source)
+    except Exception as e:
+        print(f"[WARN] Не удалось обновить метрики записи {path}: {e}")
+
+
+def write_json_file(abs_path: PathLike, data, siblings: bool = True) -> None:
+    """
+    Записывает JSON в файл и рядом — предсжатые .gz/.br для nginx gzip_static.
+    """
+    write_bytes(abs_path, jsoncodec.dumps(data), siblings=siblings)
+
+
+# ---------- Блокировки ----------
+
+def _lock_name(kind: str, key: str) -> str:
+    # Читаемое имя + хэш: разные ключи не сливаются после замены символов
+    safe = re.sub(r"[^\w.-]", "_", key)[:64]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+    return f"{kind}-{safe}-{digest}.lock"
+
+
+@contextlib.contextmanager
+def _flock(name: str, blocking: bool = True) -> Iterator[None]:
+    LOCKS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCKS_DIR / name, "a") as f:
+        # Без ожидания: BlockingIOError, если блокировка занята
+        fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def season_lock(season: str):
+    """
+    Эксклюзивная блокировка сезона: finished/<season>/, stats/<season>/
+    и кэш пересборки сезона.
+    """
+    return _flock(_lock_name("season", season))
+
+
+def file_lock(rel_path: str, blocking: bool = True):
+    """
+    Эксклюзивная блокировка одного файла (путь относительно BASE_DIR).
+    blocking=False — не ждать: занятая блокировка даёт BlockingIOError.
+    """
+    return _flock(_lock_name("file", rel_path.replace("\\", "/")), blocking)
@@ -1,16 +1,59 @@
+import base64
+import hashlib
 import os
-import io
-import json
-import datetime
-import secrets
-import subprocess
-import sys
-import zipfile
+import threading
+import time
 from pathlib import Path
-
-from flask import Flask, request, jsonify, abort, send_file
-
-from .config import BASE_DIR, UPLOAD_API_KEY
+from typing import List, Optional
+
+from flask import Flask, Response, g, request, jsonify, abort
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.wsgi import wrap_file
+from flask.json.provider import DefaultJSONProvider
+
+from .config import (
+    BASE_DIR,
+    CACHE_DIR,
+    DB_SNAPSHOT_ENABLED,
+    DELTA_RETENTION_DAYS,
+    FOLLOWER_STATE_PATH,
+    IMMUTABLE_DIR,
+    IMPORT_STAGING_DIR,
+    JOURNAL_MAX_ENTRIES,
+    LIVE_HEARTBEAT_SEC,
+    LIVE_MAX_STREAM_SEC,
+    LIVE_MAX_STREAMS,
+    LIVE_POLL_SEC,
+    LIVE_RETRY_AFTER_SEC,
+    METRICS_FLUSH_SEC,
+    METRICS_TREE_TTL_SEC,
+    READ_ONLY,
+    REBUILD_DEBOUNCE_SEC,
+    REBUILD_MAX_DELAY_SEC,
+    SNAPSHOT_DIR,
+    SNAPSHOT_REBUILD_INTERVAL_SEC,
+    UPLOAD_API_KEY,
+)
+from .active_events import SEQ_FIELD, ActiveGameEvents, EventError, stored_seq
+from .catalog import get_catalog
+from .db_export import (
+    open_snapshot,
+    open_snapshot_version,
+    invalidate_snapshot,
+    parse_since,
+    prune_tombstones,
+    record_deletion,
+    stream_db_delta_zip,
+    stream_db_zip,
+)
+from .games_index import GamesIndex, parse_date_bound
+from .incoming import compact_incoming, is_day, iter_day_records, new_record_path
+from .journal import OP_PUT, JournalGap, get_journal
+from . import jsoncodec, metrics
+from .live import ActiveGameFeed
+from .precompress import is_sibling, remove_siblings
+from .rebuild_scheduler import RebuildScheduler
+from .storage import file_lock, season_lock, write_bytes, write_json_file
 
 # ============================================
 # НАСТРОЙКИ
@@ -23,12 +66,42 @@ BASE_DIR_STR = str(BASE_DIR)
 # Каталог для «чёрного ящика»
 UPLOAD_DIR = os.path.join(BASE_DIR_STR, "incoming")
 
+# Производные каталоги, которые не попадают в архив базы
+# (восстанавливаются пересборкой после импорта)
+EXPORT_EXCLUDE_DIRS = (str(CACHE_DIR), str(IMMUTABLE_DIR), str(IMPORT_STAGING_DIR))
+
+# Файл активной игры
+ACTIVE_GAME_PATH = os.path.join(BASE_DIR_STR, "active_game.json")
+
+# Размер страницы /api/games: по умолчанию и максимум
+GAMES_QUERY_LIMIT = 50
+GAMES_QUERY_MAX_LIMIT = 500
+
+# Максимум игр в одном запросе /api/upload-finished-games
+BATCH_UPLOAD_MAX_ITEMS = 1000
+
+# /api/changes: записей журнала на страницу (по умолчанию и максимум)
+# и примерный предел объёма содержимого файлов в одном ответе
+CHANGES_QUERY_LIMIT = 500
+CHANGES_QUERY_MAX_LIMIT = 5000
+CHANGES_PAGE_BYTES = 8 * 1024 * 1024
+
 # Ключ для авторизации по заголовку X-Api-Key
 API_KEY = UPLOAD_API_KEY or "3vXjhEr1YvFzgL6gO2fc_"
 
 # ============================================
 
+class CodecJSONProvider(DefaultJSONProvider):
+    """Разбор тел запросов (request.get_json) через общий JSON-кодек."""
+
+    def loads(self, s, **kwargs):
+        return jsoncodec.loads(s)
+
+
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
+
+metrics.enable(CACHE_DIR / "metrics", flush_sec=METRICS_FLUSH_SEC)
 
 
 def ensure_dir(path: str) -> None:
@@ -46,29 +119,64 @@ def save_json_relative(rel_path: str, data: dict) -> str:
     dir_path = os.path.dirname(abs_path)
     ensure_dir(dir_path)
 
-    with open(abs_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json_file(abs_path, data)
 
     return abs_path
 
 
-def trigger_rebuild_indexes() -> None:
+def run_rebuild_indexes(seasons: Optional[List[str]]) -> None:
+    """
+    Пересборка индексов в текущем процессе (вызывается планировщиком).
+    seasons=None — пересчитать все сезоны.
+    """
+    from scripts import rebuild_indexes
+
+    rebuild_indexes.rebuild(seasons)
+    invalidate_snapshot(SNAPSHOT_DIR)
+    prune_tombstones(CACHE_DIR, time.time() - DELTA_RETENTION_DAYS * 86400)
+    journal = get_journal()
+    if journal is not None:
+        journal.prune(JOURNAL_MAX_ENTRIES)
+
+
+live_feed = ActiveGameFeed(
+    ACTIVE_GAME_PATH,
+    poll_sec=LIVE_POLL_SEC,
+    heartbeat_sec=LIVE_HEARTBEAT_SEC,
+    max_stream_sec=LIVE_MAX_STREAM_SEC,
+    max_streams=LIVE_MAX_STREAMS,
+)
+
+
+active_game_events = ActiveGameEvents(
+    ACTIVE_GAME_PATH,
+    write_json_file,
+    lock=lambda: file_lock("active_game.json"),
+)
+
+
+games_index = GamesIndex(BASE_DIR_STR)
+
+
+rebuild_scheduler = RebuildScheduler(
+    run_rebuild_indexes,
+    debounce_sec=REBUILD_DEBOUNCE_SEC,
+    max_delay_sec=REBUILD_MAX_DELAY_SEC,
+    logger=app.logger,
+)
+
+
+def trigger_rebuild_indexes(season: Optional[str] = None, seasons: Optional[List[str]] = None) -> None:
     """
-    Запускает скрипт пересборки индексов в отдельном процессе.
+    Ставит пересборку индексов в очередь планировщика: сезона season,
+    списка seasons или (если не задано ни то, ни другое) всех сезонов.
+    Пачка записей склеивается в один прогон только по затронутым сезонам.
     Ошибки логируем, но на HTTP-ответ не влияем.
     """
+    if season:
+        seasons = [season]
     try:
-        # /opt/hockey-server/app/upload_api.py -> /opt/hockey-server
-        root_dir = Path(__file__).resolve().parent.parent
-        script_path = root_dir / "scripts" / "rebuild_indexes.py"
-
-        # sys.executable укажет на python из venv,
-        # который использует gunicorn.
-        subprocess.Popen(
-            [sys.executable, str(script_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        rebuild_scheduler.request(seasons or None)
     except Exception as e:
         # Не роняем обработчик, просто логируем.
         try:
@@ -78,15 +186,84 @@ def trigger_rebuild_indexes() -> None:
             pass
 
 
+def request_catalog_sync() -> None:
+    """
+    Новый (или пересозданный) SQLite-каталог заполняется полной пересборкой.
+    Запрашивается один раз при старте процесса, а не из обработчиков чтения:
+    пока каталог не заполнен, /api/games отвечает по индексу в памяти.
+    """
+    try:
+        catalog = get_catalog()
+        if catalog is not None and not catalog.synced():
+            app.logger.info("Catalog is not synced yet, requesting a full rebuild")
+            trigger_rebuild_indexes()
+    except Exception as e:
+        app.logger.exception("Failed to check the catalog: %s", e)
+
+
+request_catalog_sync()
+
+
+def trigger_compact_incoming() -> None:
+    """
+    Сворачивает закрытые дни incoming/ в сегменты в фоновом потоке
+    (вызывается первой записью нового дня).
+    """
+    def run():
+        try:
+            if compact_incoming(UPLOAD_DIR, BASE_DIR_STR, CACHE_DIR):
+                invalidate_snapshot(SNAPSHOT_DIR)
+        except Exception as e:
+            app.logger.exception("Failed to compact incoming/: %s", e)
+
+    threading.Thread(target=run, name="incoming-compact", daemon=True).start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Латентность, объём запроса/ответа по маршруту (шаблону URL, не пути)."""
+    started = g.get("request_started")
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    try:
+        metrics.observe(
+            "hockey_http_request_duration_seconds",
+            time.perf_counter() - started,
+            route=route, method=request.method,
+        )
+        metrics.inc(
+            "hockey_http_requests_total",
+            route=route, method=request.method, status=str(response.status_code),
+        )
+        metrics.inc("hockey_http_request_bytes_total", request.content_length or 0, route=route)
+        if response.content_length is not None and not response.is_streamed:
+            metrics.inc("hockey_http_response_bytes_total", response.content_length, route=route)
+    except Exception as e:
+        app.logger.exception("Failed to record metrics: %s", e)
+    return response
+
+
 @app.before_request
 def verify_api_key():
     """Простейшая авторизация по заголовку X-Api-Key.
 
-    Все /api/... требуют ключа, КРОМЕ /api/download-db,
-    который должен быть доступен публично для автоматического импорта базы.
+    Все /api/... требуют ключа, КРОМЕ:
+    - /api/download-db — доступен публично для автоматического импорта базы;
+    - /api/changes     — журнал изменений для реплик (те же данные, что и в архиве);
+    - /api/live/...    — публичные live-ленты (EventSource не умеет
+      передавать заголовки, а данные и так раздаются nginx).
     """
     # Разрешаем публичный доступ к выгрузке базы
-    if request.path == "/api/download-db":
+    if request.path in ("/api/download-db", "/api/changes"):
+        return
+
+    if request.path.startswith("/api/live/"):
         return
 
     key = request.headers.get("X-Api-Key")
@@ -94,30 +271,79 @@ def verify_api_key():
         abort(401)
 
 
+@app.before_request
+def reject_writes_on_replica():
+    """
+    Реплика (READ_ONLY=true) получает изменения только от scripts/follow.py:
+    запись через API разошлась бы с основным сервером.
+    """
+    if READ_ONLY and request.method == "POST":
+        return jsonify({"status": "error", "message": "Read-only replica"}), 403
+
+
+# Эндпоинты, которые пишут только «живые» файлы (db_export.SNAPSHOT_LIVE_FILES):
+# табло шлёт их каждые несколько секунд, снимок из-за них не пересобирается
+LIVE_WRITE_ENDPOINTS = ("upload_active_game", "active_game_event")
+
+
+@app.after_request
+def invalidate_db_snapshot(response):
+    """
+    Успешная запись (POST) меняет базу —
+    снимок для /api/download-db становится устаревшим.
+    """
+    if (
+        request.method == "POST"
+        and response.status_code < 400
+        and request.endpoint not in LIVE_WRITE_ENDPOINTS
+    ):
+        try:
+            invalidate_snapshot(SNAPSHOT_DIR)
+        except Exception as e:
+            app.logger.exception("Failed to invalidate DB snapshot: %s", e)
+    return response
+
+
 # ---------- 1. Универсальный "чёрный ящик" ----------
 
 @app.route("/api/upload-json", methods=["POST"])
 def upload_json():
     """
     Универсальная точка приёма:
-    любой корректный JSON сохраняется в BASE_DIR/incoming/<timestamp>_<rand>.json
-    """
-    ensure_dir(UPLOAD_DIR)
+    любой корректный JSON сохраняется в
+    BASE_DIR/incoming/<YYYY-MM-DD>/<timestamp>_<rand>.json
 
+    Закрытые дни сворачиваются в incoming/<YYYY-MM-DD>.ndjson.gz.
+    Предсжатые копии для шардов не пишутся: это не публикуемые файлы.
+    """
     try:
         data = request.get_json(force=True)
     except Exception:
         return jsonify({"status": "error", "message": "Invalid JSON"}), 400
 
-    now = datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-    rnd = secrets.token_hex(3)
-    filename = f"{now}_{rnd}.json"
-    path = os.path.join(UPLOAD_DIR, filename)
+    path, opened_day = new_record_path(UPLOAD_DIR)
+    write_bytes(path, jsoncodec.dumps(data), siblings=False)
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    if opened_day:
+        trigger_compact_incoming()
 
-    return jsonify({"status": "ok", "file": filename})
+    return jsonify({"status": "ok", "file": f"{path.parent.name}/{path.name}"})
+
+
+@app.route("/api/incoming/<day>", methods=["GET"])
+def read_incoming_day(day: str):
+    """
+    Все записи «чёрного ящика» за день (YYYY-MM-DD) потоком NDJSON:
+    по строке {"file": ..., "data": ...} в порядке поступления —
+    из сегмента дня и ещё не свёрнутых файлов.
+    """
+    if not is_day(day):
+        return jsonify({"status": "error", "message": "Invalid day, expected YYYY-MM-DD"}), 400
+
+    return Response(
+        iter_day_records(UPLOAD_DIR, day),
+        mimetype="application/x-ndjson",
+    )
 
 
 # ---------- 2. Активная игра: active_game.json ----------
@@ -133,14 +359,93 @@ def upload_active_game():
     except Exception:
         return jsonify({"status": "error", "message": "Invalid JSON"}), 400
 
-    target_path = os.path.join(BASE_DIR_STR, "active_game.json")
+    # Номер последнего события читают /api/active-game/events
+    if isinstance(data, dict) and stored_seq(data) is None:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid '{SEQ_FIELD}' (non-negative integer)",
+        }), 400
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with file_lock("active_game.json"):
+        write_json_file(ACTIVE_GAME_PATH, data)
+    live_feed.notify()
 
     return jsonify({"status": "ok", "file": "active_game.json"})
 
 
+@app.route("/api/active-game/events", methods=["POST"])
+def active_game_event():
+    """
+    Принимает одно событие активной игры вместо полного документа:
+
+    { "seq": 7, "type": "goal", "team": "RED",
+      "scorer": "...", "assist1": "...", "assist2": null }
+    { "seq": 8, "type": "undo", "target": "goal" }        # или "rosterChange"
+    { "seq": 9, "type": "rosterChange", "player": "...",
+      "fromTeam": "WHITE", "toTeam": "RED" }
+
+    seq должен быть ровно на 1 больше последнего применённого
+    (lastEventSeq в active_game.json). Повтор или пропуск — 409 с lastSeq,
+    так что повторная отправка после обрыва связи безопасна.
+    """
+    try:
+        data = request.get_json(force=True)
+    except Exception:
+        return jsonify({"status": "error", "message": "Invalid JSON"}), 400
+
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Event must be a JSON object"}), 400
+
+    try:
+        game = active_game_events.apply(data)
+    except EventError as e:
+        body = {"status": "error", "message": e.message}
+        body.update(e.extra)
+        return jsonify(body), e.status
+
+    live_feed.notify()
+
+    return jsonify({
+        "status": "ok",
+        "seq": data["seq"],
+        "finalScore": game.get("finalScore"),
+    })
+
+
+@app.route("/api/live/active-game", methods=["GET"])
+def live_active_game():
+    """
+    Server-Sent Events: текущее состояние active_game.json при подключении,
+    затем — каждое изменение. Поддерживает Last-Event-ID (заголовок
+    или параметр lastEventId) и heartbeat-комментарии.
+
+    Подключение держит поток воркера, поэтому их число ограничено
+    (LIVE_MAX_STREAMS на воркер); сверх лимита — 503 с Retry-After.
+    """
+    last_event_id = (
+        request.headers.get("Last-Event-ID")
+        or request.args.get("lastEventId")
+    )
+
+    stream = live_feed.open(last_event_id)
+    if stream is None:
+        response = jsonify({"status": "error", "message": "Too many live connections"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(LIVE_RETRY_AFTER_SEC)
+        return response
+
+    return Response(
+        stream,
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx не должен буферизовать поток
+            "X-Accel-Buffering": "no",
+            "Access-Control-Allow-Origin": "*",
+        },
+    )
+
+
 # ---------- 3. Глобальный индекс: index.json в корне ----------
 
 @app.route("/api/upload-root-index", methods=["POST"])
@@ -156,8 +461,8 @@ def upload_root_index():
 
     target_path = os.path.join(BASE_DIR_STR, "index.json")
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with file_lock("index.json"):
+        write_json_file(target_path, data)
 
     return jsonify({"status": "ok", "file": "index.json"})
 
@@ -276,8 +581,8 @@ def upload_players_stats():
 
     target_path = os.path.join(season_dir, "players.json")
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with season_lock(season):
+        write_json_file(target_path, data)
 
     return jsonify({"status": "ok", "file": f"stats/{season}/players.json"})
 
@@ -310,8 +615,8 @@ def upload_finished_index():
 
     target_path = os.path.join(season_dir, "index.json")
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with season_lock(season):
+        write_json_file(target_path, data)
 
     return jsonify({"status": "ok", "file": f"finished/{season}/index.json"})
 
@@ -337,19 +642,26 @@ def upload_roster():
     rosters_dir = os.path.join(BASE_DIR_STR, "rosters")
     ensure_dir(rosters_dir)
 
-    for fname in os.listdir(rosters_dir):
-        fpath = os.path.join(rosters_dir, fname)
-        try:
-            if os.path.isfile(fpath):
-                os.remove(fpath)
-        except Exception:
-            pass
-
     filename = "roster.json"
     target_path = os.path.join(rosters_dir, filename)
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # Очистка и запись — под одной блокировкой: параллельная загрузка
+    # из другого воркера не удалит только что записанный файл
+    with file_lock("rosters"):
+        for fname in os.listdir(rosters_dir):
+            fpath = os.path.join(rosters_dir, fname)
+            if fname == filename:
+                # Перезаписывается атомарно — читатели не увидят пропуска
+                continue
+            try:
+                if os.path.isfile(fpath):
+                    os.remove(fpath)
+                    if not is_sibling(fname):
+                        record_deletion(CACHE_DIR, f"rosters/{fname}")
+            except Exception:
+                pass
+
+        write_json_file(target_path, data)
 
     rel_path = f"rosters/{filename}"
     return jsonify({"status": "ok", "file": rel_path})
@@ -357,6 +669,79 @@ def upload_roster():
 
 # ---------- 6. Завершённая игра: finished/<season>/<id>.json ----------
 
+def validate_finished_game(data) -> Optional[str]:
+    """Текст ошибки или None, если игру можно сохранить."""
+    if not isinstance(data, dict):
+        return "Game must be a JSON object"
+
+    season = data.get("season")
+    game_id = data.get("id")
+
+    if not season or not game_id:
+        return "Missing 'season' or 'id' field"
+    if not isinstance(season, str) or not isinstance(game_id, str):
+        return "Fields 'season' and 'id' must be strings"
+    if any("/" in v or "\\" in v or v.startswith(".") for v in (season, game_id)):
+        return "Invalid 'season' or 'id'"
+    return None
+
+
+def store_finished_game(data: dict) -> str:
+    """
+    Кладёт игру в BASE_DIR/finished/<season>/<id>.json и обновляет
+    индекс поиска и каталог. Пересборку не ставит — это делает вызывающий.
+    Возвращает относительный путь файла.
+    """
+    season = data["season"]
+    filename = f"{data['id']}.json"
+
+    season_dir = os.path.join(BASE_DIR_STR, "finished", season)
+    ensure_dir(season_dir)
+
+    target_path = os.path.join(season_dir, filename)
+
+    with season_lock(season):
+        write_json_file(target_path, data)
+
+        try:
+            games_index.update_file(target_path)
+            catalog = get_catalog()
+            if catalog is not None:
+                catalog.sync_file(target_path)
+        except Exception as e:
+            app.logger.exception("Failed to update games index: %s", e)
+
+    return f"finished/{season}/{filename}"
+
+
+def parse_batch_body(raw: bytes) -> Optional[list]:
+    """
+    Тело пакетной загрузки: JSON-массив или NDJSON (игра на строку).
+    Возвращает список элементов; строка NDJSON, которую не удалось
+    разобрать, превращается в ValueError на своём месте.
+    None — тело не похоже ни на массив, ни на NDJSON.
+    """
+    text = raw.lstrip()
+    if not text:
+        return []
+    if text[:1] == b"[":
+        try:
+            items = jsoncodec.loads(text)
+        except ValueError:
+            return None
+        return items if isinstance(items, list) else None
+
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(jsoncodec.loads(line))
+        except ValueError as e:
+            items.append(ValueError(f"Invalid JSON: {e}"))
+    return items
+
+
 @app.route("/api/upload-finished-game", methods=["POST"])
 def upload_finished_game():
     """
@@ -376,28 +761,78 @@ def upload_finished_game():
     except Exception:
         return jsonify({"status": "error", "message": "Invalid JSON"}), 400
 
-    season = data.get("season")
-    game_id = data.get("id")
+    error = validate_finished_game(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
 
-    if not season or not game_id:
-        return jsonify({
-            "status": "error",
-            "message": "Missing 'season' or 'id' field"
-        }), 400
+    rel_path = store_finished_game(data)
+    trigger_rebuild_indexes(data["season"])
 
-    season_dir = os.path.join(BASE_DIR_STR, "finished", season)
-    ensure_dir(season_dir)
+    return jsonify({"status": "ok", "file": rel_path})
 
-    filename = f"{game_id}.json"
-    target_path = os.path.join(season_dir, filename)
 
-    with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+@app.route("/api/upload-finished-games", methods=["POST"])
+def upload_finished_games():
+    """
+    Пакетная загрузка завершённых игр (например, накопленных планшетом
+    без сети). Тело — JSON-массив игр или NDJSON, по игре на строку.
 
-    trigger_rebuild_indexes()
+    Каждая игра проверяется и записывается отдельно, ответ содержит
+    результат по каждому элементу:
 
-    rel_path = f"finished/{season}/{filename}"
-    return jsonify({"status": "ok", "file": rel_path})
+    {
+      "status": "ok",
+      "accepted": 2,
+      "failed": 1,
+      "results": [
+        {"index": 0, "status": "ok", "file": "finished/25-26/<id>.json"},
+        {"index": 1, "status": "error", "message": "Missing 'season' or 'id' field"},
+        ...
+      ]
+    }
+
+    Пересборка ставится одна — после записи всего пакета,
+    по всем затронутым сезонам.
+    """
+    items = parse_batch_body(request.get_data(cache=False))
+    if items is None:
+        return jsonify({
+            "status": "error",
+            "message": "Expected a JSON array or NDJSON"
+        }), 400
+    if len(items) > BATCH_UPLOAD_MAX_ITEMS:
+        return jsonify({
+            "status": "error",
+            "message": f"Too many games in one batch (max {BATCH_UPLOAD_MAX_ITEMS})"
+        }), 413
+
+    results = []
+    seasons = []
+    for index, data in enumerate(items):
+        error = str(data) if isinstance(data, ValueError) else validate_finished_game(data)
+        if error:
+            results.append({"index": index, "status": "error", "message": error})
+            continue
+        try:
+            rel_path = store_finished_game(data)
+        except OSError as e:
+            app.logger.exception("Failed to store finished game: %s", e)
+            results.append({"index": index, "status": "error", "message": f"Failed to write file: {e}"})
+            continue
+        results.append({"index": index, "status": "ok", "file": rel_path})
+        if data["season"] not in seasons:
+            seasons.append(data["season"])
+
+    if seasons:
+        trigger_rebuild_indexes(seasons=seasons)
+
+    accepted = sum(1 for r in results if r["status"] == "ok")
+    return jsonify({
+        "status": "ok",
+        "accepted": accepted,
+        "failed": len(results) - accepted,
+        "results": results,
+    })
 
 
 # ---------- 7. Удаление завершённой игры ----------
@@ -453,17 +888,28 @@ def delete_finished_game():
 
     deleted = False
 
-    if os.path.exists(target_path):
-        try:
-            os.remove(target_path)
-            deleted = True
-        except Exception as e:
-            return jsonify({
-                "status": "error",
-                "message": f"Failed to delete file: {e}"
-            }), 500
-
-    trigger_rebuild_indexes()
+    with season_lock(season or ""):
+        if os.path.exists(target_path):
+            try:
+                os.remove(target_path)
+                remove_siblings(target_path)
+                deleted = True
+                record_deletion(CACHE_DIR, file_rel)
+            except Exception as e:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Failed to delete file: {e}"
+                }), 500
+
+            try:
+                games_index.remove_file(target_path)
+                catalog = get_catalog()
+                if catalog is not None:
+                    catalog.remove_file(target_path)
+            except Exception as e:
+                app.logger.exception("Failed to update games index: %s", e)
+
+    trigger_rebuild_indexes(season)
 
     return jsonify({
         "status": "ok",
@@ -472,12 +918,169 @@ def delete_finished_game():
     })
 
 
+# ---------- 7a. Поиск по завершённым играм ----------
+
+@app.route("/api/games", methods=["GET"])
+def query_games():
+    """
+    Поиск завершённых игр по индексу в памяти (без обхода файлов):
+
+    GET /api/games?season=25-26&arena=...&from=2025-11-01&to=2025-11-30
+                  &player=...&scorer=...&team=...&limit=50&offset=0
+
+    Все фильтры необязательны и объединяются по «И»; player, scorer и team
+    можно повторять. Сравнение без учёта регистра. from/to — ISO-дата
+    или дата-время, to включает указанный день. Игры — от новых к старым,
+    в формате записей finished/<season>/index.json плюс поле season.
+    """
+    args = request.args
+    try:
+        limit = int(args.get("limit", GAMES_QUERY_LIMIT))
+        offset = int(args.get("offset", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'limit' or 'offset'"}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"status": "error", "message": "Invalid 'limit' or 'offset'"}), 400
+    limit = min(limit, GAMES_QUERY_MAX_LIMIT)
+
+    try:
+        date_from = parse_date_bound(args["from"]) if args.get("from") else None
+        date_to = parse_date_bound(args["to"], end=True) if args.get("to") else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'from' or 'to' date"}), 400
+
+    # SQLite-каталог, если включён и уже заполнен; иначе — индекс в памяти
+    query = games_index.query
+    catalog = get_catalog()
+    if catalog is not None and catalog.synced():
+        query = catalog.query_games
+
+    total, games = query(
+        season=args.get("season") or None,
+        arena=args.get("arena") or None,
+        teams=[v for v in args.getlist("team") if v],
+        players=[v for v in args.getlist("player") if v],
+        scorers=[v for v in args.getlist("scorer") if v],
+        date_from=date_from,
+        date_to=date_to,
+        limit=limit,
+        offset=offset,
+    )
+
+    return jsonify({
+        "status": "ok",
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "games": games,
+    })
+
+
+# ---------- 7b. Состояние пересборки индексов ----------
+
+@app.route("/api/rebuild-status", methods=["GET"])
+def rebuild_status():
+    """
+    Состояние планировщика пересборки: идёт ли прогон, что в очереди,
+    длительность и результат последнего прогона, счётчики.
+    На реплике ещё "follower": seq, отставание от основного сервера
+    и давность последней синхронизации (scripts/follow.py).
+    """
+    return jsonify({
+        "status": "ok",
+        "rebuild": rebuild_scheduler.status(),
+        "follower": load_follower_status(),
+    })
+
+
+def load_follower_status() -> Optional[dict]:
+    """
+    Состояние реплики из .cache/follower.json (пишет scripts/follow.py)
+    с вычисленными lagEntries и syncAgeSec; None — сервер не реплика.
+    """
+    try:
+        state = jsoncodec.load(FOLLOWER_STATE_PATH)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(state, dict):
+        return None
+
+    status = {
+        key: state.get(key)
+        for key in ("primary", "journal", "seq", "primarySeq", "syncedAt", "error", "errorAt")
+    }
+    seq, primary_seq = state.get("seq"), state.get("primarySeq")
+    if isinstance(seq, int) and isinstance(primary_seq, int):
+        status["lagEntries"] = max(primary_seq - seq, 0)
+    synced_at = state.get("syncedAt")
+    if isinstance(synced_at, (int, float)):
+        status["syncAgeSec"] = round(max(time.time() - synced_at, 0.0), 1)
+    return status
+
+
+# ---------- 7c. Метрики (Prometheus) ----------
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Метрики всех воркеров в текстовом формате Prometheus:
+    латентность и объём запросов по маршрутам, время разбора/сериализации
+    JSON и записи на диск, прогоны пересборки, размер дерева данных,
+    на реплике — отставание от основного сервера.
+    """
+    return Response(
+        metrics.render(
+            BASE_DIR_STR,
+            tree_ttl_sec=METRICS_TREE_TTL_SEC,
+            follower=load_follower_status(),
+        ),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
 # ---------- 8. Выгрузка всей базы: ZIP hockey-json ----------
 
+def send_snapshot(file, meta: dict) -> Response:
+    """
+    Ответ с уже открытым архивом снимка: ETag / If-None-Match (304)
+    и Range (206). send_file умеет Range только для пути, а путь
+    к снимку без блокировки может устареть.
+    """
+    response = Response(
+        wrap_file(request.environ, file),
+        mimetype="application/zip",
+        direct_passthrough=True,
+        headers={"Content-Disposition": "attachment; filename=hockey-db.zip"},
+    )
+    response.content_length = meta["size"]
+    response.last_modified = os.fstat(file.fileno()).st_mtime
+    response.cache_control.no_cache = True
+    response.set_etag(meta["sha256"])
+    response.headers["X-Content-SHA256"] = meta["sha256"]
+    try:
+        return response.make_conditional(
+            request.environ, accept_ranges=True, complete_length=meta["size"]
+        )
+    except RequestedRangeNotSatisfiable:
+        file.close()
+        raise
+
+
 @app.route("/api/download-db", methods=["GET"])
 def download_db():
     """
     Отдаёт ZIP-архив со всей базой BASE_DIR (как hockey-json/...).
+    Архив формируется потоково: память не растёт с размером базы.
+
+    По умолчанию отдаётся материализованный снимок (.cache/snapshot/):
+    он пересобирается только после записей в базу, поддерживает
+    ETag / If-None-Match (304) и Range-запросы для докачки. Устаревший
+    снимок отдаётся сразу, а новый собирается в фоне; Range с If-Range
+    прежнего ETag получает прежний архив, пока тот хранится.
+
+    ?since=<version или ISO-дата> — дельта: только файлы, изменённые
+    после since, а удалённые перечислены в db_info.json ("deleted").
+    Если since старше журнала удалений, отдаётся полный архив.
     """
     if not os.path.isdir(BASE_DIR_STR):
         return jsonify({
@@ -485,36 +1088,151 @@ def download_db():
             "message": f"DB root not found: {BASE_DIR_STR}"
         }), 500
 
-    buf = io.BytesIO()
-
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        info = {
-            "schemaVersion": 1,
-            "generatedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "root": "hockey-json",
-        }
-        zf.writestr(
-            "hockey-json/db_info.json",
-            json.dumps(info, ensure_ascii=False, indent=2)
-        )
-
-        for root, dirs, files in os.walk(BASE_DIR_STR):
-            for name in files:
-                full_path = os.path.join(root, name)
-                rel_path = os.path.relpath(full_path, BASE_DIR_STR)
-                arcname = os.path.join("hockey-json", rel_path).replace("\\", "/")
-                zf.write(full_path, arcname=arcname)
+    since_raw = request.args.get("since")
+    if since_raw:
+        try:
+            since = parse_since(since_raw)
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid 'since'"}), 400
+
+        if since >= time.time() - DELTA_RETENTION_DAYS * 86400:
+            stream = stream_db_delta_zip(
+                BASE_DIR_STR, CACHE_DIR, since, exclude_dirs=EXPORT_EXCLUDE_DIRS
+            )
+            return Response(
+                stream,
+                mimetype="application/zip",
+                headers={
+                    "Content-Disposition": "attachment; filename=hockey-db-delta.zip"
+                },
+            )
+
+    if DB_SNAPSHOT_ENABLED:
+        try:
+            snapshot = None
+            if request.range is not None and request.if_range.etag:
+                # Докачка начатой загрузки: тот же архив, даже если вышел новый
+                snapshot = open_snapshot_version(SNAPSHOT_DIR, request.if_range.etag)
+            file, meta = snapshot or open_snapshot(
+                BASE_DIR_STR,
+                SNAPSHOT_DIR,
+                exclude_dirs=EXPORT_EXCLUDE_DIRS,
+                rebuild_interval_sec=SNAPSHOT_REBUILD_INTERVAL_SEC,
+            )
+        except Exception as e:
+            app.logger.exception("Failed to build DB snapshot: %s", e)
+        else:
+            return send_snapshot(file, meta)
 
-    buf.seek(0)
+    # Архив собирается и отдаётся кусками (chunked), без буфера в памяти.
+    # Служебный кэш и immutable/ не выгружаем: они восстанавливаются пересборкой.
+    stream = stream_db_zip(BASE_DIR_STR, exclude_dirs=EXPORT_EXCLUDE_DIRS)
 
-    return send_file(
-        buf,
+    return Response(
+        stream,
         mimetype="application/zip",
-        as_attachment=True,
-        download_name="hockey-db.zip",
+        headers={"Content-Disposition": "attachment; filename=hockey-db.zip"},
     )
 
 
+# ---------- 9. Журнал изменений для реплик ----------
+
+def read_change_content(rel_path: str) -> Optional[bytes]:
+    """Текущее содержимое файла базы или None, если его уже нет."""
+    try:
+        with open(os.path.join(BASE_DIR_STR, rel_path), "rb") as f:
+            return f.read()
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+
+
+@app.route("/api/changes", methods=["GET"])
+def list_changes():
+    """
+    Журнал изменений базы для реплик (scripts/follow.py).
+
+    GET /api/changes                             -> {"journal": id, "seq": последний seq}
+    GET /api/changes?after=<seq>&journal=<id>&limit=500
+        -> {"journal": id, "seq": прочитано до, "last": последний seq журнала,
+            "more": bool, "changes": [...]}
+
+    Изменение: {"seq", "op": "put" | "delete", "path"}; у put ещё текущее
+    содержимое файла ("text" — UTF-8 или "base64"), его "sha256" и
+    "siblings" (писать ли рядом .gz/.br). Запись, которую перекрывает
+    более поздняя запись того же файла на этой же странице, пропускается.
+
+    410 — записи после after уже удалены или журнал сменился (другой id,
+    например после импорта базы): реплике нужен снимок /api/download-db.
+    """
+    journal = get_journal()
+    if journal is None:
+        return jsonify({"status": "error", "message": "Change journal is disabled"}), 404
+
+    after_raw = request.args.get("after")
+    if after_raw is None:
+        journal_id, last = journal.head()
+        return jsonify({"status": "ok", "journal": journal_id, "seq": last})
+
+    try:
+        after = int(after_raw)
+        limit = int(request.args.get("limit", CHANGES_QUERY_LIMIT))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'after' or 'limit'"}), 400
+    if after < 0 or limit < 1:
+        return jsonify({"status": "error", "message": "Invalid 'after' or 'limit'"}), 400
+    limit = min(limit, CHANGES_QUERY_MAX_LIMIT)
+
+    expected_id = request.args.get("journal")
+    try:
+        journal_id, last, rows = journal.read(after, limit)
+        if expected_id and expected_id != journal_id:
+            raise JournalGap(f"journal {expected_id} was replaced by {journal_id}")
+    except JournalGap as e:
+        journal_id, last = journal.head()
+        return jsonify({
+            "status": "error",
+            "message": str(e),
+            "journal": journal_id,
+            "seq": last,
+        }), 410
+
+    latest = {row["path"]: row["seq"] for row in rows}
+    changes = []
+    size = 0
+    seq = after
+    for row in rows:
+        if changes and size >= CHANGES_PAGE_BYTES:
+            break
+        seq = row["seq"]
+        if latest[row["path"]] != seq:
+            continue
+        change = {"seq": seq, "op": row["op"], "path": row["path"]}
+        if row["op"] == OP_PUT:
+            payload = read_change_content(row["path"])
+            if payload is None:
+                # Файл удалён позже — это отразит следующая запись журнала
+                continue
+            change["siblings"] = row["siblings"]
+            change["sha256"] = hashlib.sha256(payload).hexdigest()
+            try:
+                change["text"] = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                change["base64"] = base64.b64encode(payload).decode("ascii")
+            size += len(payload)
+        changes.append(change)
+
+    body = {
+        "status": "ok",
+        "journal": journal_id,
+        "seq": seq,
+        "last": last,
+        "more": seq < last,
+        "changes": changes,
+    }
+    # jsoncodec, а не jsonify: кириллица без \uXXXX-экранирования
+    return Response(jsoncodec.dumps(body, compact=True), mimetype="application/json")
+
+
 if __name__ == "__main__":
     # Локальный запуск (для отладки)
     app.run(host="0.0.0.0", port=5001, debug=True)
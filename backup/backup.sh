@@ -16,7 +16,8 @@ TMP_FILE="/tmp/hockey-db-${DATE_STR}.zip"
 
 # 1. Download DB archive from hockey-api via internal Docker network
 echo "[backup] Downloading DB archive from hockey-api..."
-curl -fSL "http://hockey-api:5001/api/download-db" -o "${TMP_FILE}"
+# Сервер отдаёт готовый снимок с поддержкой Range: при обрыве curl докачивает (-C -)
+curl -fSL --retry 5 --retry-delay 5 -C - "http://hockey-api:5001/api/download-db" -o "${TMP_FILE}"
 
 # 2. Upload to Selectel S3 using awscli
 S3_URL="s3://${S3_BUCKET}/${S3_PREFIX}hockey-db-${DATE_STR}.zip"
@@ -22,6 +22,12 @@ fi
 DB_IMPORT_MODE="${DB_IMPORT_MODE:-none}"
 DB_IMPORT_SOURCE="${DB_IMPORT_SOURCE:-}"
 DB_FORCE_RESET="${DB_FORCE_RESET:-false}"
+# Для DB_IMPORT_MODE=url: ожидаемый SHA-256 архива (по умолчанию — опубликованный
+# сервером) и каталог загрузки (незаконченная загрузка продолжается после рестарта)
+DB_IMPORT_SHA256="${DB_IMPORT_SHA256:-}"
+DB_IMPORT_DOWNLOAD_DIR="${DB_IMPORT_DOWNLOAD_DIR:-}"
+# Режим реплики: адрес основного сервера, изменения которого повторяет база
+FOLLOW_PRIMARY_URL="${FOLLOW_PRIMARY_URL:-}"
 
 mkdir -p "$BASE_DIR"
 
@@ -51,7 +57,10 @@ if [ "$SHOULD_INIT" = true ]; then
     }
   elif [ "$DB_IMPORT_MODE" = "url" ] && [ -n "$DB_IMPORT_SOURCE" ]; then
     echo "[INFO] Импорт ZIP по URL: $DB_IMPORT_SOURCE"
-    python /app/scripts/import_db.py "$DB_IMPORT_SOURCE" || {
+    IMPORT_ARGS=()
+    [ -n "$DB_IMPORT_SHA256" ] && IMPORT_ARGS+=(--sha256 "$DB_IMPORT_SHA256")
+    [ -n "$DB_IMPORT_DOWNLOAD_DIR" ] && IMPORT_ARGS+=(--download-dir "$DB_IMPORT_DOWNLOAD_DIR")
+    python /app/scripts/import_db.py "$DB_IMPORT_SOURCE" "${IMPORT_ARGS[@]}" || {
       echo "[ERROR] Импорт ZIP по URL завершился с ошибкой."
       exit 1
     }
@@ -71,5 +80,32 @@ echo "DB_IMPORT_SOURCE: $DB_IMPORT_SOURCE"
 echo "BASE_DIR: $BASE_DIR"
 echo "=========================================="
 
-# Запускаем gunicorn
-exec gunicorn -b 0.0.0.0:5001 "app:create_app()"
+# Реплика: база повторяет основной сервер (первый запуск — снимок),
+# API принимает только чтение.
+if [ -n "$FOLLOW_PRIMARY_URL" ]; then
+  echo "[INFO] Режим реплики, основной сервер: $FOLLOW_PRIMARY_URL"
+  export READ_ONLY=true
+  # follow.py сам повторяет сетевые ошибки; если процесс всё же упал
+  # (неожиданная ошибка, OOM) — перезапускаем, иначе реплика тихо отстаёт.
+  (
+    while true; do
+      code=0
+      python /app/scripts/follow.py "$FOLLOW_PRIMARY_URL" || code=$?
+      echo "[WARN] follow.py завершился (код $code), перезапуск через 5 с"
+      sleep 5
+    done
+  ) &
+fi
+
+# Запускаем gunicorn.
+# gthread: долгие подключения (SSE /api/live/...) держат поток, а не весь воркер.
+# Их число на воркер ограничено LIVE_MAX_STREAMS (по умолчанию 3/4 потоков),
+# чтобы записи табло не ждали в очереди за зрителями.
+GUNICORN_WORKERS="${GUNICORN_WORKERS:-1}"
+GUNICORN_THREADS="${GUNICORN_THREADS:-64}"
+export GUNICORN_THREADS
+exec gunicorn -b 0.0.0.0:5001 \
+  --worker-class gthread \
+  --workers "$GUNICORN_WORKERS" \
+  --threads "$GUNICORN_THREADS" \
+  "app:create_app()"
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Набор бенчмарков сервера на синтетической базе.
+
+1. Генерирует базу (scripts/gen_dataset.py) во временный BASE_DIR.
+2. Замеряет:
+   - полную, пустую инкрементальную и односезонную пересборку индексов;
+   - /api/download-db: потоковый архив (время и пик памяти), сборку
+     снимка, повторную отдачу снимка и ответ 304;
+   - распаковку архива import_db.py (время и пик памяти);
+   - пропускную способность эндпоинтов загрузки через Flask test client.
+3. Печатает результат в JSON (или пишет в --output) — прогоны можно сравнивать.
+
+Пик памяти — по tracemalloc, отдельным проходом (чтобы не искажать время).
+
+Пример:
+    python scripts/bench.py --seasons 3 --games 300 --players 60 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.gen_dataset import generate  # noqa: E402
+
+
+def timed(func: Callable, *args, **kwargs) -> float:
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return round(time.perf_counter() - t0, 4)
+
+
+def peak_memory(func: Callable, *args, **kwargs) -> int:
+    """Пик выделенной Python-памяти (байты) за время вызова."""
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def throughput(count: int, func: Callable[[int], None]) -> Dict:
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            func(i)
+    seconds = time.perf_counter() - t0
+    return {
+        "requests": count,
+        "seconds": round(seconds, 4),
+        "requestsPerSec": round(count / seconds, 1) if seconds else None,
+    }
+
+
+def bench_rebuild(rebuild_indexes, season: str) -> Dict:
+    full = timed(rebuild_indexes.rebuild, None, incremental=False)
+    noop = timed(rebuild_indexes.rebuild, None)
+
+    # Меняем одну игру сезона и пересчитываем только его
+    game_file = sorted(rebuild_indexes.list_game_files(rebuild_indexes.FINISHED_DIR / season))[0]
+    data = json.loads(game_file.read_text(encoding="utf-8"))
+    data["externalEventId"] = "bench"
+    game_file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    single = timed(rebuild_indexes.rebuild, [season])
+
+    return {"fullSec": full, "noopSec": noop, "singleSeasonSec": single}
+
+
+def bench_download(upload_api, db_export) -> Dict:
+    def consume_stream():
+        size = 0
+        for chunk in db_export.stream_db_zip(
+            upload_api.BASE_DIR_STR, exclude_dirs=upload_api.EXPORT_EXCLUDE_DIRS
+        ):
+            size += len(chunk)
+        return size
+
+    stream_sec = timed(consume_stream)
+    stream_peak = peak_memory(consume_stream)
+
+    client = upload_api.app.test_client()
+    db_export.invalidate_snapshot(upload_api.SNAPSHOT_DIR)
+
+    def get(headers=None):
+        response = client.get("/api/download-db", headers=headers or {})
+        response.get_data()
+        response.close()
+        return response
+
+    t0 = time.perf_counter()
+    first = get()
+    cold = time.perf_counter() - t0
+    warm = timed(get)
+    etag = first.headers.get("ETag")
+    not_modified = timed(get, {"If-None-Match": etag}) if etag else None
+
+    return {
+        "streamSec": stream_sec,
+        "streamPeakBytes": stream_peak,
+        "snapshotBuildSec": round(cold, 4),
+        "snapshotServeSec": warm,
+        "notModifiedSec": not_modified,
+        "archiveBytes": int(first.headers.get("Content-Length") or 0),
+    }
+
+
+def bench_import(import_db, upload_api, db_export, work_dir: Path) -> Dict:
+    snapshot, _ = db_export.open_snapshot(
+        upload_api.BASE_DIR_STR, upload_api.SNAPSHOT_DIR,
+        exclude_dirs=upload_api.EXPORT_EXCLUDE_DIRS,
+    )
+    snapshot.close()
+    zip_path = Path(snapshot.name)
+    target = work_dir / "import"
+
+    def extract():
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir(parents=True)
+        import_db.extract_hockey_json(zip_path, target)
+
+    seconds = timed(extract)
+    peak = peak_memory(extract)
+    shutil.rmtree(target, ignore_errors=True)
+    return {"extractSec": seconds, "extractPeakBytes": peak}
+
+
+def bench_uploads(upload_api, season: str, count: int) -> Dict:
+    client = upload_api.app.test_client()
+    headers = {"X-Api-Key": upload_api.API_KEY}
+    game = json.loads(Path(upload_api.ACTIVE_GAME_PATH).read_text(encoding="utf-8"))
+    game["lastEventSeq"] = 0
+
+    def finished(i):
+        doc = dict(game, id=f"bench-{i}", gameId=f"bench-{i}", season=season)
+        client.post("/api/upload-finished-game", json=doc, headers=headers)
+
+    def active(i):
+        client.post("/api/upload-active-game", json=game, headers=headers)
+
+    def black_box(i):
+        client.post("/api/upload-json", json={"i": i, "payload": game}, headers=headers)
+
+    result = {
+        "uploadFinishedGame": throughput(count, finished),
+        "uploadActiveGame": throughput(count, active),
+        "uploadJson": throughput(count, black_box),
+    }
+
+    client.post("/api/upload-active-game", json=game, headers=headers)
+
+    def event(i):
+        client.post(
+            "/api/active-game/events",
+            json={"seq": i + 1, "type": "goal", "team": "RED", "scorer": "Bench"},
+            headers=headers,
+        )
+
+    result["activeGameEvents"] = throughput(count, event)
+    return result
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарки сервера на синтетической базе")
+    parser.add_argument("--seasons", type=int, default=2, help="число сезонов (N)")
+    parser.add_argument("--games", type=int, default=200, help="игр в сезоне (M)")
+    parser.add_argument("--players", type=int, default=40, help="игроков в пуле (K)")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора")
+    parser.add_argument("--uploads", type=int, default=200, help="запросов на каждый эндпоинт загрузки")
+    parser.add_argument("--dir", type=Path, default=None, help="рабочий каталог (по умолчанию временный)")
+    parser.add_argument("--keep", action="store_true", help="не удалять рабочий каталог")
+    parser.add_argument("--output", type=Path, default=None, help="файл для JSON-результата")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    work_dir = args.dir or Path(tempfile.mkdtemp(prefix="hockey-bench-"))
+    base_dir = work_dir / "base"
+    shutil.rmtree(base_dir, ignore_errors=True)
+
+    dataset = generate(base_dir, args.seasons, args.games, args.players, args.seed)
+
+    # Настройки читаются при импорте app.config — задаём их до импорта.
+    # Фоновая пересборка не должна мешать замерам загрузок.
+    os.environ["HOCKEY_BASE_DIR"] = str(base_dir)
+    os.environ["REBUILD_DEBOUNCE_SEC"] = "3600"
+    os.environ["REBUILD_MAX_DELAY_SEC"] = "3600"
+
+    from app import db_export, jsoncodec, upload_api
+    from scripts import import_db, rebuild_indexes
+
+    season = dataset["seasons"][-1]
+    try:
+        results = {
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "jsonBackend": jsoncodec.BACKEND,
+                "rebuildWorkers": rebuild_indexes.REBUILD_WORKERS,
+            },
+            "dataset": dataset,
+            "rebuild": bench_rebuild(rebuild_indexes, season),
+            "downloadDb": bench_download(upload_api, db_export),
+            "importDb": bench_import(import_db, upload_api, db_export, work_dir),
+            "uploads": bench_uploads(upload_api, season, args.uploads),
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    payload = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+        print(f"[OK] Результат записан в {args.output}")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
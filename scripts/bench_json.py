@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк JSON-кодека на реальных протоколах игр.
+
+Читает игры из BASE_DIR/finished/<season>/*.json (или из указанного
+каталога) и для каждого доступного бэкенда (stdlib json, orjson)
+измеряет скорость:
+- разбора (loads),
+- сериализации с отступом 2 (как публикуются файлы по умолчанию),
+- компактной сериализации (JSON_COMPACT=true),
+а также размер компактного вывода относительно вывода с отступом.
+
+Пример:
+    python scripts/bench_json.py
+    python scripts/bench_json.py --dir /var/www/hockey-json/finished --rounds 10
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.config import BASE_DIR  # noqa: E402
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+
+def backends() -> Dict[str, Dict[str, Callable]]:
+    result = {
+        "json": {
+            "loads": lambda b: json.loads(b.decode("utf-8")),
+            "dumps_indent": lambda o: json.dumps(o, ensure_ascii=False, indent=2).encode("utf-8"),
+            "dumps_compact": lambda o: json.dumps(
+                o, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8"),
+        },
+    }
+    if orjson is not None:
+        result["orjson"] = {
+            "loads": orjson.loads,
+            "dumps_indent": lambda o: orjson.dumps(o, option=orjson.OPT_INDENT_2),
+            "dumps_compact": orjson.dumps,
+        }
+    return result
+
+
+def load_samples(root: Path) -> List[bytes]:
+    samples = []
+    for path in sorted(root.glob("*/*.json")):
+        if path.name == "index.json":
+            continue
+        raw = path.read_bytes()
+        try:
+            if isinstance(json.loads(raw.decode("utf-8")), dict):
+                samples.append(raw)
+        except ValueError:
+            continue
+    return samples
+
+
+def measure(func: Callable, items: list, rounds: int) -> float:
+    """Лучшее время одного прохода по items из rounds попыток (сек)."""
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк JSON-кодека на протоколах игр")
+    parser.add_argument(
+        "--dir",
+        type=Path,
+        default=BASE_DIR / "finished",
+        help="каталог finished/ с сезонами (по умолчанию BASE_DIR/finished)",
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="число повторов (берётся лучший)")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    samples = load_samples(args.dir)
+    if not samples:
+        print(f"[WARN] Протоколы игр не найдены в {args.dir}")
+        return
+
+    docs = [json.loads(raw.decode("utf-8")) for raw in samples]
+
+    results = {}
+    for name, codec in backends().items():
+        indent_out = [codec["dumps_indent"](d) for d in docs]
+        compact_out = [codec["dumps_compact"](d) for d in docs]
+        indent_bytes = sum(len(b) for b in indent_out)
+        compact_bytes = sum(len(b) for b in compact_out)
+
+        t_loads = measure(codec["loads"], samples, args.rounds)
+        t_indent = measure(codec["dumps_indent"], docs, args.rounds)
+        t_compact = measure(codec["dumps_compact"], docs, args.rounds)
+
+        results[name] = {
+            "loadsMBps": round(sum(len(b) for b in samples) / t_loads / 1e6, 1),
+            "dumpsIndentMBps": round(indent_bytes / t_indent / 1e6, 1),
+            "dumpsCompactMBps": round(compact_bytes / t_compact / 1e6, 1),
+            "loadsPerSec": round(len(samples) / t_loads),
+            "indentBytes": indent_bytes,
+            "compactBytes": compact_bytes,
+            "compactRatio": round(compact_bytes / indent_bytes, 3),
+        }
+
+    if args.json:
+        print(json.dumps({"files": len(samples), "backends": results}, indent=2))
+        return
+
+    print(f"[INFO] Файлов игр: {len(samples)}, {sum(len(b) for b in samples) / 1e6:.2f} МБ")
+    print(f"{'бэкенд':<8} {'loads МБ/с':>11} {'игр/с':>9} {'indent МБ/с':>11} "
+          f"{'compact МБ/с':>13} {'compact/indent':>15}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['loadsMBps']:>11} {r['loadsPerSec']:>9} {r['dumpsIndentMBps']:>11} "
+              f"{r['dumpsCompactMBps']:>13} {r['compactRatio']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сворачивает закрытые дни «чёрного ящика» incoming/<YYYY-MM-DD>/
+(и старые файлы прямо в incoming/) в сегменты incoming/<YYYY-MM-DD>.ndjson.gz.
+
+API делает это само при первой записи нового дня; скрипт нужен для
+cron и для разовой миграции старого плоского incoming/.
+
+Пример:
+    python scripts/compact_incoming.py
+"""
+
+from pathlib import Path
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.config import BASE_DIR, CACHE_DIR, SNAPSHOT_DIR  # noqa: E402
+from app.db_export import invalidate_snapshot  # noqa: E402
+from app.incoming import compact_incoming  # noqa: E402
+
+
+def main() -> None:
+    incoming_dir = BASE_DIR / "incoming"
+    print(f"[INFO] incoming = {incoming_dir}")
+    days = compact_incoming(incoming_dir, BASE_DIR, CACHE_DIR)
+    if days:
+        invalidate_snapshot(SNAPSHOT_DIR)
+        print(f"[OK] Свёрнуто дней: {len(days)}")
+    else:
+        print("[INFO] Нечего сворачивать (или сжатие уже идёт).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Реплика базы Hockey JSON: повторяет изменения основного сервера.
+
+Основной сервер ведёт журнал изменений (app/journal.py): каждая запись
+файла и каждое удаление — от эндпоинтов API и от пересборки индексов.
+Скрипт читает /api/changes?after=<seq> и применяет изменения к локальному
+BASE_DIR теми же атомарными записями (app/storage.py), так что реплика
+отстаёт на секунды, а трафик пропорционален изменениям. Индексы
+пересобирать не нужно — их записи тоже приходят из журнала.
+
+Положение в журнале (id журнала и seq), отставание от основного сервера,
+время последней синхронизации и последняя ошибка хранятся в
+.cache/follower.json — API реплики показывает их в /api/rebuild-status
+и /api/metrics.
+Первый запуск и разрыв (410: реплика отстала сильнее, чем хранится журнал,
+или основной сервер начал журнал заново после импорта) — полный снимок
+/api/download-db через scripts/import_db.py, затем журнал с момента снимка.
+
+Пример:
+    python scripts/follow.py https://<DOMAIN>
+    python scripts/follow.py https://<DOMAIN> --once   # догнать и выйти
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import http.client
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import jsoncodec  # noqa: E402
+from app.catalog import get_catalog  # noqa: E402
+from app.config import BASE_DIR, CACHE_DIR, FOLLOWER_STATE_PATH, SNAPSHOT_DIR  # noqa: E402
+from app.db_export import affects_snapshot, invalidate_snapshot, record_deletion  # noqa: E402
+from app.journal import OP_DELETE, OP_PUT, SKIPPED_TOP_DIRS  # noqa: E402
+from app.precompress import is_sibling, remove_siblings  # noqa: E402
+from app.storage import is_temp, write_bytes  # noqa: E402
+from scripts.import_db import (  # noqa: E402
+    DOWNLOAD_PARTS,
+    download_to_temp,
+    import_archive,
+    open_url,
+    retry_delay,
+    safe_rel_path,
+)
+from scripts.rebuild_indexes import SEASON_INDEX_FILENAME  # noqa: E402
+
+CHANGES_PATH = "/api/changes"
+DOWNLOAD_PATH = "/api/download-db"
+
+# Положение реплики в журнале основного сервера
+STATE_FILE = FOLLOWER_STATE_PATH
+
+# Пауза между опросами, когда реплика догнала основной сервер
+POLL_INTERVAL_SEC = 1.0
+# Записей журнала на запрос
+PAGE_LIMIT = 500
+
+
+class SnapshotRequired(Exception):
+    """Журнал основного сервера не продолжает локальную копию (ответ 410)."""
+
+
+def api_url(primary: str, path: str, **params) -> str:
+    url = f"{primary}{path}"
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+def fetch_json(url: str) -> Dict:
+    """GET с gzip (nginx сжимает ответы API); 410 — SnapshotRequired."""
+    try:
+        with open_url(url, headers={"Accept-Encoding": "gzip"}) as resp:
+            raw = resp.read()
+            if resp.headers.get("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+    except HTTPError as e:
+        if e.code == 410:
+            try:
+                message = jsoncodec.loads(e.read()).get("message")
+            except (ValueError, AttributeError):
+                message = None
+            raise SnapshotRequired(message or "410 Gone") from None
+        raise
+    data = jsoncodec.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError(f"Неожиданный ответ {url}")
+    return data
+
+
+def load_state(primary: str) -> Optional[Dict]:
+    """Сохранённое положение в журнале этого основного сервера или None."""
+    try:
+        state = jsoncodec.load(STATE_FILE)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("primary") != primary:
+        return None
+    if not isinstance(state.get("journal"), str) or not isinstance(state.get("seq"), int):
+        return None
+    return state
+
+
+def save_state(state: Dict) -> None:
+    write_bytes(STATE_FILE, jsoncodec.dumps(state, compact=True), siblings=False, source="follower")
+
+
+def save_error(primary: str, error: BaseException) -> None:
+    """Последняя ошибка синхронизации — в файл состояния (для API реплики)."""
+    try:
+        state = jsoncodec.load(STATE_FILE)
+    except (FileNotFoundError, ValueError):
+        state = None
+    if not isinstance(state, dict) or state.get("primary") != primary:
+        state = {"primary": primary}
+    state["error"] = f"{type(error).__name__}: {error}"
+    state["errorAt"] = time.time()
+    try:
+        save_state(state)
+    except Exception as e:
+        print(f"[WARN] Не удалось записать состояние реплики: {e}")
+
+
+def bootstrap(primary: str, args: argparse.Namespace) -> Dict:
+    """
+    Полный снимок базы. Положение в журнале запоминается до скачивания:
+    изменения, сделанные во время загрузки, повторятся из журнала
+    (повторное применение безопасно — записи идемпотентны).
+    """
+    head = fetch_json(api_url(primary, CHANGES_PATH))
+    print(f"[INFO] Забираю снимок базы (журнал {head['journal']}, seq {head['seq']})...")
+
+    zip_path = download_to_temp(
+        api_url(primary, DOWNLOAD_PATH), parts=args.parts, download_dir=args.download_dir,
+    )
+    try:
+        import_archive(zip_path, BASE_DIR, workers=args.workers)
+    finally:
+        zip_path.unlink(missing_ok=True)
+
+    state = {"primary": primary, "journal": head["journal"], "seq": head["seq"]}
+    save_state(state)
+    print(f"[OK] Снимок импортирован, продолжаю с seq {state['seq']}")
+    return state
+
+
+def change_target(rel_path) -> Optional[Path]:
+    """Локальный путь изменения или None, если путь недопустим."""
+    if not isinstance(rel_path, str) or not safe_rel_path(rel_path):
+        return None
+    path = Path(rel_path)
+    if path.parts[0] in SKIPPED_TOP_DIRS or is_temp(path.name) or is_sibling(path.name):
+        return None
+    return BASE_DIR / path
+
+
+def change_payload(change: Dict) -> bytes:
+    if "text" in change:
+        payload = change["text"].encode("utf-8")
+    else:
+        payload = base64.b64decode(change.get("base64") or "")
+    if hashlib.sha256(payload).hexdigest() != change.get("sha256"):
+        raise ValueError(f"SHA-256 содержимого не совпадает: {change['path']}")
+    return payload
+
+
+def apply_change(change: Dict) -> bool:
+    """Применяет одно изменение. False — пропущено (некорректное или уже применено)."""
+    target = change_target(change.get("path"))
+    op = change.get("op")
+    if target is None or op not in (OP_PUT, OP_DELETE):
+        print(f"[WARN] Пропускаю некорректное изменение: {change.get('op')!r} {change.get('path')!r}")
+        return False
+
+    if op == OP_PUT:
+        payload = change_payload(change)
+        write_bytes(target, payload, siblings=bool(change.get("siblings")), source="follower")
+        return True
+
+    try:
+        target.unlink()
+    except FileNotFoundError:
+        return False
+    remove_siblings(target)
+    record_deletion(CACHE_DIR, change["path"])
+    return True
+
+
+def is_game_file(rel_path: str) -> bool:
+    parts = rel_path.split("/")
+    return (
+        len(parts) == 3
+        and parts[0] == "finished"
+        and parts[2].endswith(".json")
+        and parts[2] != SEASON_INDEX_FILENAME
+    )
+
+
+def sync_catalog(changes: List[Dict]) -> None:
+    """Обновляет SQLite-каталог реплики (если включён) по изменённым играм."""
+    catalog = get_catalog()
+    if catalog is None:
+        return
+    for change in changes:
+        if not is_game_file(change["path"]):
+            continue
+        game_file = BASE_DIR / change["path"]
+        try:
+            if game_file.is_file():
+                catalog.sync_file(game_file)
+            else:
+                catalog.remove_file(game_file)
+        except Exception as e:
+            print(f"[WARN] Не удалось обновить каталог для {change['path']}: {e}")
+
+
+def apply_page(state: Dict, page: Dict) -> int:
+    """
+    Применяет страницу журнала и сохраняет новое положение.
+    Положение пишется после изменений: при сбое страница применится заново.
+    """
+    applied = [change for change in page.get("changes") or [] if apply_change(change)]
+    if applied:
+        sync_catalog(applied)
+        if any(affects_snapshot(change["path"]) for change in applied):
+            invalidate_snapshot(SNAPSHOT_DIR)
+    state["seq"] = page["seq"]
+    state["primarySeq"] = page.get("last", page["seq"])
+    state["syncedAt"] = time.time()
+    state.pop("error", None)
+    state.pop("errorAt", None)
+    save_state(state)
+    return len(applied)
+
+
+def follow(primary: str, args: argparse.Namespace) -> None:
+    """
+    Основной цикл: страницы журнала подряд, пока есть "more", затем опрос
+    раз в args.interval. Сетевые ошибки — повтор с нарастающей паузой
+    (с --once — выход с ошибкой).
+    """
+    state = load_state(primary)
+    attempt = 0
+    while True:
+        try:
+            if state is None:
+                state = bootstrap(primary, args)
+            page = fetch_json(api_url(
+                primary, CHANGES_PATH,
+                after=state["seq"], journal=state["journal"], limit=args.limit,
+            ))
+            applied = apply_page(state, page)
+        except SnapshotRequired as e:
+            print(f"[WARN] Журнал не продолжает локальную копию ({e.args[0]}) — нужен снимок.")
+            state = None
+            continue
+        except (
+            OSError, http.client.HTTPException, subprocess.SubprocessError,
+            RuntimeError, ValueError, KeyError,
+        ) as e:
+            save_error(primary, e)
+            if args.once:
+                raise
+            delay = retry_delay(attempt)
+            attempt += 1
+            print(f"[WARN] Ошибка синхронизации: {e}; повтор через {delay:.0f} с")
+            time.sleep(delay)
+            continue
+
+        attempt = 0
+        if applied:
+            print(f"[OK] Применено изменений: {applied} (seq {state['seq']})")
+        if page.get("more"):
+            continue
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Реплика базы Hockey JSON по журналу изменений основного сервера",
+    )
+    parser.add_argument("primary", help="адрес основного сервера, например https://<DOMAIN>")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=POLL_INTERVAL_SEC,
+        help=f"пауза между опросами журнала, сек (по умолчанию {POLL_INTERVAL_SEC})",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=PAGE_LIMIT,
+        help=f"записей журнала на запрос (по умолчанию {PAGE_LIMIT})",
+    )
+    parser.add_argument("--once", action="store_true", help="догнать основной сервер и выйти")
+    parser.add_argument(
+        "--parts",
+        type=int,
+        default=DOWNLOAD_PARTS,
+        help="для снимка: параллельных Range-запросов",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="для снимка: потоков распаковки (0 — по числу CPU)",
+    )
+    parser.add_argument(
+        "--download-dir",
+        type=Path,
+        default=None,
+        help="для снимка: каталог загрузки (по умолчанию временный)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    primary = args.primary.rstrip("/")
+    print(f"[INFO] BASE_DIR = {BASE_DIR}")
+    print(f"[INFO] Основной сервер: {primary}")
+    try:
+        follow(primary, args)
+    except Exception as e:
+        # Неожиданная ошибка: процесс завершается (entrypoint перезапустит его),
+        # но причина остаётся в состоянии реплики
+        save_error(primary, e)
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Генератор синтетической базы табло для бенчмарков.
+
+Пишет N сезонов × M игр с пулом из K игроков в формате SPEC_JSON.md
+(finished/<season>/<id>.json, base_roster/base_players.json,
+active_game.json) в указанный каталог. При одинаковом --seed результат
+одинаковый побайтно, так что прогоны бенчмарков можно сравнивать.
+
+Индексы и статистику генератор не пишет — их строит rebuild_indexes.py.
+
+Пример:
+    python scripts/gen_dataset.py /tmp/hockey-bench --seasons 3 --games 200 --players 60
+"""
+
+import argparse
+import datetime
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+ARENAS = ["Пестово Арена", "Лёд Север", "Дворец Спорта", "Арена Юг"]
+
+SURNAMES = [
+    "Павликов", "Коптевский", "Третьяков", "Чижик", "Смирнов", "Иванов",
+    "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков",
+]
+NAMES = ["Олег", "Юрий", "Вадим", "Сергей", "Лев", "Иван", "Пётр", "Алексей"]
+
+FIRST_SEASON_YEAR = 20
+
+
+def player_names(count: int) -> List[str]:
+    names = []
+    for i in range(count):
+        surname = SURNAMES[i % len(SURNAMES)]
+        name = NAMES[(i // len(SURNAMES)) % len(NAMES)]
+        suffix = i // (len(SURNAMES) * len(NAMES))
+        names.append(f"{surname} {name}" + (f" {suffix + 1}" if suffix else ""))
+    return names
+
+
+def season_ids(count: int) -> List[str]:
+    return [
+        f"{FIRST_SEASON_YEAR + i:02d}-{FIRST_SEASON_YEAR + i + 1:02d}"
+        for i in range(count)
+    ]
+
+
+def make_game(rng: random.Random, season: str, index: int, players: List[str]) -> Dict:
+    """Одна завершённая игра сезона в формате SPEC_JSON.md (раздел 1)."""
+    start_year = 2000 + int(season[:2])
+    start = datetime.datetime(start_year, 9, 1, 10, 0, 0)
+    # Игры идут по несколько в день, в хронологическом порядке
+    date = start + datetime.timedelta(hours=8 * index, minutes=rng.randint(0, 59))
+    arena = rng.choice(ARENAS)
+    game_id = f"{date.strftime('%Y-%m-%d_%H-%M-%S')}_g{index}"
+
+    roster = rng.sample(players, min(len(players), rng.randint(10, 20)))
+    half = len(roster) // 2
+    red, white = roster[:half], roster[half:]
+
+    goals = []
+    score = {"RED": 0, "WHITE": 0}
+    for order in range(1, rng.randint(0, 14) + 1):
+        team = rng.choice(("RED", "WHITE"))
+        pool = red if team == "RED" else white
+        score[team] += 1
+        assists = rng.sample(pool, min(len(pool), rng.randint(0, 2)))
+        goals.append({
+            "team": team,
+            "scoreAfter": f"{score['RED']}:{score['WHITE']}",
+            "scorer": rng.choice(pool),
+            "assist1": assists[0] if len(assists) > 0 else None,
+            "assist2": assists[1] if len(assists) > 1 else None,
+            "order": order,
+        })
+
+    changes = []
+    if rng.random() < 0.2 and red:
+        player = rng.choice(red)
+        changes.append({"order": 1, "player": player, "fromTeam": "RED", "toTeam": "WHITE"})
+
+    return {
+        "id": game_id,
+        "gameId": game_id,
+        "arena": arena,
+        "date": date.strftime("%Y-%m-%dT%H:%M:%S"),
+        "season": season,
+        "finished": True,
+        "externalEventId": str(index),
+        "teams": {
+            "RED": {"name": "Красные", "players": red},
+            "WHITE": {"name": "Белые", "players": white},
+        },
+        "finalScore": dict(score),
+        "goals": goals,
+        "rosterChanges": changes,
+    }
+
+
+def write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def generate(base_dir: Path, seasons: int, games: int, players: int, seed: int = 1) -> Dict:
+    """
+    Записывает синтетическую базу в base_dir.
+    Возвращает сводку: сезоны, число игр и файлов, объём в байтах.
+    """
+    rng = random.Random(seed)
+    names = player_names(players)
+    ids = season_ids(seasons)
+
+    total_bytes = 0
+    files = 0
+    for season in ids:
+        for i in range(games):
+            game = make_game(rng, season, i, names)
+            path = base_dir / "finished" / season / f"{game['id']}.json"
+            write_json(path, game)
+            total_bytes += path.stat().st_size
+            files += 1
+
+    write_json(base_dir / "base_roster" / "base_players.json", {
+        "version": 1,
+        "updatedAt": "2025-01-01T00:00:00",
+        "players": [
+            {"user_id": 1000 + i, "full_name": name, "role": "fwd", "team": None, "rating": 1500}
+            for i, name in enumerate(names)
+        ],
+    })
+    write_json(base_dir / "active_game.json", make_game(rng, ids[-1], games, names))
+
+    return {
+        "seasons": ids,
+        "gamesPerSeason": games,
+        "players": players,
+        "seed": seed,
+        "gameFiles": files,
+        "gameBytes": total_bytes,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Генератор синтетической базы табло")
+    parser.add_argument("base_dir", type=Path, help="каталог, куда писать базу")
+    parser.add_argument("--seasons", type=int, default=2, help="число сезонов (N)")
+    parser.add_argument("--games", type=int, default=100, help="игр в сезоне (M)")
+    parser.add_argument("--players", type=int, default=40, help="игроков в пуле (K)")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    summary = generate(args.base_dir, args.seasons, args.games, args.players, args.seed)
+    print(f"[OK] Сгенерировано игр: {summary['gameFiles']} в {args.base_dir}")
+
+
+if __name__ == "__main__":
+    main()
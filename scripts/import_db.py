@@ -15,20 +15,53 @@
   hockey-json/db_info.json
   hockey-json/<остальная структура>
 
-Скрипт:
-  - полностью очищает BASE_DIR,
-  - распаковывает содержимое hockey-json/ в BASE_DIR,
-  - запускает пересборку индексов (scripts.rebuild_indexes.main()).
+Скрипт не трогает рабочую базу, пока новая не готова целиком:
+  - распаковывает содержимое hockey-json/ в промежуточный каталог
+    BASE_DIR/.import-staging/ параллельно (--workers), сверяя CRC-32
+    каждого файла; файлы, совпадающие с рабочей базой (размер и CRC-32),
+    не распаковываются, а переносятся жёсткой ссылкой;
+  - запускает пересборку индексов в отдельном процессе с
+    HOCKEY_BASE_DIR=<промежуточный каталог>;
+  - подменяет каталоги верхнего уровня рабочей базы новыми атомарным
+    обменом (renameat2 RENAME_EXCHANGE, на старых ядрах — два rename),
+    корневой index.json — последним;
+  - удаляет старое содержимое.
+Пока идёт импорт, nginx отдаёт прежнюю базу; при ошибке она остаётся
+нетронутой. Журнал изменений (app/journal.py) после импорта начинается
+заново, реплики (scripts/follow.py) забирают снимок новой базы.
+
+Дельта-архив (/api/download-db?since=..., в db_info.json "delta": true)
+применяется так же, но промежуточный каталог сначала заполняется жёсткими
+ссылками на текущую базу: удалённые файлы из списка "deleted" удаляются,
+изменённые перезаписываются (новым файлом, а не поверх ссылки). С ключом
+--delta в режиме URL к адресу добавляется since=<version> из локального
+BASE_DIR/db_info.json (оставленного предыдущим импортом):
+   python scripts/import_db.py --delta https://example.com/api/download-db
+
+Все записи в базу — атомарные (app/storage.py), поэтому жёсткие ссылки
+безопасны: файл рабочей базы никогда не меняется на месте.
 """
 
+import argparse
+import ctypes
+import errno
+import hashlib
+import http.client
+import re
+import subprocess
 import sys
 import os
+import threading
+import time
 import zipfile
+import zlib
 import tempfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.parse import urlparse
-from urllib.request import urlopen
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlparse
+from urllib.request import Request, urlopen
 import ssl  # для поддержки https с самоподписанным сертификатом
 
 # Импортируем BASE_DIR из app.config
@@ -36,8 +69,57 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from app.config import BASE_DIR  # noqa: E402
-from scripts import rebuild_indexes  # noqa: E402
+from app import jsoncodec  # noqa: E402
+from app.config import BASE_DIR, IMPORT_STAGING_DIR, SNAPSHOT_DIR  # noqa: E402
+from app.db_export import TOMBSTONES_FILE, invalidate_snapshot  # noqa: E402
+from app.precompress import (  # noqa: E402
+    SIBLING_SUFFIXES,
+    is_sibling,
+    remove_siblings,
+    write_siblings,
+)
+from app.storage import TEMP_SUFFIX, file_lock, write_bytes  # noqa: E402
+
+ZIP_PREFIX = "hockey-json/"
+DB_INFO_NAME = "db_info.json"
+
+# Промежуточный каталог импорта внутри BASE_DIR (тот же том — rename
+# атомарен; имя с точкой — nginx его не отдаёт, в архив он не попадает)
+STAGING_DIRNAME = IMPORT_STAGING_DIR.name
+# Куда внутри промежуточного каталога уходят заменённые записи
+REPLACED_DIRNAME = ".replaced"
+
+ROOT_INDEX_NAME = "index.json"
+
+CACHE_DIRNAME = ".cache"
+# Служебные каталоги .cache, которые переживают полный импорт:
+# блокировки (те же inode, что держат воркеры API) и метрики воркеров
+PRESERVED_CACHE_DIRS = ("locks", "metrics")
+# Файлы .cache, которые меняются на месте (дописываются, SQLite):
+# при дельта-импорте копируются, а не связываются жёсткой ссылкой
+COPIED_CACHE_FILES = (TOMBSTONES_FILE,)
+# SQLite-каталог пересборка создаст заново; журнал изменений после импорта
+# начинается с чистого листа (новый id — реплики заберут снимок)
+SKIPPED_CACHE_PREFIXES = ("catalog.sqlite3", "journal.sqlite3")
+
+# Размер блока при распаковке и подсчёте CRC-32
+COPY_CHUNK = 1024 * 1024
+
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+# Скачивание по URL: размер блока Range, число потоков по умолчанию,
+# повторы после обрыва (с экспоненциальной паузой) и таймаут сокета
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_PARTS = 4
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_BACKOFF_SEC = 1.0
+DOWNLOAD_BACKOFF_MAX_SEC = 30.0
+DOWNLOAD_TIMEOUT_SEC = 60
+PROGRESS_INTERVAL_SEC = 2.0
+
+MB = 1024 * 1024
+SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
 
 
 def is_url(s: str) -> bool:
@@ -48,107 +130,688 @@ def is_url(s: str) -> bool:
         return False
 
 
-def download_to_temp(url: str) -> Path:
+def open_url(url: str, headers: Optional[Dict[str, str]] = None, method: str = "GET"):
     """
-    Скачивает файл по URL во временный файл и возвращает путь к нему.
-
-    Для https игнорирует проверку сертификата (актуально для самоподписанных
-    сертификатов на тестовых/внутренних серверах). В боевом окружении
-    рекомендуется использовать нормальный сертификат.
+    Открывает URL. Для https игнорирует проверку сертификата (актуально
+    для самоподписанных сертификатов на тестовых/внутренних серверах).
+    В боевом окружении рекомендуется использовать нормальный сертификат.
     """
-    print(f"[INFO] Скачиваю ZIP по URL: {url}")
-    tmp_fd, tmp_path = tempfile.mkstemp(suffix=".zip")
-    os.close(tmp_fd)  # Закрываем файловый дескриптор, будем писать сами
-
-    parsed = urlparse(url)
     context = None
-    if parsed.scheme == "https":
+    if urlparse(url).scheme == "https":
         # Игнорируем проверку сертификата (self-signed)
         context = ssl._create_unverified_context()
+    request = Request(url, headers=headers or {}, method=method)
+    return urlopen(request, context=context, timeout=DOWNLOAD_TIMEOUT_SEC)
 
-    with urlopen(url, context=context) as resp, open(tmp_path, "wb") as out_f:
-        shutil.copyfileobj(resp, out_f)
 
-    print(f"[OK] Скачано во временный файл: {tmp_path}")
-    return Path(tmp_path)
+def published_sha256(headers) -> Optional[str]:
+    """SHA-256 архива из X-Content-SHA256 или ETag (его ставит /api/download-db)."""
+    value = headers.get("X-Content-SHA256") or ""
+    if not SHA256_RE.match(value):
+        value = (headers.get("ETag") or "").removeprefix("W/").strip('"')
+    return value.lower() if SHA256_RE.match(value) else None
 
 
-def clear_base_dir(base_dir: Path) -> None:
+def probe_download(url: str) -> Dict:
     """
-    Полностью очищает содержимое BASE_DIR,
-    но не удаляет сам каталог BASE_DIR.
+    HEAD-запрос: размер, поддержка Range, ETag и опубликованный SHA-256.
+    Пустой dict — сервер не ответил на HEAD (будет обычное скачивание).
     """
-    if not base_dir.exists():
-        print(f"[INFO] BASE_DIR не существует, создаю: {base_dir}")
-        base_dir.mkdir(parents=True, exist_ok=True)
-        return
+    try:
+        with open_url(url, method="HEAD") as resp:
+            headers = resp.headers
+    except (OSError, http.client.HTTPException) as e:
+        print(f"[WARN] HEAD-запрос не удался ({e}), докачка недоступна.")
+        return {}
+
+    length = headers.get("Content-Length")
+    return {
+        "size": int(length) if length and length.isdigit() else None,
+        "ranges": headers.get("Accept-Ranges", "").lower() == "bytes",
+        "etag": headers.get("ETag"),
+        "sha256": published_sha256(headers),
+    }
+
+
+class DownloadProgress:
+    """Печать прогресса и скорости не чаще раза в PROGRESS_INTERVAL_SEC."""
+
+    def __init__(self, total: Optional[int], done: int = 0):
+        self.total = total
+        self.done = done
+        self._start_done = done
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._lock = threading.Lock()
+
+    def add(self, size: int) -> None:
+        with self._lock:
+            self.done += size
+            now = time.monotonic()
+            if now - self._last_report >= PROGRESS_INTERVAL_SEC:
+                self._last_report = now
+                self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        speed = (self.done - self._start_done) / elapsed / MB
+        if self.total:
+            print(
+                f"[INFO] Скачано {self.done / MB:.1f} из {self.total / MB:.1f} МБ "
+                f"({self.done * 100 // self.total}%), {speed:.2f} МБ/с"
+            )
+        else:
+            print(f"[INFO] Скачано {self.done / MB:.1f} МБ, {speed:.2f} МБ/с")
+
+
+def retry_delay(attempt: int) -> float:
+    return min(DOWNLOAD_BACKOFF_SEC * (2 ** attempt), DOWNLOAD_BACKOFF_MAX_SEC)
+
+
+def fetch_range(url: str, path: Path, start: int, end: int, etag: Optional[str], progress: DownloadProgress) -> None:
+    """
+    Скачивает байты [start, end] в path по тем же смещениям. После обрыва
+    продолжает с последнего полученного байта (до DOWNLOAD_RETRIES повторов).
+    If-Range: если архив на сервере сменился, сервер ответит 200 — ошибка.
+    """
+    pos = start
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        headers = {"Range": f"bytes={pos}-{end}"}
+        if etag:
+            headers["If-Range"] = etag
+        try:
+            with open_url(url, headers) as resp:
+                if resp.status != 206:
+                    raise RuntimeError(
+                        "Сервер не вернул запрошенный диапазон: архив на сервере изменился "
+                        "или докачка не поддерживается. Запустите импорт заново."
+                    )
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    while pos <= end:
+                        data = resp.read(min(COPY_CHUNK, end - pos + 1))
+                        if not data:
+                            raise ConnectionError("соединение закрыто раньше времени")
+                        os.pwrite(fd, data, pos)
+                        pos += len(data)
+                        progress.add(len(data))
+                finally:
+                    os.close(fd)
+            return
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            print(f"[WARN] Обрыв на байте {pos} ({e}), повтор через {delay:.0f} с")
+            time.sleep(delay)
+
+
+def load_download_state(state_path: Path, url: str, info: Dict) -> List[int]:
+    """Номера уже скачанных блоков, если незаконченная загрузка — того же архива."""
+    try:
+        state = jsoncodec.load(state_path)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(state, dict):
+        return []
+    same = (
+        state.get("url") == url
+        and state.get("size") == info["size"]
+        and state.get("etag") == info.get("etag")
+        and state.get("chunkSize") == DOWNLOAD_CHUNK_SIZE
+    )
+    done = state.get("done") if same else None
+    return [i for i in done if isinstance(i, int)] if isinstance(done, list) else []
+
+
+def download_ranges(url: str, info: Dict, parts: int, download_dir: Path) -> Path:
+    """
+    Скачивание блоками по DOWNLOAD_CHUNK_SIZE в parts потоков (Range).
+    Готовые блоки записываются в <file>.part.json, поэтому прерванная
+    загрузка того же архива продолжается с места остановки — и после
+    повторного запуска скрипта.
+    """
+    size = info["size"]
+    key = hashlib.sha256(f"{url}\n{info.get('etag')}\n{size}".encode("utf-8")).hexdigest()[:16]
+    final_path = download_dir / f"hockey-db-{key}.zip"
+    part_path = final_path.with_name(final_path.name + ".part")
+    state_path = final_path.with_name(final_path.name + ".part.json")
+
+    download_dir.mkdir(parents=True, exist_ok=True)
+    done = set(load_download_state(state_path, url, info)) if part_path.exists() else set()
+    if not done:
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+
+    chunks = [
+        (i, i * DOWNLOAD_CHUNK_SIZE, min(size, (i + 1) * DOWNLOAD_CHUNK_SIZE) - 1)
+        for i in range(-(-size // DOWNLOAD_CHUNK_SIZE))
+    ]
+    pending = [c for c in chunks if c[0] not in done]
+    already = sum(end - start + 1 for i, start, end in chunks if i in done)
+    if already:
+        print(f"[INFO] Продолжаю загрузку: уже скачано {already / MB:.1f} МБ")
+
+    progress = DownloadProgress(size, already)
+    state_lock = threading.Lock()
+
+    def fetch(chunk) -> None:
+        index, start, end = chunk
+        fetch_range(url, part_path, start, end, info.get("etag"), progress)
+        with state_lock:
+            done.add(index)
+            write_bytes(state_path, jsoncodec.dumps({
+                "url": url,
+                "etag": info.get("etag"),
+                "size": size,
+                "chunkSize": DOWNLOAD_CHUNK_SIZE,
+                "done": sorted(done),
+            }, compact=True), siblings=False, source="import")
+
+    with ThreadPoolExecutor(max_workers=max(1, parts)) as pool:
+        for _ in pool.map(fetch, pending):
+            pass
+
+    progress.report()
+    os.replace(part_path, final_path)
+    state_path.unlink()
+    return final_path
+
+
+def download_stream(url: str, download_dir: Path) -> Path:
+    """
+    Обычное скачивание одним потоком (сервер не сообщил размер или не
+    поддерживает Range, например дельта-архив). При обрыве — заново.
+    """
+    download_dir.mkdir(parents=True, exist_ok=True)
+    tmp_fd, tmp_name = tempfile.mkstemp(suffix=".zip", dir=download_dir)
+    os.close(tmp_fd)  # Закрываем файловый дескриптор, будем писать сами
+    tmp_path = Path(tmp_name)
+
+    attempt = 0
+    while True:
+        try:
+            with open_url(url) as resp, open(tmp_path, "wb") as out_f:
+                length = resp.headers.get("Content-Length")
+                progress = DownloadProgress(int(length) if length and length.isdigit() else None)
+                for chunk in iter(lambda: resp.read(COPY_CHUNK), b""):
+                    out_f.write(chunk)
+                    progress.add(len(chunk))
+                if progress.total and progress.done != progress.total:
+                    raise ConnectionError("соединение закрыто раньше времени")
+            progress.report()
+            return tmp_path
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == DOWNLOAD_RETRIES:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            delay = retry_delay(attempt)
+            print(f"[WARN] Загрузка прервана ({e}), повтор через {delay:.0f} с")
+            time.sleep(delay)
+            attempt += 1
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_to_temp(
+    url: str,
+    parts: int = DOWNLOAD_PARTS,
+    sha256: Optional[str] = None,
+    download_dir: Optional[Path] = None,
+) -> Path:
+    """
+    Скачивает архив по URL и возвращает путь к файлу.
+
+    Если сервер сообщает размер и поддерживает Range (снимок
+    /api/download-db), архив качается блоками в parts потоков с докачкой
+    после обрывов. Результат сверяется с SHA-256: sha256 (ключ --sha256)
+    или опубликованным сервером (X-Content-SHA256 / ETag). При несовпадении
+    файл удаляется и импорт прерывается.
+    """
+    print(f"[INFO] Скачиваю ZIP по URL: {url}")
+    download_dir = Path(download_dir or tempfile.gettempdir())
+    info = probe_download(url)
+    expected = (sha256 or info.get("sha256") or "").lower() or None
+
+    if info.get("size") and info.get("ranges"):
+        path = download_ranges(url, info, parts, download_dir)
+    else:
+        path = download_stream(url, download_dir)
+
+    if expected:
+        actual = file_sha256(path)
+        if actual != expected:
+            path.unlink()
+            raise RuntimeError(
+                f"SHA-256 скачанного архива не совпадает: ожидался {expected}, получен {actual}"
+            )
+        print(f"[OK] SHA-256 совпадает: {actual}")
+    else:
+        print("[WARN] SHA-256 архива не опубликован и не задан (--sha256) — проверка пропущена.")
+
+    print(f"[OK] Скачано во временный файл: {path}")
+    return path
+
+
+def read_db_info(zip_path: Path) -> dict:
+    """Читает hockey-json/db_info.json из архива (пустой dict, если его нет)."""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        try:
+            with zf.open(ZIP_PREFIX + DB_INFO_NAME) as f:
+                data = jsoncodec.loads(f.read())
+        except KeyError:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def local_db_version(base_dir: Path):
+    """version из db_info.json последнего импорта или None."""
+    info_path = base_dir / DB_INFO_NAME
+    if not info_path.is_file():
+        return None
+    try:
+        return jsoncodec.load(info_path).get("version")
+    except Exception:
+        return None
+
+
+def with_since(url: str, since) -> str:
+    sep = "&" if urlparse(url).query else "?"
+    return f"{url}{sep}{urlencode({'since': since})}"
+
 
-    print(f"[INFO] Очищаю содержимое BASE_DIR: {base_dir}")
-    for entry in base_dir.iterdir():
+def safe_rel_path(rel_path: str) -> bool:
+    parts = Path(rel_path).parts
+    return bool(parts) and not Path(rel_path).is_absolute() and ".." not in parts
+
+
+def apply_deletions(base_dir: Path, deleted) -> None:
+    """Удаляет файлы, перечисленные в дельта-архиве."""
+    for rel_path in deleted or []:
+        if not isinstance(rel_path, str) or not safe_rel_path(rel_path):
+            print(f"[WARN] Пропускаю некорректный путь удаления: {rel_path!r}")
+            continue
+        target = base_dir / rel_path
         try:
-            if entry.is_file() or entry.is_symlink():
-                entry.unlink()
-            elif entry.is_dir():
-                shutil.rmtree(entry)
+            target.unlink()
+            remove_siblings(target)
+            print(f"[INFO] Удалён файл: {rel_path}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            print(f"[WARN] Не удалось удалить {entry}: {e}")
-    print("[OK] BASE_DIR очищен.")
+            print(f"[WARN] Не удалось удалить {target}: {e}")
+
+
+def file_crc32(path: Path) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def is_unchanged(path: Path, member: zipfile.ZipInfo) -> bool:
+    """Совпадает ли файл базы с членом архива (размер и CRC-32)."""
+    try:
+        if path.is_symlink() or path.stat().st_size != member.file_size:
+            return False
+        return file_crc32(path) == member.CRC
+    except OSError:
+        return False
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def link_siblings(src: Path, dst: Path) -> bool:
+    """Переносит предсжатые копии src к dst. False — их нет, нужно сжать заново."""
+    found = False
+    for suffix in SIBLING_SUFFIXES:
+        sibling = Path(f"{src}{suffix}")
+        if sibling.is_file():
+            link_or_copy(sibling, Path(f"{dst}{suffix}"))
+            found = True
+    return found
 
 
-def extract_hockey_json(zip_path: Path, base_dir: Path) -> None:
+def extract_member(zf: zipfile.ZipFile, member: zipfile.ZipInfo, target_path: Path) -> None:
     """
-    Распаковывает содержимое каталога hockey-json/ из ZIP в BASE_DIR.
+    Распаковывает один файл с проверкой CRC-32. Запись атомарная:
+    target_path может быть жёсткой ссылкой на файл рабочей базы.
+    """
+    try:
+        _extract_member(zf, member, target_path)
+    except (zipfile.BadZipFile, zlib.error) as e:
+        raise RuntimeError(f"Повреждён файл архива {member.filename}: {e}") from e
+
+
+def _extract_member(zf: zipfile.ZipFile, member: zipfile.ZipInfo, target_path: Path) -> None:
+    crc = 0
+    if target_path.suffix == ".json":
+        with zf.open(member, "r") as src:
+            data = src.read()
+        crc = zlib.crc32(data)
+        if crc != member.CRC:
+            raise RuntimeError(f"Неверная CRC-32 у {member.filename}")
+        write_bytes(target_path, data, source="import")
+        return
+
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target_path.with_name(f"{target_path.name}.{os.getpid()}{TEMP_SUFFIX}")
+    try:
+        with zf.open(member, "r") as src, open(tmp, "wb") as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+                crc = zlib.crc32(chunk, crc)
+                dst.write(chunk)
+        if crc != member.CRC:
+            raise RuntimeError(f"Неверная CRC-32 у {member.filename}")
+        os.replace(tmp, target_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def extract_hockey_json(
+    zip_path: Path,
+    base_dir: Path,
+    reference_dir: Optional[Path] = None,
+    workers: int = 1,
+) -> Dict[str, int]:
+    """
+    Распаковывает содержимое каталога hockey-json/ из ZIP в base_dir.
+
+    reference_dir — рабочая база: файлы, совпадающие с ней по размеру
+    и CRC-32, не распаковываются, а связываются жёсткой ссылкой (вместе
+    с предсжатыми копиями). workers — число потоков распаковки.
+
+    Возвращает {"extracted": N, "linked": M}.
     """
     print(f"[INFO] Распаковываю ZIP: {zip_path}")
+    prefix = ZIP_PREFIX
     with zipfile.ZipFile(zip_path, "r") as zf:
-        # Проверим наличие префикса hockey-json/
-        prefix = "hockey-json/"
-        has_prefix = any(
-            name.startswith(prefix) for name in zf.namelist()
+        members = zf.infolist()
+
+    # Проверим наличие префикса hockey-json/
+    if not any(m.filename.startswith(prefix) for m in members):
+        raise RuntimeError(
+            "В ZIP не найден каталог 'hockey-json/'. "
+            "Формат архива не соответствует ожиданиям /api/download-db."
         )
-        if not has_prefix:
-            raise RuntimeError(
-                "В ZIP не найден каталог 'hockey-json/'. "
-                "Формат архива не соответствует ожиданиям /api/download-db."
-            )
 
-        for member in zf.infolist():
-            name = member.filename
+    files = []
+    for member in members:
+        # Нас интересует только содержимое hockey-json/
+        if not member.filename.startswith(prefix):
+            continue
+        rel_path = member.filename[len(prefix):]  # часть пути после hockey-json/
+        if not rel_path:
+            # Это корень hockey-json/, пропускаем
+            continue
+        if not safe_rel_path(rel_path):
+            print(f"[WARN] Пропускаю некорректный путь в архиве: {rel_path!r}")
+            continue
+        if member.is_dir():
+            (base_dir / rel_path).mkdir(parents=True, exist_ok=True)
+            continue
+        if is_sibling(rel_path):
+            # Предсжатые копии пересоздаём сами из JSON
+            continue
+        files.append((member, rel_path))
+
+    local = threading.local()
+    archives = []
+    counts = {"extracted": 0, "linked": 0}
+    counts_lock = threading.Lock()
+
+    def handle(item) -> None:
+        member, rel_path = item
+        target_path = base_dir / rel_path
+        reference = reference_dir / rel_path if reference_dir is not None else None
+
+        if reference is not None and is_unchanged(reference, member):
+            if not os.path.lexists(target_path):
+                link_or_copy(reference, target_path)
+            if target_path.suffix == ".json" and not link_siblings(reference, target_path):
+                write_siblings(target_path, target_path.read_bytes())
+            kind = "linked"
+        else:
+            # ZipFile на поток: один объект не читают из нескольких потоков
+            zf = getattr(local, "zf", None)
+            if zf is None:
+                zf = local.zf = zipfile.ZipFile(zip_path, "r")
+                with counts_lock:
+                    archives.append(zf)
+            extract_member(zf, member, target_path)
+            kind = "extracted"
+        with counts_lock:
+            counts[kind] += 1
 
-            # Нас интересует только содержимое hockey-json/
-            if not name.startswith(prefix):
-                continue
+    try:
+        if workers > 1 and len(files) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for _ in pool.map(handle, files):
+                    pass
+        else:
+            for item in files:
+                handle(item)
+    finally:
+        for zf in archives:
+            zf.close()
 
-            rel_path = name[len(prefix):]  # часть пути после hockey-json/
-            if not rel_path:
-                # Это корень hockey-json/, пропускаем
-                continue
+    print(
+        f"[OK] Распаковано содержимое hockey-json/ в {base_dir}: "
+        f"распаковано {counts['extracted']}, без изменений {counts['linked']}"
+    )
+    return counts
 
-            target_path = base_dir / rel_path
 
-            if member.is_dir():
-                target_path.mkdir(parents=True, exist_ok=True)
+# ---------- Промежуточный каталог и подмена ----------
+
+def link_tree(src: Path, dst: Path, skip=()) -> None:
+    """
+    Повторяет дерево src в dst жёсткими ссылками (имена верхнего уровня
+    из skip пропускаются). В .cache файлы, которые меняются на месте,
+    копируются, а SQLite-каталог пропускается — пересборка создаст его заново.
+    """
+    for root, dirs, names in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        if rel_root == Path("."):
+            dirs[:] = [d for d in dirs if d not in skip]
+            names = [n for n in names if n not in skip]
+        in_cache = rel_root.parts[:1] == (CACHE_DIRNAME,)
+        (dst / rel_root).mkdir(parents=True, exist_ok=True)
+        for name in names:
+            if name.endswith(TEMP_SUFFIX):
                 continue
+            source = Path(root) / name
+            target = dst / rel_root / name
+            if in_cache and name.startswith(SKIPPED_CACHE_PREFIXES):
+                continue
+            if in_cache and name in COPIED_CACHE_FILES:
+                shutil.copy2(source, target)
+                continue
+            link_or_copy(source, target)
 
-            # Убедимся, что директория существует
-            target_path.parent.mkdir(parents=True, exist_ok=True)
 
-            with zf.open(member, "r") as src, open(target_path, "wb") as dst:
-                shutil.copyfileobj(src, dst)
+def prepare_staging(base_dir: Path, is_delta: bool) -> Path:
+    """
+    Создаёт пустой промежуточный каталог (остатки прерванного импорта
+    удаляются). Для дельты заполняет его ссылками на текущую базу,
+    для полного импорта — только сохраняемыми служебными каталогами.
+    """
+    staging = base_dir / STAGING_DIRNAME
+    if staging.exists():
+        print(f"[INFO] Удаляю остатки прерванного импорта: {staging}")
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    if is_delta:
+        link_tree(base_dir, staging, skip=(STAGING_DIRNAME,))
+    else:
+        for name in PRESERVED_CACHE_DIRS:
+            src = base_dir / CACHE_DIRNAME / name
+            if src.is_dir():
+                link_tree(src, staging / CACHE_DIRNAME / name)
+    return staging
+
+
+def run_rebuild(base_dir: Path, full: bool) -> None:
+    """
+    Пересборка индексов для base_dir в отдельном процессе: все пути
+    (кэш, каталог, immutable/) берутся из HOCKEY_BASE_DIR, рабочая база
+    не затрагивается. Журнал изменений в промежуточном каталоге не ведётся.
+    """
+    cmd = [sys.executable, str(ROOT_DIR / "scripts" / "rebuild_indexes.py")]
+    if full:
+        cmd.append("--full")
+    env = dict(os.environ, HOCKEY_BASE_DIR=str(base_dir), JOURNAL_ENABLED="false")
+    subprocess.run(cmd, env=env, cwd=str(ROOT_DIR), check=True)
 
-    print(f"[OK] Распаковано содержимое hockey-json/ в {base_dir}")
 
+def exchange_paths(a: Path, b: Path) -> bool:
+    """
+    Атомарно меняет местами два пути (renameat2 RENAME_EXCHANGE).
+    False — системный вызов недоступен (ядро, libc или ФС его не умеют).
+    """
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), "renameat2", None)
+    if renameat2 is None:
+        return False
+    res = renameat2(AT_FDCWD, os.fsencode(str(a)), AT_FDCWD, os.fsencode(str(b)), RENAME_EXCHANGE)
+    if res == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(err, os.strerror(err), str(a))
 
-def main():
-    if len(sys.argv) != 2:
-        print(
-            "Использование:\n"
-            "  python scripts/import_db.py /path/to/hockey-db.zip\n"
-            "  python scripts/import_db.py https://example.com/hockey-db.zip"
-        )
-        sys.exit(1)
 
-    src = sys.argv[1]
+def swap_into(staging: Path, base_dir: Path) -> None:
+    """
+    Подменяет содержимое base_dir содержимым staging по записям верхнего
+    уровня: каталоги — атомарным обменом, файлы — os.replace. Корневой
+    index.json подменяется последним, чтобы он не ссылался на файлы,
+    которых ещё нет. Старое содержимое остаётся в staging.
+    """
+    replaced = staging / REPLACED_DIRNAME
+    replaced.mkdir()
+
+    new_names = [e.name for e in staging.iterdir() if e.name != REPLACED_DIRNAME]
+    ordered = sorted(new_names, key=lambda n: (
+        n == ROOT_INDEX_NAME,
+        not (staging / n).is_dir(),
+        n,
+    ))
+
+    for name in ordered:
+        new = staging / name
+        cur = base_dir / name
+        new_is_dir = new.is_dir() and not new.is_symlink()
+        cur_is_dir = cur.is_dir() and not cur.is_symlink()
+
+        if new_is_dir and cur_is_dir and exchange_paths(new, cur):
+            # Старый каталог теперь лежит в staging/<name>
+            continue
+        if not new_is_dir and os.path.lexists(cur) and not cur_is_dir:
+            os.replace(new, cur)
+            continue
+        if os.path.lexists(cur):
+            os.rename(cur, replaced / name)
+        os.rename(new, cur)
+
+    # Записи, которых в новой базе нет
+    for entry in list(base_dir.iterdir()):
+        if entry.name != STAGING_DIRNAME and entry.name not in new_names:
+            os.rename(entry, replaced / entry.name)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Импорт базы Hockey JSON из ZIP (путь или URL)",
+    )
+    parser.add_argument("source", help="путь к ZIP или http(s)-URL")
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="для URL: запросить только изменения с версии локальной базы",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="потоков распаковки (0 — по числу CPU)",
+    )
+    parser.add_argument(
+        "--parts",
+        type=int,
+        default=DOWNLOAD_PARTS,
+        help=f"для URL: параллельных Range-запросов (по умолчанию {DOWNLOAD_PARTS})",
+    )
+    parser.add_argument(
+        "--sha256",
+        default=None,
+        help="для URL: ожидаемый SHA-256 архива (по умолчанию — опубликованный сервером)",
+    )
+    parser.add_argument(
+        "--download-dir",
+        type=Path,
+        default=None,
+        help="для URL: куда качать архив (незаконченная загрузка продолжается "
+             "при повторном запуске; по умолчанию — временный каталог)",
+    )
+    return parser.parse_args(argv)
+
+
+def import_archive(zip_path: Path, base_dir: Path, workers: int = 0) -> Dict:
+    """
+    Импортирует архив (полный или дельту) в base_dir через промежуточный
+    каталог и атомарную подмену. Возвращает db_info.json архива.
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    info = read_db_info(zip_path)
+    is_delta = bool(info.get("delta"))
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    # Один импорт за раз (блокировка в .cache/locks переживает подмену)
+    with file_lock(STAGING_DIRNAME):
+        staging = prepare_staging(base_dir, is_delta)
+        try:
+            if is_delta:
+                print(f"[INFO] Дельта-архив (since={info.get('since')}), применяется поверх текущей базы.")
+                apply_deletions(staging, info.get("deleted"))
+
+            # Распаковываем архив; совпадающие с рабочей базой файлы — ссылками
+            extract_hockey_json(zip_path, staging, reference_dir=base_dir, workers=workers)
+
+            # Пересборка индексов (после дельты — инкрементальная)
+            print("[INFO] Запуск пересборки индексов в промежуточном каталоге...")
+            run_rebuild(staging, full=not is_delta)
+
+            print("[INFO] Подмена рабочей базы...")
+            swap_into(staging, base_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    invalidate_snapshot(SNAPSHOT_DIR)
+    return info
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    src = args.source
     zip_path: Path
     tmp_to_delete: Path | None = None
 
@@ -156,8 +819,16 @@ def main():
 
     try:
         if is_url(src):
-            # Скачиваем по URL во временный файл
-            tmp_to_delete = download_to_temp(src)
+            if args.delta:
+                version = local_db_version(BASE_DIR)
+                if version is not None:
+                    src = with_since(src, version)
+                else:
+                    print("[INFO] Локальная версия базы неизвестна — будет полный импорт.")
+            # Скачиваем по URL (с докачкой и проверкой SHA-256)
+            tmp_to_delete = download_to_temp(
+                src, parts=args.parts, sha256=args.sha256, download_dir=args.download_dir,
+            )
             zip_path = tmp_to_delete
         else:
             # Локальный путь
@@ -165,15 +836,7 @@ def main():
             if not zip_path.is_file():
                 raise FileNotFoundError(f"ZIP-файл не найден: {zip_path}")
 
-        # Очищаем текущую базу
-        clear_base_dir(BASE_DIR)
-
-        # Распаковываем архив
-        extract_hockey_json(zip_path, BASE_DIR)
-
-        # Пересборка индексов
-        print("[INFO] Запуск пересборки индексов...")
-        rebuild_indexes.main()
+        import_archive(zip_path, BASE_DIR, workers=args.workers)
         print("[OK] Импорт базы завершён успешно.")
 
     finally:
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Пересоздаёт SQLite-каталог игр (.cache/catalog.sqlite3) с нуля
+из JSON-файлов finished/<season>/*.json.
+
+Каталог — производные данные: его можно удалить или пересобрать
+в любой момент, JSON остаётся источником правды. Работает и при
+CATALOG_ENABLED=false (например, чтобы подготовить каталог заранее).
+
+Для разовых запросов к каталогу подходит обычный sqlite3:
+    sqlite3 /var/www/hockey-json/.cache/catalog.sqlite3 \\
+        "SELECT player, goals FROM player_stats WHERE season='25-26' ORDER BY goals DESC LIMIT 10"
+"""
+
+from pathlib import Path
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.catalog import Catalog  # noqa: E402
+from app.config import BASE_DIR, CATALOG_PATH  # noqa: E402
+
+
+def main() -> None:
+    print(f"[INFO] BASE_DIR = {BASE_DIR}")
+    print(f"[INFO] Каталог: {CATALOG_PATH}")
+    total = Catalog(CATALOG_PATH, BASE_DIR).rebuild()
+    print(f"[OK] Каталог пересобран, игр: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,19 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from app.config import BASE_DIR
+from app.config import (
+    BASE_DIR,
+    CACHE_DIR,
+    IMMUTABLE_DIR,
+    INDEX_LATEST_COUNT,
+    INDEX_PAGE_SIZE,
+    REBUILD_WORKERS,
+)
+from app import journal, jsoncodec
+from app.catalog import Catalog, get_catalog
+from app.db_export import record_deletion
+from app.precompress import SIBLING_SUFFIXES, remove_siblings, write_siblings
+from app.storage import file_lock, season_lock, write_bytes
 
 
 #!/usr/bin/env python3
@@ -25,13 +37,32 @@ from app.config import BASE_DIR
 3. Пересобирает корневой /var/www/hockey-json/index.json.
 
 Скрипт идемпотентен: можно запускать сколько угодно раз.
+
+По умолчанию пересборка инкрементальная: вклад каждой игры (запись индекса
+и приращения статистики игроков) хранится в .cache/games/<season>.json,
+и заново разбираются только новые/изменённые файлы. Ключ `--full`
+игнорирует кэш и перечитывает все игры; результат совпадает побайтно
+(кроме поля updatedAt).
+
+Ключ `--profile` печатает (или пишет в `--profile-output`) JSON-строки
+с временем фаз пересборки, объёмами сезонов и самыми медленными файлами
+игр; `--cprofile FILE` дополнительно сохраняет дамп cProfile.
 """
 
+import argparse
+import contextlib
+import cProfile
+import hashlib
 import json
+import multiprocessing
 import os
+import re
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional, Dict, List, Tuple
 
 # Базовый каталог хранилища табло
@@ -43,24 +74,172 @@ ROOT_INDEX_FILE = BASE_DIR / "index.json"
 SEASON_INDEX_FILENAME = "index.json"
 PLAYERS_STATS_FILENAME = "players.json"
 
+# Постраничный индекс сезона: finished/<season>/index/page-NNNN.json, latest.json
+SEASON_PAGES_DIRNAME = "index"
+
+# Журналы игр по игрокам: stats/<season>/players/<key>.json
+PLAYER_LOGS_DIRNAME = "players"
+
+# Карьерная статистика по всем сезонам: stats/all/...
+CAREER_SEASON_ID = "all"
+CAREER_STATS_DIR = STATS_DIR / CAREER_SEASON_ID
+
+# Кэш вкладов игр для инкрементальной пересборки
+GAMES_CACHE_DIR = CACHE_DIR / "games"
+# Итоги сезонов по аренам (для карьерной статистики)
+TOTALS_CACHE_DIR = CACHE_DIR / "totals"
+GAMES_CACHE_VERSION = 2
+
+# Параллельный разбор: меньше стольких файлов разбираем в текущем процессе,
+# иначе — пачками не меньше PARALLEL_MIN_CHUNK в пуле процессов
+PARALLEL_MIN_FILES = 64
+PARALLEL_MIN_CHUNK = 16
+
+# Неизменяемые копии: длина хэша в имени и сколько хранить неиспользуемые (сек)
+IMMUTABLE_HASH_LEN = 16
+IMMUTABLE_GRACE_SEC = 24 * 3600
+
+
+# Фазы пересборки в порядке вывода профиля
+PROFILE_PHASES = ("discover", "stat_read", "parse", "aggregate", "sort_serialize", "write")
+
+
+# ---------- Профилирование ----------
+
+class RebuildProfile:
+    """
+    Профиль одной пересборки (--profile).
+
+    Время фаз суммируется по всем потокам и процессам-воркерам, поэтому
+    при workers > 1 сумма фаз может превышать общее время (wallSec).
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.slowest = slowest
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seasons: Dict[str, Dict] = {}
+        # (секунды чтения и разбора, путь, байты, чтение, разбор)
+        self.files: List[Tuple[float, str, int, float, float]] = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            self.phases[phase] += seconds
+            self.calls[phase] += calls
+
+    def add_files(self, timings: List[Tuple[str, int, float, float]]) -> None:
+        """Время чтения и разбора файлов игр (из read_and_parse_games)."""
+        read_total = parse_total = 0.0
+        parsed = 0
+        with self._lock:
+            for path, size, read_sec, parse_sec in timings:
+                read_total += read_sec
+                parse_total += parse_sec
+                parsed += parse_sec > 0
+                self.files.append((read_sec + parse_sec, path, size, read_sec, parse_sec))
+        self.add("stat_read", read_total, len(timings))
+        self.add("parse", parse_total, parsed)
+
+    def season(self, season: str, rows, parsed: int) -> None:
+        with self._lock:
+            self.seasons[season] = {
+                "files": len(rows),
+                "bytes": sum(st.st_size for _file, st, _cached in rows),
+                "parsed": parsed,
+            }
+
+    def records(self) -> List[Dict]:
+        """JSON-строки профиля: фазы, сезоны, медленные файлы, итог."""
+        records: List[Dict] = []
+        for phase in PROFILE_PHASES:
+            records.append({
+                "type": "phase",
+                "phase": phase,
+                "seconds": round(self.phases.get(phase, 0.0), 6),
+                "calls": self.calls.get(phase, 0),
+            })
+        for season, info in sorted(self.seasons.items()):
+            records.append(dict({"type": "season", "season": season}, **info))
+        slow = sorted(self.files, key=lambda f: f[0], reverse=True)[:self.slowest]
+        for total, path, size, read_sec, parse_sec in slow:
+            records.append({
+                "type": "slowFile",
+                "file": path,
+                "bytes": size,
+                "readSec": round(read_sec, 6),
+                "parseSec": round(parse_sec, 6),
+                "totalSec": round(total, 6),
+            })
+        records.append({
+            "type": "summary",
+            "wallSec": round(time.perf_counter() - self.started, 6),
+            "seasons": len(self.seasons),
+            "files": sum(s["files"] for s in self.seasons.values()),
+            "bytes": sum(s["bytes"] for s in self.seasons.values()),
+            "parsed": sum(s["parsed"] for s in self.seasons.values()),
+        })
+        return records
+
+    def dump(self, stream) -> None:
+        for record in self.records():
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# Профиль текущей пересборки (None — профилирование выключено)
+_profile: Optional[RebuildProfile] = None
+
+
+@contextlib.contextmanager
+def profile_phase(phase: str):
+    """Засекает время фазы, если пересборка идёт с профилем."""
+    if _profile is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _profile.add(phase, time.perf_counter() - t0)
+
 
 # ---------- Вспомогательные функции ----------
 
 def load_json(path: Path):
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        return jsoncodec.load(path)
     except Exception as e:
         print(f"[WARN] Не удалось прочитать JSON {path}: {e}")
         return None
 
 
 def save_json(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
+    with profile_phase("sort_serialize"):
+        payload = jsoncodec.dumps(data)
+    save_bytes(path, payload)
+
+
+def save_bytes(path: Path, payload: bytes) -> None:
+    """
+    Атомарно записывает файл (и его предсжатые копии).
+    Если содержимое не изменилось, файл не трогается: mtime, хэши
+    и дельта-выгрузки остаются стабильными.
+    """
+    with profile_phase("write"):
+        _save_bytes(path, payload)
+
+
+def _save_bytes(path: Path, payload: bytes) -> None:
+    try:
+        if path.read_bytes() == payload:
+            if not Path(f"{path}.gz").exists():
+                write_siblings(path, payload)
+            return
+    except FileNotFoundError:
+        pass
+
+    write_bytes(path, payload, source="rebuild")
     print(f"[OK] Записан файл {path}")
 
 
@@ -112,154 +291,519 @@ def clean_player_name(name: str) -> Optional[str]:
     return s
 
 
-# ---------- Пересчёт индекса и статистики по одному сезону ----------
+# ---------- Вклад одной игры (кэшируется между запусками) ----------
 
-def process_season(season: str) -> Tuple[List[Dict], Dict[str, Dict]]:
+def empty_player_stats() -> Dict[str, int]:
+    return {
+        "games": 0,
+        "goals": 0,
+        "assists": 0,
+        "points": 0,
+        "wins": 0,
+        "draws": 0,
+        "losses": 0,
+    }
+
+
+def build_game_entry(game_file: Path, data: Dict, base_dir: Optional[Path] = None) -> Dict:
     """
-    Обрабатывает один сезон:
-    - читает все игры в finished/<season>/,
-    - строит:
-        finished/<season>/index.json
-        stats/<season>/players.json
+    Строит вклад одной игры:
+    - "meta"    — запись для finished/<season>/index.json (без ключа сортировки),
+    - "players" — приращения статистики игроков (только ненулевые счётчики),
+    - "teams"   — команда (RED/WHITE) каждого игрока в этой игре.
+
+    Результат зависит только от содержимого файла и его пути,
+    поэтому его можно хранить в кэше и не перечитывать неизменённые игры.
     """
-    season_dir = FINISHED_DIR / season
-    season_index_path = season_dir / SEASON_INDEX_FILENAME
-    stats_season_dir = STATS_DIR / season
-    players_stats_path = stats_season_dir / PLAYERS_STATS_FILENAME
+    file_rel_path = str(game_file.relative_to(base_dir or BASE_DIR))
+
+    game_id = data.get("gameId") or game_file.stem
+    arena = data.get("arena") or ""
+    date_str = data.get("date") or ""
+
+    teams = data.get("teams") or {}
+    red_obj = teams.get("RED") or {}
+    white_obj = teams.get("WHITE") or {}
+
+    red_name = red_obj.get("name") or "Красные"
+    white_name = white_obj.get("name") or "Белые"
+
+    final_score = data.get("finalScore") or {}
+    red_score = int(final_score.get("RED") or 0)
+    white_score = int(final_score.get("WHITE") or 0)
+
+    meta = {
+        "id": game_id,
+        "date": date_str,
+        "arena": arena,
+        "teamRed": red_name,
+        "teamWhite": white_name,
+        "scoreRed": red_score,
+        "scoreWhite": white_score,
+        "file": file_rel_path,
+    }
 
-    if not season_dir.exists():
-        print(f"[WARN] Папка сезона не найдена: {season_dir}")
-        return [], {}
+    # --- Статистика игроков ---
+    players: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+    def add(name: str, key: str) -> None:
+        players[name][key] = players[name].get(key, 0) + 1
+
+    red_players = red_obj.get("players") or []
+    white_players = white_obj.get("players") or []
+
+    red_set = set()
+    white_set = set()
+    all_players_in_game = set()
+
+    for name in red_players:
+        cleaned = clean_player_name(name)
+        if cleaned:
+            red_set.add(cleaned)
+            all_players_in_game.add(cleaned)
+
+    for name in white_players:
+        cleaned = clean_player_name(name)
+        if cleaned:
+            white_set.add(cleaned)
+            all_players_in_game.add(cleaned)
+
+    for name in all_players_in_game:
+        add(name, "games")
+
+    player_teams: Dict[str, str] = {}
+    for name in red_set:
+        player_teams[name] = "RED"
+    for name in white_set:
+        player_teams.setdefault(name, "WHITE")
+
+    if red_score != white_score:
+        red_won = red_score > white_score
+        for name in red_set:
+            add(name, "wins" if red_won else "losses")
+        for name in white_set:
+            add(name, "wins" if not red_won else "losses")
+    else:
+        for name in all_players_in_game:
+            add(name, "draws")
+
+    goals = data.get("goals") or []
+    if isinstance(goals, list):
+        for g in goals:
+            if not isinstance(g, dict):
+                continue
+            scorer = clean_player_name(g.get("scorer"))
+            a1 = clean_player_name(g.get("assist1"))
+            a2 = clean_player_name(g.get("assist2"))
+
+            if scorer:
+                add(scorer, "goals")
+            if a1:
+                add(a1, "assists")
+            if a2:
+                add(a2, "assists")
+
+            # Игрок не из заявки: команду берём по голу
+            team = g.get("team")
+            if team in ("RED", "WHITE"):
+                for name in (scorer, a1, a2):
+                    if name:
+                        player_teams.setdefault(name, team)
+
+    return {"meta": meta, "players": dict(players), "teams": player_teams}
+
+
+def parse_game_file(game_file: Path, raw: bytes, base_dir: Optional[Path] = None) -> Optional[Dict]:
+    """
+    Разбирает протокол игры из уже прочитанных байтов.
+    Возвращает вклад игры или None, если файл не является корректной игрой.
+    """
+    try:
+        data = jsoncodec.loads(raw)
+    except Exception as e:
+        print(f"[WARN] Не удалось прочитать JSON {game_file}: {e}")
+        return None
+    if not isinstance(data, dict):
+        return None
+    return build_game_entry(game_file, data, base_dir)
+
+
+def read_and_parse_games(
+    base_dir: str,
+    items: List[Tuple[str, Optional[str]]],
+    timings: Optional[List[Tuple[str, int, float, float]]] = None,
+) -> List[Tuple[Optional[str], Optional[Dict], bool]]:
+    """
+    Читает и разбирает пачку файлов игр (выполняется и в дочерних процессах).
 
+    items — пары (путь к файлу, sha256 из кэша или None).
+    Для каждого файла возвращает (sha256, вклад, разобран ли файл):
+    - sha256 = None, если файл не удалось прочитать;
+    - если sha256 совпал с кэшем, файл не разбирается (вклад = None, False).
+
+    Если передан timings, в него добавляется (путь, байты, чтение, разбор)
+    для каждого прочитанного файла.
+    """
+    results: List[Tuple[Optional[str], Optional[Dict], bool]] = []
+    for path_str, cached_sha in items:
+        game_file = Path(path_str)
+        t0 = time.perf_counter()
+        try:
+            raw = game_file.read_bytes()
+        except Exception as e:
+            print(f"[WARN] Не удалось прочитать JSON {game_file}: {e}")
+            results.append((None, None, False))
+            continue
+
+        sha256 = hashlib.sha256(raw).hexdigest()
+        t1 = time.perf_counter()
+        if cached_sha == sha256:
+            results.append((sha256, None, False))
+        else:
+            results.append((sha256, parse_game_file(game_file, raw, Path(base_dir)), True))
+        if timings is not None:
+            t2 = time.perf_counter()
+            timings.append((path_str, len(raw), t1 - t0, t2 - t1 if cached_sha != sha256 else 0.0))
+    return results
+
+
+def read_and_parse_games_timed(
+    base_dir: str,
+    items: List[Tuple[str, Optional[str]]],
+) -> Tuple[List[Tuple[Optional[str], Optional[Dict], bool]], List[Tuple[str, int, float, float]]]:
+    """read_and_parse_games для пула процессов: результаты и время по файлам."""
+    timings: List[Tuple[str, int, float, float]] = []
+    return read_and_parse_games(base_dir, items, timings), timings
+
+
+def parse_pending_games(
+    items: List[Tuple[str, Optional[str]]],
+    workers: int = 1,
+) -> List[Tuple[Optional[str], Optional[Dict], bool]]:
+    """
+    Разбирает файлы игр; при workers > 1 и достаточном объёме — пачками
+    в пуле процессов. Порядок результатов совпадает с порядком items.
+    """
+    base_dir = str(BASE_DIR)
+    profile = _profile
+    if workers <= 1 or len(items) < PARALLEL_MIN_FILES:
+        if profile is None:
+            return read_and_parse_games(base_dir, items)
+        results, timings = read_and_parse_games_timed(base_dir, items)
+        profile.add_files(timings)
+        return results
+
+    chunk_size = max(PARALLEL_MIN_CHUNK, -(-len(items) // (workers * 4)))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    # spawn, а не fork: пересборка может идти из многопоточного API-процесса
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        func = read_and_parse_games if profile is None else read_and_parse_games_timed
+        futures = [pool.submit(func, base_dir, chunk) for chunk in chunks]
+        results: List[Tuple[Optional[str], Optional[Dict], bool]] = []
+        for future in futures:
+            if profile is None:
+                results.extend(future.result())
+            else:
+                chunk_results, timings = future.result()
+                results.extend(chunk_results)
+                profile.add_files(timings)
+    return results
+
+
+# ---------- Кэш вкладов игр ----------
+
+def season_cache_path(season: str) -> Path:
+    return GAMES_CACHE_DIR / f"{season}.json"
+
+
+def load_season_cache(season: str) -> Dict[str, Dict]:
+    """
+    Загружает кэш сезона: имя файла игры -> {mtime_ns, size, sha256, entry}.
+    При любой проблеме (нет файла, другая версия формата) возвращает пустой кэш.
+    """
+    path = season_cache_path(season)
+    if not path.exists():
+        return {}
+    data = load_json(path)
+    if not isinstance(data, dict) or data.get("version") != GAMES_CACHE_VERSION:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def save_cache_json(path: Path, data) -> None:
+    """Служебный JSON (кэш): компактно, атомарно, без предсжатых копий."""
+    with profile_phase("sort_serialize"):
+        payload = jsoncodec.dumps(data, compact=True)
+    with profile_phase("write"):
+        write_bytes(path, payload, siblings=False, source="rebuild")
+
+
+def save_season_cache(season: str, files: Dict[str, Dict]) -> None:
+    save_cache_json(
+        season_cache_path(season),
+        {"version": GAMES_CACHE_VERSION, "season": season, "files": files},
+    )
+
+
+# ---------- Итоги сезонов по аренам (для карьерной статистики) ----------
+
+def season_totals_path(season: str) -> Path:
+    return TOTALS_CACHE_DIR / f"{season}.json"
+
+
+def add_stats(dst: Dict[str, int], src: Dict[str, int]) -> None:
+    for key, value in src.items():
+        dst[key] = dst.get(key, 0) + value
+
+
+def save_season_totals(season: str, entries) -> None:
+    """
+    Итоги сезона по аренам: {arena: {"games": N, "players": {name: счётчики}}}.
+    Карьерная статистика складывается из этих итогов, не перечитывая игры.
+    """
+    arenas: Dict[str, Dict] = {}
+    for _game_file, _stat, entry in entries:
+        if entry is None:
+            continue
+        arena = entry["meta"]["arena"]
+        totals = arenas.setdefault(arena, {"games": 0, "players": {}})
+        totals["games"] += 1
+        for name, delta in entry["players"].items():
+            add_stats(totals["players"].setdefault(name, {}), delta)
+
+    save_cache_json(
+        season_totals_path(season),
+        {"version": GAMES_CACHE_VERSION, "season": season, "arenas": arenas},
+    )
+
+
+def load_season_totals(season: str) -> Optional[Dict[str, Dict]]:
+    path = season_totals_path(season)
+    if not path.exists():
+        return None
+    data = load_json(path)
+    if not isinstance(data, dict) or data.get("version") != GAMES_CACHE_VERSION:
+        return None
+    arenas = data.get("arenas")
+    return arenas if isinstance(arenas, dict) else None
+
+
+def list_game_files(season_dir: Path) -> List[Path]:
     game_files: List[Path] = []
     for entry in season_dir.iterdir():
         if entry.is_file() and entry.suffix.lower() == ".json":
             if entry.name == SEASON_INDEX_FILENAME:
                 continue
             game_files.append(entry)
+    return game_files
 
-    if not game_files:
-        season_index_data = {
-            "season": season,
-            "updatedAt": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-            "games": []
-        }
-        save_json(season_index_path, season_index_data)
-        save_json(players_stats_path, {"season": season, "players": []})
-        return [], {}
 
-    games_meta: List[Dict] = []
+def scan_season(
+    season: str,
+    game_files: List[Path],
+    incremental: bool = True,
+) -> Tuple[List[Tuple[Path, os.stat_result, Optional[Dict]]], List[int]]:
+    """
+    Сверяет файлы сезона с кэшем.
 
-    players_stats: Dict[str, Dict] = defaultdict(lambda: {
-        "games": 0,
-        "goals": 0,
-        "assists": 0,
-        "points": 0,
-        "wins": 0,
-        "draws": 0,
-        "losses": 0,
-    })
+    Возвращает:
+      rows    — [(файл, stat, запись кэша или None)] в порядке game_files,
+      pending — индексы строк, которые нужно перечитать
+                (нет в кэше или изменились mtime/размер).
+    """
+    cache = load_season_cache(season) if incremental else {}
+    rows: List[Tuple[Path, os.stat_result, Optional[Dict]]] = []
+    pending: List[int] = []
 
+    t0 = time.perf_counter()
     for game_file in game_files:
-        data = load_json(game_file)
-        if not isinstance(data, dict):
+        st = game_file.stat()
+        cached = cache.get(game_file.name)
+        if not (
+            cached
+            and cached.get("mtime_ns") == st.st_mtime_ns
+            and cached.get("size") == st.st_size
+        ):
+            pending.append(len(rows))
+        rows.append((game_file, st, cached))
+
+    if _profile is not None:
+        _profile.add("stat_read", time.perf_counter() - t0, 0)
+    return rows, pending
+
+
+def finish_season_entries(
+    season: str,
+    rows: List[Tuple[Path, os.stat_result, Optional[Dict]]],
+    pending: List[int],
+    results: List[Tuple[Optional[str], Optional[Dict], bool]],
+) -> Tuple[List[Tuple[Path, os.stat_result, Optional[Dict]]], int]:
+    """
+    Склеивает закэшированные и заново разобранные вклады,
+    сохраняет новый кэш сезона. Удалённые файлы просто выпадают из кэша.
+    Возвращает вклады игр (в порядке rows) и число разобранных файлов.
+    """
+    fresh = dict(zip(pending, results))
+    new_cache: Dict[str, Dict] = {}
+    entries: List[Tuple[Path, os.stat_result, Optional[Dict]]] = []
+    parsed = 0
+
+    for i, (game_file, st, cached) in enumerate(rows):
+        if i not in fresh:
+            new_cache[game_file.name] = cached
+            entries.append((game_file, st, cached.get("entry")))
             continue
 
-        file_rel_path = str(game_file.relative_to(BASE_DIR))
+        sha256, entry, was_parsed = fresh[i]
+        if sha256 is None:
+            entries.append((game_file, st, None))
+            continue
+        if was_parsed:
+            parsed += 1
+        else:
+            entry = cached.get("entry")
 
-        game_id = data.get("gameId") or game_file.stem
-        arena = data.get("arena") or ""
-        date_str = data.get("date") or ""
+        new_cache[game_file.name] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha256": sha256,
+            "entry": entry,
+        }
+        entries.append((game_file, st, entry))
 
-        teams = data.get("teams") or {}
-        red_obj = teams.get("RED") or {}
-        white_obj = teams.get("WHITE") or {}
+    save_season_cache(season, new_cache)
+    return entries, parsed
 
-        red_name = red_obj.get("name") or "Красные"
-        white_name = white_obj.get("name") or "Белые"
 
-        final_score = data.get("finalScore") or {}
-        red_score = int(final_score.get("RED") or 0)
-        white_score = int(final_score.get("WHITE") or 0)
+def collect_game_entries(
+    season: str,
+    game_files: List[Path],
+    incremental: bool = True,
+    workers: int = 1,
+) -> Tuple[List[Tuple[Path, os.stat_result, Optional[Dict]]], int]:
+    """
+    Возвращает вклады всех игр сезона (в порядке game_files) и число
+    реально разобранных файлов.
 
-        mtime_ts = game_file.stat().st_mtime
-        sort_ts = parse_iso_date(date_str, mtime_ts)
+    В инкрементальном режиме файл перечитывается, только если изменились
+    mtime/размер, и разбирается заново, только если изменился его sha256.
+    """
+    rows, pending = scan_season(season, game_files, incremental)
+    items = [(str(rows[i][0]), (rows[i][2] or {}).get("sha256")) for i in pending]
+    results = parse_pending_games(items, workers)
+    return finish_season_entries(season, rows, pending, results)
 
-        games_meta.append({
-            "id": game_id,
-            "date": date_str,
-            "arena": arena,
-            "teamRed": red_name,
-            "teamWhite": white_name,
-            "scoreRed": red_score,
-            "scoreWhite": white_score,
-            "file": file_rel_path,
-            "_sort_ts": sort_ts,
-        })
 
-        # --- Статистика игроков ---
-        red_players = red_obj.get("players") or []
-        white_players = white_obj.get("players") or []
+# ---------- Пересчёт индекса и статистики по одному сезону ----------
 
-        red_set = set()
-        white_set = set()
-        all_players_in_game = set()
+def process_season(
+    season: str,
+    incremental: bool = True,
+    workers: int = 1,
+) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Обрабатывает один сезон:
+    - читает новые/изменённые игры в finished/<season>/
+      (при incremental=False — все игры, без учёта кэша),
+    - строит:
+        finished/<season>/index.json
+        stats/<season>/players.json
+    """
+    season_dir = FINISHED_DIR / season
 
-        for name in red_players:
-            cleaned = clean_player_name(name)
-            if cleaned:
-                red_set.add(cleaned)
-                all_players_in_game.add(cleaned)
+    if not season_dir.exists():
+        print(f"[WARN] Папка сезона не найдена: {season_dir}")
+        return [], {}
 
-        for name in white_players:
-            cleaned = clean_player_name(name)
-            if cleaned:
-                white_set.add(cleaned)
-                all_players_in_game.add(cleaned)
+    with season_lock(season):
+        game_files = list_game_files(season_dir)
+        entries, parsed = collect_game_entries(season, game_files, incremental, workers)
+        print(f"[INFO] Сезон {season}: файлов игр {len(game_files)}, разобрано заново {parsed}")
 
-        for name in all_players_in_game:
-            players_stats[name]["games"] += 1
-
-        if red_score != white_score:
-            red_won = red_score > white_score
-            for name in red_set:
-                players_stats[name]["wins" if red_won else "losses"] += 1
-            for name in white_set:
-                players_stats[name]["wins" if not red_won else "losses"] += 1
-        else:
-            for name in all_players_in_game:
-                players_stats[name]["draws"] += 1
-
-        goals = data.get("goals") or []
-        if isinstance(goals, list):
-            for g in goals:
-                if not isinstance(g, dict):
-                    continue
-                scorer = clean_player_name(g.get("scorer"))
-                a1 = clean_player_name(g.get("assist1"))
-                a2 = clean_player_name(g.get("assist2"))
-
-                if scorer:
-                    players_stats[scorer]["goals"] += 1
-                if a1:
-                    players_stats[a1]["assists"] += 1
-                if a2:
-                    players_stats[a2]["assists"] += 1
+        return write_season(season, entries)
 
-    for name, st in players_stats.items():
-        st["points"] = st["goals"] + st["assists"]
 
-    games_meta.sort(key=lambda g: g["_sort_ts"])
-    for g in games_meta:
-        g.pop("_sort_ts", None)
+def write_season(
+    season: str,
+    entries: List[Tuple[Path, os.stat_result, Optional[Dict]]],
+) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Собирает из вкладов игр и записывает:
+        finished/<season>/index.json
+        stats/<season>/players.json
+    """
+    season_index_path = FINISHED_DIR / season / SEASON_INDEX_FILENAME
+    players_stats_path = STATS_DIR / season / PLAYERS_STATS_FILENAME
+
+    if not entries:
+        season_index_data = {
+            "season": season,
+            "updatedAt": stable_updated_at(season_index_path, []),
+            "games": []
+        }
+        season_index_data["pages"] = write_season_pages(season, [])
+        save_json(season_index_path, season_index_data)
+        save_json(players_stats_path, {"season": season, "players": []})
+        save_season_totals(season, entries)
+        write_player_logs(season, [])
+        return [], {}
+
+    games_meta: List[Dict] = []
+
+    players_stats: Dict[str, Dict] = defaultdict(empty_player_stats)
+
+    with profile_phase("aggregate"):
+        for game_file, stat, entry in entries:
+            if entry is None:
+                continue
+
+            meta = dict(entry["meta"])
+            meta["_sort_ts"] = parse_iso_date(meta["date"], stat.st_mtime)
+            meta["_entry"] = entry
+            games_meta.append(meta)
+
+            for name, delta in entry["players"].items():
+                st_player = players_stats[name]
+                for key, value in delta.items():
+                    st_player[key] += value
+
+        for name, st in players_stats.items():
+            st["points"] = st["goals"] + st["assists"]
+
+    with profile_phase("sort_serialize"):
+        games_meta.sort(key=lambda g: g["_sort_ts"])
+        ordered_entries = []
+        for g in games_meta:
+            g.pop("_sort_ts", None)
+            ordered_entries.append(g.pop("_entry"))
 
     season_index_data = {
         "season": season,
-        "updatedAt": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "updatedAt": stable_updated_at(season_index_path, games_meta),
         "games": games_meta,
+        "pages": write_season_pages(season, games_meta),
     }
     save_json(season_index_path, season_index_data)
 
+    with profile_phase("sort_serialize"):
+        players_list = build_players_list(players_stats)
+    stats_data = {
+        "season": season,
+        "players": players_list,
+    }
+    save_json(players_stats_path, stats_data)
+
+    save_season_totals(season, entries)
+    write_player_logs(season, ordered_entries)
+
+    return games_meta, players_stats
+
+
+def build_players_list(players_stats: Dict[str, Dict]) -> List[Dict]:
+    """Список игроков для players.json в стандартном порядке сортировки."""
     players_list = []
     for name, st in players_stats.items():
         players_list.append({
@@ -274,18 +818,334 @@ def process_season(season: str) -> Tuple[List[Dict], Dict[str, Dict]]:
         })
 
     players_list.sort(key=lambda p: (-p["points"], -p["goals"], p["name"]))
+    return players_list
 
-    stats_data = {
+
+# ---------- Постраничный индекс сезона ----------
+
+def write_season_pages(season: str, games_meta: List[Dict]) -> Dict:
+    """
+    Режет список игр сезона (в хронологическом порядке) на страницы
+    фиксированного размера и пишет latest.json с последними играми
+    (новые первыми). Возвращает каталог страниц для index.json сезона.
+
+    Страницы нумеруются от самых старых игр, поэтому новые игры меняют
+    только последнюю страницу — остальные файлы не перезаписываются.
+    """
+    pages_dir = FINISHED_DIR / season / SEASON_PAGES_DIRNAME
+    rel_dir = f"finished/{season}/{SEASON_PAGES_DIRNAME}"
+    page_size = max(1, INDEX_PAGE_SIZE)
+
+    page_files = []
+    written = set()
+    for start in range(0, len(games_meta), page_size):
+        number = start // page_size + 1
+        name = f"page-{number:04d}.json"
+        save_json(pages_dir / name, {
+            "season": season,
+            "page": number,
+            "pageSize": page_size,
+            "games": games_meta[start:start + page_size],
+        })
+        written.add(name)
+        page_files.append(f"{rel_dir}/{name}")
+
+    latest = list(reversed(games_meta[-INDEX_LATEST_COUNT:])) if INDEX_LATEST_COUNT > 0 else []
+    save_json(pages_dir / "latest.json", {
         "season": season,
-        "players": players_list,
+        "total": len(games_meta),
+        "pageCount": len(page_files),
+        "games": latest,
+    })
+    written.add("latest.json")
+
+    for entry in pages_dir.iterdir():
+        if entry.suffix == ".json" and entry.name not in written:
+            remove_file(entry)
+
+    return {
+        "pageSize": page_size,
+        "total": len(games_meta),
+        "latest": f"{rel_dir}/latest.json",
+        "files": page_files,
     }
-    save_json(players_stats_path, stats_data)
 
-    return games_meta, players_stats
+
+# ---------- Журналы игр по игрокам ----------
+
+def game_result(delta: Dict[str, int]) -> Optional[str]:
+    if delta.get("wins"):
+        return "W"
+    if delta.get("losses"):
+        return "L"
+    if delta.get("draws"):
+        return "D"
+    return None
+
+
+def write_player_logs(season: str, ordered_entries: List[Dict]) -> None:
+    """
+    stats/<season>/players/<key>.json — игры сезона для каждого игрока
+    (в хронологическом порядке) и stats/<season>/players/index.json.
+
+    Журналы собираются из кэшированных вкладов игр; save_json не трогает
+    неизменившиеся файлы, поэтому после добавления/удаления игры
+    реально перезаписываются только журналы её участников.
+    """
+    logs: Dict[str, List[Dict]] = defaultdict(list)
+    for entry in ordered_entries:
+        meta = entry["meta"]
+        teams = entry.get("teams") or {}
+        for name, delta in entry["players"].items():
+            logs[name].append({
+                "id": meta["id"],
+                "date": meta["date"],
+                "arena": meta["arena"],
+                "file": meta["file"],
+                "team": teams.get(name),
+                "goals": delta.get("goals", 0),
+                "assists": delta.get("assists", 0),
+                "result": game_result(delta),
+            })
+
+    logs_dir = STATS_DIR / season / PLAYER_LOGS_DIRNAME
+    keys = assign_file_keys(list(logs))
+    index_players = []
+    written = set()
+    for name in sorted(logs):
+        rel_file = f"stats/{season}/{PLAYER_LOGS_DIRNAME}/{keys[name]}.json"
+        save_json(BASE_DIR / rel_file, {
+            "season": season,
+            "name": name,
+            "games": logs[name],
+        })
+        written.add(f"{keys[name]}.json")
+        index_players.append({
+            "name": name,
+            "games": len(logs[name]),
+            "file": rel_file,
+        })
+
+    save_json(logs_dir / SEASON_INDEX_FILENAME, {
+        "season": season,
+        "players": index_players,
+    })
+    written.add(SEASON_INDEX_FILENAME)
+
+    for entry in logs_dir.iterdir():
+        if entry.suffix == ".json" and entry.name not in written:
+            remove_file(entry)
+
+
+# ---------- Карьерная статистика (все сезоны) ----------
+
+def file_key(name: str) -> str:
+    """
+    Имя файла для произвольной строки (арена, игрок): буквы/цифры
+    в нижнем регистре, остальное — «_». Пустой результат заменяется хэшем.
+    """
+    key = re.sub(r"[^\w-]+", "_", name.strip().lower()).strip("_")
+    return key or hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+
+
+def assign_file_keys(names: List[str], reserved: Tuple[str, ...] = ("index",)) -> Dict[str, str]:
+    """
+    Уникальные ключи файлов для списка имён (при коллизии — суффикс-хэш).
+    reserved — ключи, занятые служебными файлами каталога.
+    """
+    keys: Dict[str, str] = {}
+    used = set(reserved)
+    for name in sorted(names):
+        key = file_key(name)
+        if key in used:
+            key = f"{key}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:6]}"
+        used.add(key)
+        keys[name] = key
+    return keys
+
+
+def remove_file(path: Path) -> None:
+    """Удаляет производный файл вместе с предсжатыми копиями и фиксирует удаление."""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return
+    remove_siblings(path)
+    record_deletion(CACHE_DIR, str(path.relative_to(BASE_DIR)))
+    print(f"[OK] Удалён файл {path}")
+
+
+def career_stats_from_totals(all_seasons: List[str]) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """
+    Карьерные итоги игроков и итоги по аренам из итогов сезонов
+    (.cache/totals/<season>.json). Игры при этом не перечитываются.
+    """
+    players_stats: Dict[str, Dict] = defaultdict(empty_player_stats)
+    arenas: Dict[str, Dict] = {}
+
+    for season in all_seasons:
+        totals = load_season_totals(season) or {}
+        for arena, arena_totals in totals.items():
+            target = arenas.setdefault(arena, {
+                "games": 0,
+                "seasons": [],
+                "players": defaultdict(empty_player_stats),
+            })
+            target["games"] += arena_totals["games"]
+            target["seasons"].append(season)
+            for name, delta in arena_totals["players"].items():
+                add_stats(players_stats[name], delta)
+                add_stats(target["players"][name], delta)
+
+    for stats in [players_stats] + [a["players"] for a in arenas.values()]:
+        for st in stats.values():
+            st["points"] = st["goals"] + st["assists"]
+    return players_stats, arenas
+
+
+def career_stats_from_catalog(
+    catalog: Catalog, all_seasons: List[str]
+) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """То же, что career_stats_from_totals, — SQL-агрегатами по каталогу."""
+    arenas = catalog.arena_stats()
+    for arena in arenas.values():
+        arena["seasons"] = [s for s in all_seasons if s in arena["seasons"]]
+    return catalog.career_player_stats(), arenas
+
+
+def rebuild_career_stats(all_seasons: List[str], catalog: Optional[Catalog] = None) -> None:
+    """
+    Строит stats/all/players.json и stats/all/arenas/*.json. Итоги берутся
+    SQL-запросами из заполненного каталога (catalog), иначе — из итогов
+    сезонов: изменение одного сезона меняет только его итоги.
+    """
+    if catalog is not None and catalog.synced():
+        with profile_phase("aggregate"):
+            players_stats, arenas = career_stats_from_catalog(catalog, all_seasons)
+    else:
+        players_stats, arenas = career_stats_from_totals(all_seasons)
+
+    save_json(CAREER_STATS_DIR / PLAYERS_STATS_FILENAME, {
+        "season": CAREER_SEASON_ID,
+        "seasons": all_seasons,
+        "players": build_players_list(players_stats),
+    })
+
+    arenas_dir = CAREER_STATS_DIR / "arenas"
+    keys = assign_file_keys(list(arenas))
+    arena_entries = []
+    written = set()
+    for arena in sorted(arenas):
+        rel_file = f"stats/{CAREER_SEASON_ID}/arenas/{keys[arena]}.json"
+        save_json(BASE_DIR / rel_file, {
+            "season": CAREER_SEASON_ID,
+            "arena": arena,
+            "games": arenas[arena]["games"],
+            "seasons": arenas[arena]["seasons"],
+            "players": build_players_list(arenas[arena]["players"]),
+        })
+        written.add(f"{keys[arena]}.json")
+        arena_entries.append({
+            "name": arena,
+            "games": arenas[arena]["games"],
+            "file": rel_file,
+        })
+
+    save_json(arenas_dir / SEASON_INDEX_FILENAME, {"arenas": arena_entries})
+    written.add(SEASON_INDEX_FILENAME)
+
+    for entry in arenas_dir.iterdir():
+        if entry.suffix == ".json" and entry.name not in written:
+            remove_file(entry)
+
+
+# ---------- SQLite-каталог ----------
+
+def sync_catalog(catalog: Catalog, targets: List[str], all_seasons: List[str]) -> None:
+    """
+    Синхронизирует каталог с кэшем игр пересчитанных сезонов
+    (перечитываются только игры с изменившимся sha256).
+    Новый/пересозданный каталог заполняется по всем сезонам.
+    """
+    full = not catalog.synced()
+    if full:
+        targets = all_seasons
+    catalog.retain_seasons(all_seasons)
+    for season in targets:
+        changed = catalog.sync_season(season, load_season_cache(season))
+        if changed:
+            print(f"[INFO] Каталог: сезон {season}, обновлено игр {changed}")
+    if full:
+        catalog.mark_synced()
 
 
 # ---------- Корневой index.json ----------
 
+def stable_updated_at(season_index_path: Path, games_meta: List[Dict]) -> str:
+    """
+    updatedAt для индекса сезона: если список игр не изменился,
+    сохраняем прежнее значение — иначе хэш файла менялся бы на каждой пересборке.
+    """
+    existing = load_json(season_index_path) if season_index_path.exists() else None
+    if (
+        isinstance(existing, dict)
+        and existing.get("games") == games_meta
+        and isinstance(existing.get("updatedAt"), str)
+    ):
+        return existing["updatedAt"]
+    return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+
+# ---------- Манифест хэшей и неизменяемые копии ----------
+
+def manifest_entry(rel_path: str) -> Optional[Dict]:
+    """
+    Хэш содержимого файла и путь к его неизменяемой копии
+    immutable/<hash>.json (копия создаётся, если её ещё нет).
+    """
+    path = BASE_DIR / rel_path
+    try:
+        payload = path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+    content_hash = hashlib.sha256(payload).hexdigest()[:IMMUTABLE_HASH_LEN]
+    immutable_path = IMMUTABLE_DIR / f"{content_hash}.json"
+    if not immutable_path.exists():
+        save_bytes(immutable_path, payload)
+
+    return {
+        "hash": content_hash,
+        "immutable": str(immutable_path.relative_to(BASE_DIR)),
+    }
+
+
+def prune_immutable(referenced: List[str]) -> None:
+    """
+    Удаляет неизменяемые копии, на которые больше не ссылается манифест.
+    Свежие копии держим IMMUTABLE_GRACE_SEC: клиенты со старым index.json
+    ещё могут их запрашивать.
+    """
+    if not IMMUTABLE_DIR.exists():
+        return
+    keep = {Path(p).name for p in referenced}
+    now = datetime.now().timestamp()
+    for entry in IMMUTABLE_DIR.iterdir():
+        name = entry.name
+        for suffix in SIBLING_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        if name in keep or not entry.is_file():
+            continue
+        try:
+            if now - entry.stat().st_mtime > IMMUTABLE_GRACE_SEC:
+                entry.unlink()
+                if name == entry.name:
+                    journal.record_delete(str(entry.relative_to(BASE_DIR)))
+        except FileNotFoundError:
+            pass
+
+
 def load_existing_root_index() -> Optional[Dict]:
     if not ROOT_INDEX_FILE.exists():
         return None
@@ -316,34 +1176,221 @@ def rebuild_root_index(all_seasons: List[str]) -> None:
             "activeGame": "active_game.json",
         })
 
+    # Манифест: хэш каждого файла, на который ссылается индекс,
+    # и его неизменяемая копия — клиент качает файл только при смене хэша.
+    career_stats = f"stats/{CAREER_SEASON_ID}/{PLAYERS_STATS_FILENAME}"
+    arena_stats = f"stats/{CAREER_SEASON_ID}/arenas/{SEASON_INDEX_FILENAME}"
+
+    files: Dict[str, Dict] = {}
+    rel_paths = [career_stats, arena_stats]
+    for entry in seasons_entries:
+        rel_paths.extend([entry["finishedIndex"], entry["playersStats"]])
+    for rel_path in rel_paths:
+        item = manifest_entry(rel_path)
+        if item is not None:
+            files[rel_path] = item
+
     root_data = {
         "currentSeason": current_season,
         "seasons": seasons_entries,
+        "careerStats": career_stats,
+        "arenaStats": arena_stats,
+        "files": files,
     }
 
     save_json(ROOT_INDEX_FILE, root_data)
+    prune_immutable([item["immutable"] for item in files.values()])
 
 
 # ---------- main ----------
 
-def main():
+def rebuild(
+    only_seasons: Optional[List[str]] = None,
+    incremental: bool = True,
+    workers: Optional[int] = None,
+    profile: Optional[RebuildProfile] = None,
+) -> None:
+    """
+    Пересобирает индексы.
+
+    only_seasons — если задан, пересчитываются только эти сезоны
+    (остальные файлы сезонов не трогаются); корневой index.json
+    пересобирается всегда, т. к. он дешёвый.
+
+    workers — число параллельных воркеров (по умолчанию REBUILD_WORKERS,
+    0 — по числу CPU). Изменённые игры всех сезонов разбираются пачками
+    в пуле процессов, затем сезоны собираются и записываются параллельно.
+    Результат не зависит от числа воркеров.
+
+    profile — если задан, в него собирается время фаз (см. RebuildProfile).
+    """
+    global _profile
+    _profile = profile
+    try:
+        _rebuild(only_seasons, incremental, workers)
+    finally:
+        _profile = None
+
+
+def _rebuild(
+    only_seasons: Optional[List[str]],
+    incremental: bool,
+    workers: Optional[int],
+) -> None:
+    if workers is None:
+        workers = REBUILD_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
     print(f"[INFO] BASE_DIR = {BASE_DIR}")
 
-    seasons = discover_seasons()
+    with profile_phase("discover"):
+        seasons = discover_seasons()
     if not seasons:
         print("[WARN] Сезоны в finished/ не найдены. Нечего индексировать.")
-        rebuild_root_index([])
+        with season_lock(CAREER_SEASON_ID):
+            rebuild_career_stats([])
+        with file_lock(ROOT_INDEX_FILE.name):
+            rebuild_root_index([])
         return
 
     print(f"[INFO] Найдены сезоны: {', '.join(seasons)}")
 
-    for season in seasons:
+    if only_seasons is not None:
+        # Сезоны без сохранённых итогов пересчитываем тоже —
+        # иначе карьерная статистика будет неполной
+        targets = [
+            s for s in seasons
+            if s in set(only_seasons) or load_season_totals(s) is None
+        ]
+    else:
+        targets = seasons
+
+    # 1. Сверка с кэшем по всем сезонам
+    scans = {}
+    for season in targets:
         print(f"[INFO] Обработка сезона {season}")
-        process_season(season)
+        with profile_phase("discover"):
+            game_files = list_game_files(FINISHED_DIR / season)
+        scans[season] = scan_season(season, game_files, incremental)
+
+    # 2. Разбор изменённых игр всех сезонов одним пулом
+    items: List[Tuple[str, Optional[str]]] = []
+    for season, (rows, pending) in scans.items():
+        items.extend((str(rows[i][0]), (rows[i][2] or {}).get("sha256")) for i in pending)
+    results = parse_pending_games(items, workers)
+
+    # 3. Сборка и запись сезонов
+    def finish(season: str, season_results) -> None:
+        # Кэш и файлы сезона пишутся под блокировкой сезона: другой процесс
+        # (воркер API, скрипт) не смешает с ними свою пересборку
+        rows, pending = scans[season]
+        with season_lock(season):
+            entries, parsed = finish_season_entries(season, rows, pending, season_results)
+            print(f"[INFO] Сезон {season}: файлов игр {len(rows)}, разобрано заново {parsed}")
+            if _profile is not None:
+                _profile.season(season, rows, parsed)
+            write_season(season, entries)
+
+    offset = 0
+    jobs = []
+    for season, (rows, pending) in scans.items():
+        jobs.append((season, results[offset:offset + len(pending)]))
+        offset += len(pending)
+
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(finish, *job) for job in jobs]:
+                future.result()
+    else:
+        for job in jobs:
+            finish(*job)
+
+    catalog = get_catalog()
+    if catalog is not None:
+        sync_catalog(catalog, targets, seasons)
 
-    rebuild_root_index(seasons)
+    with season_lock(CAREER_SEASON_ID):
+        rebuild_career_stats(seasons, catalog)
+    with file_lock(ROOT_INDEX_FILE.name):
+        rebuild_root_index(seasons)
     print("[INFO] Готово.")
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Пересборка индексов и статистики")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="полный пересчёт без кэша (перечитать все игры)",
+    )
+    parser.add_argument(
+        "--season",
+        action="append",
+        dest="seasons",
+        metavar="SEASON",
+        help="пересчитать только указанный сезон (можно повторять)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="число параллельных воркеров (0 — по числу CPU, "
+             "по умолчанию REBUILD_WORKERS)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="вывести время фаз, объёмы сезонов и медленные файлы (JSON-строки)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="куда писать JSON-строки профиля (по умолчанию stdout)",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="сколько самых медленных файлов игр выводить (по умолчанию 10)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="сохранить дамп cProfile (pstats) основного процесса; "
+             "для полной картины запускайте с --workers 1",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = RebuildProfile(args.slowest) if args.profile or args.profile_output else None
+
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        rebuild(args.seasons, incremental=not args.full, workers=args.workers, profile=profile)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(str(args.cprofile))
+            print(f"[OK] Дамп cProfile записан в {args.cprofile}")
+
+    if profile is not None:
+        if args.profile_output:
+            with open(args.profile_output, "w", encoding="utf-8") as f:
+                profile.dump(f)
+            print(f"[OK] Профиль записан в {args.profile_output}")
+        else:
+            profile.dump(sys.stdout)
+
+
 if __name__ == "__main__":
     main()
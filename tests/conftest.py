@@ -0,0 +1,79 @@
+"""
+Общие настройки тестов: корень репозитория в sys.path и временный BASE_DIR.
+
+Настройки читаются при импорте app.config, поэтому задаются здесь —
+до импорта модулей сервера и скриптов.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ["HOCKEY_BASE_DIR"] = tempfile.mkdtemp(prefix="hockey-tests-")
+os.environ["JOURNAL_ENABLED"] = "false"
+os.environ["REBUILD_DEBOUNCE_SEC"] = "0"
+
+
+@pytest.fixture
+def base_dir() -> Path:
+    """
+    Пустой BASE_DIR на время теста. Каталог один на всю сессию (его путь
+    модули запоминают при импорте), поэтому он очищается перед тестом;
+    файлы метрик не трогаем — их каталог API создаёт один раз.
+    """
+    from app.config import BASE_DIR, CACHE_DIR
+
+    BASE_DIR.mkdir(parents=True, exist_ok=True)
+    for entry in BASE_DIR.iterdir():
+        if entry == CACHE_DIR:
+            for item in entry.iterdir():
+                if item.name != "metrics":
+                    shutil.rmtree(item) if item.is_dir() else item.unlink()
+        elif entry.is_dir():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+    return BASE_DIR
+
+
+@pytest.fixture
+def write_game(base_dir):
+    """Пишет протокол игры finished/<season>/<game_id>.json в формате табло."""
+    from app import jsoncodec
+
+    def write(
+        season: str,
+        game_id: str,
+        red=("Иванов", "Петров"),
+        white=("Сидоров", "Кузнецов"),
+        goals=(),
+        date="2025-11-01T19:00:00",
+        arena="Лёд Север",
+    ) -> Path:
+        score = {"RED": 0, "WHITE": 0}
+        for goal in goals:
+            score[goal["team"]] += 1
+        path = base_dir / "finished" / season / f"{game_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(jsoncodec.dumps({
+            "gameId": game_id,
+            "date": date,
+            "arena": arena,
+            "teams": {
+                "RED": {"name": "Красные", "players": list(red)},
+                "WHITE": {"name": "Белые", "players": list(white)},
+            },
+            "goals": list(goals),
+            "finalScore": score,
+        }))
+        return path
+
+    return write
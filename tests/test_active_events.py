@@ -0,0 +1,88 @@
+"""
+События активной игры (/api/active-game/events): порядок seq,
+повтор и пропуск — 409 с lastSeq, отмена гола и проверка lastEventSeq.
+"""
+
+import json
+
+import pytest
+
+from app import upload_api as api
+
+EVENTS_URL = "/api/active-game/events"
+
+
+@pytest.fixture
+def client(base_dir):
+    client = api.app.test_client()
+    client.environ_base["HTTP_X_API_KEY"] = api.API_KEY
+    return client
+
+
+@pytest.fixture
+def game(client):
+    response = client.post("/api/upload-active-game", json={
+        "gameId": "live",
+        "teams": {
+            "RED": {"name": "Красные", "players": ["Иванов", "Петров"]},
+            "WHITE": {"name": "Белые", "players": ["Сидоров"]},
+        },
+        "goals": [],
+        "finalScore": {"RED": 0, "WHITE": 0},
+    })
+    assert response.status_code == 200
+
+
+def goal(seq, team="RED", scorer="Иванов"):
+    return {"seq": seq, "type": "goal", "team": team, "scorer": scorer}
+
+
+def stored_game():
+    with open(api.ACTIVE_GAME_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_goals_and_undo(client, game):
+    response = client.post(EVENTS_URL, json=goal(1))
+    assert response.status_code == 200
+    assert response.get_json()["finalScore"] == {"RED": 1, "WHITE": 0}
+
+    response = client.post(EVENTS_URL, json=goal(2, "WHITE", "Сидоров"))
+    assert response.get_json()["finalScore"] == {"RED": 1, "WHITE": 1}
+
+    response = client.post(EVENTS_URL, json={"seq": 3, "type": "undo", "target": "goal"})
+    assert response.status_code == 200
+    assert response.get_json()["finalScore"] == {"RED": 1, "WHITE": 0}
+
+    saved = stored_game()
+    assert saved["lastEventSeq"] == 3
+    assert [g["scorer"] for g in saved["goals"]] == ["Иванов"]
+
+
+@pytest.mark.parametrize("seq", [1, 3])
+def test_duplicate_or_gap_is_conflict(client, game, seq):
+    assert client.post(EVENTS_URL, json=goal(1)).status_code == 200
+
+    response = client.post(EVENTS_URL, json=goal(seq))
+    assert response.status_code == 409
+    assert response.get_json()["lastSeq"] == 1
+    # Отклонённое событие не применилось
+    assert stored_game()["finalScore"] == {"RED": 1, "WHITE": 0}
+
+
+def test_event_without_active_game(client):
+    response = client.post(EVENTS_URL, json=goal(1))
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("value", ["7", -1, 1.5, True])
+def test_invalid_last_event_seq(client, game, value):
+    response = client.post("/api/upload-active-game", json={"gameId": "live", "lastEventSeq": value})
+    assert response.status_code == 400
+
+    # Файл с таким значением, записанный в обход API, не роняет обработку
+    with open(api.ACTIVE_GAME_PATH, "w", encoding="utf-8") as f:
+        json.dump({"gameId": "live", "lastEventSeq": value}, f)
+    response = client.post(EVENTS_URL, json=goal(1))
+    assert response.status_code == 409
+    assert "lastEventSeq" in response.get_json()["message"]
@@ -0,0 +1,120 @@
+"""
+Журнал изменений: постраничная выдача /api/changes, 410 после очистки
+журнала или его смены и применение страниц репликой (scripts/follow.py).
+"""
+
+import json
+
+import pytest
+
+from app import journal
+from app import upload_api as api
+from scripts import follow
+
+URL = "/api/changes"
+
+
+@pytest.fixture
+def client(base_dir, monkeypatch):
+    monkeypatch.setattr(journal, "JOURNAL_ENABLED", True)
+    monkeypatch.setattr(journal, "_journal", None)
+    client = api.app.test_client()
+    client.environ_base["HTTP_X_API_KEY"] = api.API_KEY
+    return client
+
+
+@pytest.fixture
+def writes(client):
+    """Три записи: настройки (seq 1), рейтинги (seq 2), снова настройки (seq 3)."""
+    for url, data in (
+        ("/api/upload-settings", {"theme": "dark"}),
+        ("/api/upload-ratings", {"Иванов": 1500}),
+        ("/api/upload-settings", {"theme": "light"}),
+    ):
+        assert client.post(url, json=data).status_code == 200
+    return client.get(URL).get_json()["journal"]
+
+
+def changes(client, **params):
+    return client.get(URL, query_string=params)
+
+
+def test_head(client, writes):
+    head = client.get(URL).get_json()
+    assert head["journal"] == writes
+    assert head["seq"] == 3
+
+
+def test_paging(client, writes):
+    first = changes(client, after=0, limit=2, journal=writes).get_json()
+    assert [(c["seq"], c["path"]) for c in first["changes"]] == [
+        (1, "settings/app_settings.json"),
+        (2, "base_roster/ratings.json"),
+    ]
+    assert (first["seq"], first["last"], first["more"]) == (2, 3, True)
+    # Содержимое — текущее, а не на момент записи
+    assert json.loads(first["changes"][0]["text"]) == {"theme": "light"}
+
+    rest = changes(client, after=first["seq"], limit=2, journal=writes).get_json()
+    assert [c["seq"] for c in rest["changes"]] == [3]
+    assert (rest["seq"], rest["more"]) == (3, False)
+
+    # Запись, перекрытая более поздней на той же странице, пропускается
+    page = changes(client, after=0, journal=writes).get_json()
+    assert [c["seq"] for c in page["changes"]] == [2, 3]
+
+
+@pytest.mark.parametrize("params", [
+    {"after": 0, "journal": "0000000000000000"},
+    {"after": 9},
+])
+def test_gone_on_other_journal_or_future_seq(client, writes, params):
+    response = changes(client, **params)
+    assert response.status_code == 410
+    assert response.get_json()["journal"] == writes
+
+
+def test_gone_after_prune(client, writes):
+    journal.get_journal().prune(1)
+    assert changes(client, after=0, journal=writes).status_code == 410
+    assert changes(client, after=2, journal=writes).status_code == 200
+
+
+def test_invalid_params(client, writes):
+    assert changes(client, after="x").status_code == 400
+    assert changes(client, after=0, limit=0).status_code == 400
+
+
+def test_follower_applies_pages(client, base_dir, tmp_path, monkeypatch):
+    replica = tmp_path / "replica"
+    monkeypatch.setattr(follow, "BASE_DIR", replica)
+    monkeypatch.setattr(follow, "CACHE_DIR", replica / ".cache")
+    monkeypatch.setattr(follow, "STATE_FILE", replica / ".cache" / "follower.json")
+
+    roster = {"players": [{"full_name": "Иванов Иван"}]}
+    client.post("/api/upload-base-roster", json=roster)
+    client.post("/api/upload-settings", json={"theme": "dark"})
+    client.post("/api/upload-ratings", json={"Иванов": 1500})
+    (base_dir / "base_roster" / "ratings.json").unlink()
+    journal.get_journal().record_delete("base_roster/ratings.json")
+
+    # Устаревший файл на реплике удаляется записью журнала
+    (replica / "base_roster").mkdir(parents=True)
+    (replica / "base_roster" / "ratings.json").write_text("{}")
+
+    head = client.get(URL).get_json()
+    state = {"primary": "http://primary", "journal": head["journal"], "seq": 0}
+    pages = 0
+    while True:
+        page = changes(client, after=state["seq"], limit=2, journal=state["journal"]).get_json()
+        follow.apply_page(state, page)
+        pages += 1
+        if not page["more"]:
+            break
+
+    assert pages == 2
+    assert state["seq"] == state["primarySeq"] == head["seq"]
+    assert json.loads((replica / "base_roster" / "base_players.json").read_text()) == roster
+    assert json.loads((replica / "settings" / "app_settings.json").read_text()) == {"theme": "dark"}
+    assert not (replica / "base_roster" / "ratings.json").exists()
+    assert follow.load_state("http://primary")["seq"] == head["seq"]
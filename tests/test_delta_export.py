@@ -0,0 +1,77 @@
+"""
+Дельта-выгрузка /api/download-db?since=...: только изменённые файлы
+и список удалённых в db_info.json; слишком старый since — полный архив.
+"""
+
+import io
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+from app import db_export
+from app import upload_api as api
+
+URL = "/api/download-db"
+OLD = time.time() - 3600
+
+
+def archive_files(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = [n[len(db_export.ARCHIVE_ROOT) + 1:] for n in zf.namelist()]
+        info = json.loads(zf.read(f"{db_export.ARCHIVE_ROOT}/{db_export.DB_INFO_FILENAME}"))
+    names.remove(db_export.DB_INFO_FILENAME)
+    return sorted(names), info
+
+
+@pytest.fixture
+def client(base_dir, write_game):
+    for game_id in ("g1", "g2", "g3"):
+        path = write_game("2025", game_id)
+        os.utime(path, (OLD, OLD))
+    client = api.app.test_client()
+    client.environ_base["HTTP_X_API_KEY"] = api.API_KEY
+    return client
+
+
+def test_delta_has_changed_and_deleted_files(client, base_dir, write_game):
+    since = time.time() - 60
+    write_game("2025", "g4")
+    write_game("2025", "g1", goals=[{"team": "RED", "scorer": "Иванов"}])
+    (base_dir / "finished" / "2025" / "g2.json").unlink()
+    db_export.record_deletion(api.CACHE_DIR, "finished/2025/g2.json")
+
+    response = client.get(URL, query_string={"since": str(since)})
+    assert response.status_code == 200
+    names, info = archive_files(response.data)
+
+    assert names == ["finished/2025/g1.json", "finished/2025/g4.json"]
+    assert info["delta"] is True
+    assert info["since"] == since
+    assert info["deleted"] == ["finished/2025/g2.json"]
+    assert info["version"] >= since
+
+
+def test_recreated_file_is_not_deleted(client, base_dir, write_game):
+    since = time.time() - 60
+    (base_dir / "finished" / "2025" / "g2.json").unlink()
+    db_export.record_deletion(api.CACHE_DIR, "finished/2025/g2.json")
+    write_game("2025", "g2")
+
+    names, info = archive_files(client.get(URL, query_string={"since": str(since)}).data)
+    assert names == ["finished/2025/g2.json"]
+    assert info["deleted"] == []
+
+
+def test_old_since_gives_full_archive(client):
+    response = client.get(URL, query_string={"since": "2000-01-01T00:00:00Z"})
+    assert response.status_code == 200
+    names, info = archive_files(response.data)
+    assert names == ["finished/2025/g1.json", "finished/2025/g2.json", "finished/2025/g3.json"]
+    assert "delta" not in info
+
+
+def test_invalid_since(client):
+    assert client.get(URL, query_string={"since": "yesterday"}).status_code == 400
@@ -0,0 +1,163 @@
+"""
+Скачивание архива в scripts/import_db.py против локального HTTP-сервера:
+Range-блоки с докачкой, If-Range, проверка SHA-256 и запасной путь
+одним потоком.
+"""
+
+import hashlib
+import http.client
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts import import_db
+
+CHUNK_SIZE = 16 * 1024
+PAYLOAD_SIZE = 200 * 1024  # 13 блоков, последний неполный
+
+
+class StandIn:
+    """Состояние подставного сервера: архив, заголовки и сбои."""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.etag = '"v1"'
+        self.sha256 = hashlib.sha256(payload).hexdigest()
+        self.ranges = True
+        # После стольких Range-ответов остальные обрываются на середине
+        self.fail_after = None
+        # Сменить ETag сразу после HEAD (архив пересобран во время загрузки)
+        self.change_etag_after_head = False
+        self.range_requests = 0
+        self.url = ""
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        srv = self.server.stand_in
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(srv.payload)))
+        if srv.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", srv.etag)
+        self.send_header("X-Content-SHA256", srv.sha256)
+        self.end_headers()
+        if srv.change_etag_after_head:
+            srv.etag = '"v2"'
+
+    def do_GET(self):
+        srv = self.server.stand_in
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if not (srv.ranges and range_header and if_range in (None, srv.etag)):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(srv.payload)))
+            self.end_headers()
+            self.wfile.write(srv.payload)
+            return
+
+        start, end = (int(v) for v in range_header.split("=", 1)[1].split("-"))
+        body = srv.payload[start:end + 1]
+        srv.range_requests += 1
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(srv.payload)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if srv.fail_after is not None and srv.range_requests > srv.fail_after:
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.stand_in = StandIn(os.urandom(PAYLOAD_SIZE))
+    server.stand_in.url = f"http://127.0.0.1:{server.server_port}/api/download-db"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.stand_in
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(import_db, "DOWNLOAD_CHUNK_SIZE", CHUNK_SIZE)
+    monkeypatch.setattr(import_db, "DOWNLOAD_BACKOFF_SEC", 0.0)
+
+
+def test_interrupted_download_resumes(stand_in, tmp_path, monkeypatch):
+    chunks = -(-PAYLOAD_SIZE // CHUNK_SIZE)
+
+    # Первый запуск обрывается на шестом блоке и сдаётся без повторов
+    stand_in.fail_after = 5
+    monkeypatch.setattr(import_db, "DOWNLOAD_RETRIES", 0)
+    with pytest.raises((OSError, http.client.HTTPException)):
+        import_db.download_to_temp(stand_in.url, parts=1, download_dir=tmp_path)
+    assert list(tmp_path.glob("*.part.json"))
+
+    # Повторный запуск докачивает только недостающие блоки
+    stand_in.fail_after = None
+    stand_in.range_requests = 0
+    monkeypatch.setattr(import_db, "DOWNLOAD_RETRIES", 2)
+    path = import_db.download_to_temp(stand_in.url, parts=1, download_dir=tmp_path)
+
+    assert stand_in.range_requests == chunks - 5
+    assert path.read_bytes() == stand_in.payload
+    assert not list(tmp_path.glob("*.part*"))
+
+
+def test_broken_chunk_is_retried_in_place(stand_in, tmp_path, monkeypatch):
+    stand_in.fail_after = 3
+    calls = []
+
+    def heal(attempt):
+        # Сервер «поправился» к повтору
+        calls.append(attempt)
+        stand_in.fail_after = None
+        return 0.0
+
+    monkeypatch.setattr(import_db, "retry_delay", heal)
+    path = import_db.download_to_temp(stand_in.url, parts=2, download_dir=tmp_path)
+
+    assert calls
+    assert path.read_bytes() == stand_in.payload
+
+
+def test_changed_etag_fails_if_range(stand_in, tmp_path):
+    stand_in.change_etag_after_head = True
+
+    with pytest.raises(RuntimeError):
+        import_db.download_to_temp(stand_in.url, parts=1, download_dir=tmp_path)
+    assert not list(tmp_path.glob("*.zip"))
+
+
+def test_sha256_mismatch_deletes_file(stand_in, tmp_path):
+    stand_in.sha256 = "0" * 64
+
+    with pytest.raises(RuntimeError, match="SHA-256"):
+        import_db.download_to_temp(stand_in.url, parts=2, download_dir=tmp_path)
+    assert not list(tmp_path.glob("*.zip"))
+
+
+def test_explicit_sha256_overrides_published(stand_in, tmp_path):
+    with pytest.raises(RuntimeError, match="SHA-256"):
+        import_db.download_to_temp(
+            stand_in.url, parts=1, sha256="f" * 64, download_dir=tmp_path,
+        )
+
+
+def test_no_range_support_falls_back_to_stream(stand_in, tmp_path):
+    stand_in.ranges = False
+
+    path = import_db.download_to_temp(stand_in.url, parts=4, download_dir=tmp_path)
+
+    assert stand_in.range_requests == 0
+    assert path.read_bytes() == stand_in.payload
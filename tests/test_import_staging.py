@@ -0,0 +1,124 @@
+"""
+Импорт архива в scripts/import_db.py через промежуточный каталог:
+подмена рабочей базы, связывание неизменённых файлов вместо распаковки
+и нетронутая база при сбое импорта.
+"""
+
+import json
+import zipfile
+
+import pytest
+
+from scripts import import_db
+
+
+def game(game_id, scorer):
+    return {
+        "gameId": game_id,
+        "date": "2025-11-01T19:00:00",
+        "arena": "Лёд Север",
+        "teams": {
+            "RED": {"name": "Красные", "players": ["Иванов", "Петров"]},
+            "WHITE": {"name": "Белые", "players": ["Сидоров"]},
+        },
+        "goals": [{"team": "RED", "scorer": scorer}],
+        "finalScore": {"RED": 1, "WHITE": 0},
+    }
+
+
+def make_archive(path, files):
+    """ZIP в формате /api/download-db: hockey-json/<путь>."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(import_db.ZIP_PREFIX + import_db.DB_INFO_NAME, json.dumps({"version": 1}))
+        for rel_path, data in files.items():
+            zf.writestr(import_db.ZIP_PREFIX + rel_path, json.dumps(data, ensure_ascii=False))
+    return path
+
+
+def tree(base_dir):
+    """Содержимое рабочей базы без служебного кэша."""
+    return {
+        str(p.relative_to(base_dir)): p.read_bytes()
+        for p in base_dir.rglob("*")
+        if p.is_file() and ".cache" not in p.parts
+    }
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return make_archive(tmp_path / "db.zip", {
+        "finished/2025/g1.json": game("g1", "Иванов"),
+        "finished/2025/g2.json": game("g2", "Петров"),
+        "settings/app_settings.json": {"theme": "dark"},
+    })
+
+
+@pytest.fixture
+def extract_counts(monkeypatch):
+    """Счётчики распаковки последнего импорта."""
+    counts = {}
+    original = import_db.extract_hockey_json
+
+    def extract(*args, **kwargs):
+        counts.clear()
+        counts.update(original(*args, **kwargs))
+        return counts
+
+    monkeypatch.setattr(import_db, "extract_hockey_json", extract)
+    return counts
+
+
+def test_full_import_replaces_base(base_dir, archive, extract_counts):
+    stale = base_dir / "finished" / "2024" / "old.json"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("{}")
+    (base_dir / ".cache" / "locks").mkdir(parents=True, exist_ok=True)
+
+    info = import_db.import_archive(archive, base_dir, workers=2)
+
+    assert info == {"version": 1}
+    assert extract_counts == {"extracted": 4, "linked": 0}
+    assert json.loads((base_dir / "finished" / "2025" / "g1.json").read_text())["gameId"] == "g1"
+    assert not stale.exists()
+    assert not (base_dir / import_db.STAGING_DIRNAME).exists()
+    assert (base_dir / ".cache" / "locks").is_dir()
+
+    # Индексы пересобраны по импортированным играм
+    index = json.loads((base_dir / "finished" / "2025" / "index.json").read_text())
+    assert sorted(g["id"] for g in index["games"]) == ["g1", "g2"]
+    assert (base_dir / "index.json").is_file()
+
+
+def test_unchanged_files_are_linked(base_dir, archive, tmp_path, extract_counts):
+    import_db.import_archive(archive, base_dir, workers=2)
+    g1 = base_dir / "finished" / "2025" / "g1.json"
+    inode = g1.stat().st_ino
+
+    changed = make_archive(tmp_path / "db2.zip", {
+        "finished/2025/g1.json": game("g1", "Иванов"),
+        "finished/2025/g2.json": game("g2", "Сидоров"),
+        "settings/app_settings.json": {"theme": "dark"},
+    })
+    import_db.import_archive(changed, base_dir, workers=2)
+
+    # Изменился только g2.json
+    assert extract_counts == {"extracted": 1, "linked": 3}
+    assert g1.stat().st_ino == inode
+    g2 = json.loads((base_dir / "finished" / "2025" / "g2.json").read_text())
+    assert g2["goals"][0]["scorer"] == "Сидоров"
+
+
+def test_failed_import_keeps_live_base(base_dir, archive, tmp_path, monkeypatch):
+    import_db.import_archive(archive, base_dir, workers=1)
+    before = tree(base_dir)
+
+    def fail(staging, full):
+        raise RuntimeError("rebuild failed")
+
+    monkeypatch.setattr(import_db, "run_rebuild", fail)
+    other = make_archive(tmp_path / "other.zip", {"finished/2026/g9.json": game("g9", "Орлов")})
+    with pytest.raises(RuntimeError):
+        import_db.import_archive(other, base_dir, workers=1)
+
+    assert tree(base_dir) == before
+    assert not (base_dir / import_db.STAGING_DIRNAME).exists()
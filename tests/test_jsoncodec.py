@@ -0,0 +1,48 @@
+"""
+Оба бэкенда app/jsoncodec.py ведут себя одинаково: вывод побайтно
+совпадает, NaN/Infinity отвергаются при разборе и пишутся как null.
+"""
+
+import pytest
+
+from app import jsoncodec
+
+BACKENDS = ["json"] + (["orjson"] if jsoncodec.orjson is not None else [])
+
+SAMPLE = {
+    "gameId": "g1",
+    "arena": "Лёд Север",
+    "finalScore": {"RED": 3, "WHITE": 2},
+    "goals": [{"team": "RED", "scorer": "Иванов", "assist1": None}],
+    "ratio": 0.5,
+}
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(jsoncodec, "BACKEND", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_output_matches_stdlib(backend, compact, monkeypatch):
+    payload = jsoncodec.dumps(SAMPLE, compact=compact)
+
+    monkeypatch.setattr(jsoncodec, "BACKEND", "json")
+    assert payload == jsoncodec.dumps(SAMPLE, compact=compact)
+    assert jsoncodec.loads(payload) == SAMPLE
+
+
+@pytest.mark.parametrize("text", ['{"x": NaN}', '{"x": Infinity}', '[-Infinity]'])
+def test_non_finite_rejected_on_parse(backend, text):
+    with pytest.raises(ValueError):
+        jsoncodec.loads(text.encode("utf-8"))
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_non_finite_written_as_null(backend, compact):
+    data = {"a": float("nan"), "b": [float("inf"), 1.5], "c": -float("inf")}
+
+    assert jsoncodec.loads(jsoncodec.dumps(data, compact=compact)) == {
+        "a": None, "b": [None, 1.5], "c": None,
+    }
@@ -0,0 +1,92 @@
+"""
+Инкрементальная пересборка индексов: разбираются только изменённые игры,
+а результат совпадает с полной пересборкой.
+"""
+
+import os
+
+import pytest
+
+from scripts import rebuild_indexes
+
+SEASON = "2025"
+
+
+def goal(team, scorer, assist1=None, assist2=None):
+    return {"team": team, "scorer": scorer, "assist1": assist1, "assist2": assist2}
+
+
+def outputs(base_dir):
+    """Содержимое всех файлов, которые пишет пересборка (кроме кэша и самих игр)."""
+    result = {}
+    for path in sorted(base_dir.rglob("*")):
+        rel = path.relative_to(base_dir)
+        if not path.is_file() or rel.parts[0] == ".cache":
+            continue
+        if rel.parts[0] == "finished" and len(rel.parts) == 3 and rel.name != "index.json":
+            continue
+        result[str(rel)] = path.read_bytes()
+    return result
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Подсчёт файлов, которые пересборка разобрала заново."""
+    parsed = []
+    original = rebuild_indexes.parse_game_file
+
+    def counting(game_file, raw, base_dir=None):
+        parsed.append(game_file.name)
+        return original(game_file, raw, base_dir)
+
+    monkeypatch.setattr(rebuild_indexes, "parse_game_file", counting)
+    return parsed
+
+
+def test_unchanged_games_are_not_parsed_again(write_game, parses):
+    write_game(SEASON, "g1", goals=[goal("RED", "Иванов", "Петров")])
+    path = write_game(SEASON, "g2", goals=[goal("WHITE", "Сидоров")])
+    rebuild_indexes.rebuild()
+    assert sorted(parses) == ["g1.json", "g2.json"]
+
+    parses.clear()
+    rebuild_indexes.rebuild()
+    assert parses == []
+
+    # Сменился только mtime: файл перечитывается, но по sha256 не разбирается
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    rebuild_indexes.rebuild()
+    assert parses == []
+
+    write_game(SEASON, "g2", goals=[goal("WHITE", "Сидоров"), goal("RED", "Иванов")])
+    rebuild_indexes.rebuild()
+    assert parses == ["g2.json"]
+
+
+def test_incremental_rebuild_matches_full_rebuild(base_dir, write_game):
+    write_game(SEASON, "g1", goals=[goal("RED", "Иванов", "Петров")])
+    write_game(SEASON, "g2", goals=[goal("WHITE", "Сидоров", "Кузнецов")])
+    write_game("2024", "g1", red=("Иванов", "Орлов"), goals=[goal("RED", "Орлов")])
+    rebuild_indexes.rebuild()
+
+    # Добавление, изменение и удаление игр
+    write_game(SEASON, "g3", date="2025-11-08T19:00:00", goals=[goal("RED", "Петров")])
+    write_game(SEASON, "g1", goals=[goal("RED", "Иванов"), goal("WHITE", "Новиков")])
+    (base_dir / "finished" / SEASON / "g2.json").unlink()
+    rebuild_indexes.rebuild()
+    incremental = outputs(base_dir)
+
+    rebuild_indexes.rebuild(incremental=False)
+    full = outputs(base_dir)
+
+    assert incremental.keys() == full.keys()
+    for rel in full:
+        assert incremental[rel] == full[rel], rel
+
+    data = rebuild_indexes.load_json(base_dir / "stats" / SEASON / "players.json")
+    goals = {p["name"]: p["goals"] for p in data["players"]}
+    # Гол Сидорова был только в удалённой g2
+    assert goals["Сидоров"] == 0
+    assert goals["Новиков"] == 1
+    assert goals["Петров"] == 1
@@ -0,0 +1,71 @@
+"""
+Планировщик пересборки: склейка запросов в одну пересборку,
+single-flight и учёт ошибок.
+"""
+
+import threading
+
+from app.rebuild_scheduler import RebuildScheduler
+
+
+def test_requests_coalesce_into_one_run():
+    runs = []
+    scheduler = RebuildScheduler(runs.append, debounce_sec=0.2, max_delay_sec=5)
+    scheduler.request(["2025"])
+    scheduler.request(["2024", "2025"])
+    scheduler.request([""])
+    assert scheduler.wait_idle(timeout=5)
+
+    assert runs == [["2024", "2025"]]
+    status = scheduler.status()
+    assert (status["requestsTotal"], status["runsTotal"]) == (3, 1)
+    assert status["lastRun"]["ok"]
+
+
+def test_all_seasons_request_wins():
+    runs = []
+    scheduler = RebuildScheduler(runs.append, debounce_sec=0.2, max_delay_sec=5)
+    scheduler.request(["2025"])
+    scheduler.request(None)
+    scheduler.request(["2024"])
+    assert scheduler.wait_idle(timeout=5)
+    assert runs == [None]
+
+
+def test_single_flight_queues_one_follow_up():
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def run(seasons):
+        runs.append(seasons)
+        started.set()
+        release.wait(5)
+
+    scheduler = RebuildScheduler(run, debounce_sec=0, max_delay_sec=5)
+    scheduler.request(["2024"])
+    assert started.wait(5)
+
+    # Во время пересборки запросы копятся в одну следующую
+    scheduler.request(["2025"])
+    scheduler.request(["2026"])
+    status = scheduler.status()
+    assert status["running"] and status["queuedSeasons"] == ["2025", "2026"]
+
+    release.set()
+    assert scheduler.wait_idle(timeout=5)
+    assert runs == [["2024"], ["2025", "2026"]]
+
+
+def test_failed_run_is_reported():
+    def run(seasons):
+        raise RuntimeError("boom")
+
+    scheduler = RebuildScheduler(run, debounce_sec=0, max_delay_sec=5)
+    scheduler.request(["2025"])
+    assert scheduler.wait_idle(timeout=5)
+
+    status = scheduler.status()
+    assert status["failuresTotal"] == 1
+    assert not status["lastRun"]["ok"]
+    assert status["lastRun"]["error"] == "boom"
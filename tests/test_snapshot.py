@@ -0,0 +1,90 @@
+"""
+Снимок базы для /api/download-db: ETag / 304 / Range, живые записи
+не сбрасывают снимок, устаревший снимок отдаётся сразу и пересобирается
+в фоне, а докачка по прежнему ETag получает прежний архив.
+"""
+
+import pytest
+
+from app import db_export
+from app import upload_api as api
+
+URL = "/api/download-db"
+
+
+@pytest.fixture
+def client(base_dir, write_game):
+    write_game("2025", "g1")
+    (base_dir / "settings").mkdir()
+    (base_dir / "settings" / "app_settings.json").write_text('{"theme": "dark"}')
+    client = api.app.test_client()
+    client.environ_base["HTTP_X_API_KEY"] = api.API_KEY
+    yield client
+    if db_export._background_build is not None:
+        db_export._background_build.join(timeout=10)
+
+
+def wait_background_build():
+    thread = db_export._background_build
+    assert thread is not None
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_etag_not_modified_and_range(client):
+    full = client.get(URL)
+    assert full.status_code == 200
+    etag = full.headers["ETag"]
+    assert full.headers["X-Content-SHA256"] == etag.strip('"')
+    assert full.data[:2] == b"PK"
+
+    cached = client.get(URL, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    part = client.get(URL, headers={"Range": "bytes=10-99", "If-Range": etag})
+    assert part.status_code == 206
+    assert part.data == full.data[10:100]
+
+
+def test_live_writes_keep_snapshot(client):
+    etag = client.get(URL).headers["ETag"]
+
+    response = client.post("/api/upload-active-game", json={"gameId": "live", "lastEventSeq": 0})
+    assert response.status_code == 200
+    assert client.get(URL).headers["ETag"] == etag
+
+    response = client.post("/api/upload-settings", json={"theme": "light"})
+    assert response.status_code == 200
+    # Обычная запись делает снимок устаревшим
+    assert not db_export._is_current(
+        db_export._load_snapshot_meta(api.SNAPSHOT_DIR),
+        db_export.snapshot_generation(api.SNAPSHOT_DIR),
+    )
+
+
+def test_stale_snapshot_served_while_rebuilding(client, monkeypatch):
+    monkeypatch.setattr(api, "SNAPSHOT_REBUILD_INTERVAL_SEC", 0)
+    old = client.get(URL)
+    old_etag = old.headers["ETag"]
+
+    client.post("/api/upload-settings", json={"theme": "light"})
+
+    # Устаревший снимок отдаётся сразу, новый собирается в фоне
+    stale = client.get(URL)
+    assert stale.headers["ETag"] == old_etag
+    wait_background_build()
+
+    fresh = client.get(URL)
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != old_etag
+
+    # Докачка начатой загрузки получает прежний архив
+    resumed = client.get(URL, headers={"Range": "bytes=100-", "If-Range": old_etag})
+    assert resumed.status_code == 206
+    assert resumed.headers["ETag"] == old_etag
+    assert resumed.data == old.data[100:]
+
+    # Неизвестный If-Range — полный текущий архив
+    unknown = client.get(URL, headers={"Range": "bytes=100-", "If-Range": '"' + "0" * 64 + '"'})
+    assert unknown.status_code == 200
+    assert unknown.headers["ETag"] == fresh.headers["ETag"]